@@ -0,0 +1,195 @@
+"""
+Benchmark the client against a local fake gerrit
+
+Measures calls per second, p50/p99 latency and allocated memory of the
+main client operations, sequentially and from a pool of threads, against
+the stand-in server in fake_gerrit.py. Results can be saved and later
+runs compared against them to catch regressions.
+
+    python benchmarks/bench_client.py [--calls 2000] [--threads 16] [--latency 0]
+        [--payload-size 0] [--save results.json] [--baseline results.json]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from fake_gerrit import FakeGerrit
+from gerrit import Gerrit
+
+PROJECT = 'platform/build'
+
+
+def operations(gerrit_con):
+    """
+    The benchmarked operations, each takes the number of the call
+    """
+    change = gerrit_con.create_change(PROJECT, 'Benchmark change')
+
+    def get_change(number):
+        gerrit_con.get_change(PROJECT, 'I%08x%032x' % (number, 0))
+
+    def create_change(number):
+        gerrit_con.create_change(PROJECT, 'Benchmark change %d' % number)
+
+    def add_reviewer(number):
+        change.add_reviewer('user%d' % number)
+
+    def set_review(number):
+        change.set_review(labels={'Code-Review': 1}, message='Review %d' % number)
+
+    def get_project(number):
+        gerrit_con.get_project('%s%d' % (PROJECT, number))
+
+    return [
+        ('get_change', get_change),
+        ('create_change', create_change),
+        ('add_reviewer', add_reviewer),
+        ('set_review', set_review),
+        ('get_project', get_project),
+    ]
+
+
+def timed(operation, number):
+    """
+    Seconds one call took
+    """
+    start = time.perf_counter()
+    operation(number)
+    return time.perf_counter() - start
+
+
+def percentile(latencies, fraction):
+    """
+    The latency below which fraction of the sorted latencies fall
+    """
+    return latencies[min(len(latencies) - 1, int(round(fraction * (len(latencies) - 1))))]
+
+
+def run(operation, calls, threads):
+    """
+    Make calls, from a pool of threads if threads > 1
+    :return: Calls per second, p50 and p99 latency in seconds
+    """
+    start = time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            latencies = list(executor.map(lambda number: timed(operation, number), range(calls)))
+    else:
+        latencies = [timed(operation, number) for number in range(calls)]
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return calls / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99)
+
+
+def allocated(operation, calls, threads):
+    """
+    Peak bytes allocated while making calls, measured separately as
+    tracing allocations slows the calls down
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(operation, calls, threads)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def compare(results, baseline, tolerance):
+    """
+    Report the operations that got slower than the baseline allows
+    :return: The regressions found
+    :rtype: list of str
+    """
+    regressions = []
+    for key, result in sorted(results.items()):
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if result['calls_per_second'] < previous['calls_per_second'] * (1 - tolerance):
+            regressions.append('%s: %.0f calls/s, was %.0f' % (
+                key, result['calls_per_second'], previous['calls_per_second']))
+        if result['p99'] > previous['p99'] * (1 + tolerance):
+            regressions.append('%s: p99 %.2f ms, was %.2f ms' % (
+                key, result['p99'] * 1000, previous['p99'] * 1000))
+    return regressions
+
+
+def benchmark(args):
+    """
+    Run every operation sequentially and concurrently against a fake gerrit
+    :return: calls_per_second, p50, p99 and peak_bytes per operation and mode
+    :rtype: dict
+    """
+    results = {}
+    with FakeGerrit(args.latency / 1000.0, args.payload_size) as server:
+        gerrit_con = Gerrit(server.url, auth_id='bench', auth_pw='bench',
+                            pool_maxsize=args.threads)
+        print('%d calls per run, %d threads, %.1f ms latency, %d B payload' % (
+            args.calls, args.threads, args.latency, args.payload_size))
+        print('%-14s %-10s %10s %9s %9s %10s' % (
+            'operation', 'mode', 'calls/s', 'p50 ms', 'p99 ms', 'peak KiB'))
+
+        for name, operation in operations(gerrit_con):
+            for mode, threads in (('sequential', 1), ('concurrent', args.threads)):
+                calls_per_second, p50, p99 = run(operation, args.calls, threads)
+                peak = allocated(operation, args.memory_calls, threads)
+                results['%s %s' % (name, mode)] = {
+                    'calls_per_second': calls_per_second,
+                    'p50': p50,
+                    'p99': p99,
+                    'peak_bytes': peak,
+                }
+                print('%-14s %-10s %10.0f %9.2f %9.2f %10.1f' % (
+                    name, mode, calls_per_second, p50 * 1000, p99 * 1000, peak / 1024.0))
+
+        gerrit_con.close()
+
+    return results
+
+
+def main():
+    """
+    Run the benchmark
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='milliseconds the server waits before each response')
+    parser.add_argument('--payload-size', type=int, default=0,
+                        help='approximate size of the ChangeInfo responses in bytes')
+    parser.add_argument('--memory-calls', type=int, default=200,
+                        help='calls to make while tracing allocations')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare with results saved by --save')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='slowdown allowed against the baseline')
+    args = parser.parse_args()
+
+    results = benchmark(args)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION %s' % regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
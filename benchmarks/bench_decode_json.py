@@ -0,0 +1,121 @@
+"""
+Benchmark decoding of large /changes/ responses
+
+Compares the previous decode path, decoding the body to str and
+stripping the XSSI prefix before json.loads, with helper.decode_json on
+the raw response bytes, with and without orjson.
+
+    python benchmarks/bench_decode_json.py [--changes 20000] [--rounds 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from gerrit import helper
+
+
+def change_info(number):
+    """
+    Build a ChangeInfo like the ones returned by /changes/?o=LABELS
+    """
+    change_id = 'I%040x' % number
+    return {
+        'id': 'platform%%2Fbuild~master~%s' % change_id,
+        'project': 'platform/build',
+        'branch': 'master',
+        'hashtags': [],
+        'change_id': change_id,
+        'subject': 'Make the build reproducible, part %d' % number,
+        'status': 'NEW',
+        'created': '2016-02-01 09:59:32.126000000',
+        'updated': '2016-02-21 11:16:36.775000000',
+        'mergeable': True,
+        'insertions': number % 500,
+        'deletions': number % 70,
+        '_number': number,
+        'owner': {
+            '_account_id': 1000000 + number % 50,
+            'name': 'John Doe',
+            'email': 'john.doe@example.com',
+            'username': 'jdoe',
+        },
+        'labels': {
+            'Verified': {'approved': {'_account_id': 1000096}, 'value': 1},
+            'Code-Review': {'recommended': {'_account_id': 1000097}, 'value': 1},
+        },
+    }
+
+
+def legacy_decode(content):
+    """
+    The decode path used before decode_json accepted bytes
+    """
+    return json.loads(content.decode('utf-8').lstrip(')]}\''))
+
+
+def stdlib_decode(content):
+    """
+    decode_json without the optional backend
+    """
+    backend = helper.orjson
+    helper.orjson = None
+    try:
+        return helper.decode_json(content)
+    finally:
+        helper.orjson = backend
+
+
+def measure(decode, content, rounds):
+    """
+    Return the best time out of rounds to decode content
+    """
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        decode(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    """
+    Run the benchmark
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--changes', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    content = (")]}'\n" + json.dumps([change_info(i) for i in range(args.changes)])).encode()
+    megabytes = len(content) / 1024.0 / 1024.0
+    print('%d ChangeInfo entities, %.1f MiB' % (args.changes, megabytes))
+
+    paths = [
+        ('legacy str + lstrip + json.loads', legacy_decode),
+        ('decode_json, stdlib', stdlib_decode),
+    ]
+    if helper.orjson is not None:
+        paths.append(('decode_json, orjson', helper.decode_json))
+    else:
+        print('orjson is not installed, skipping the fast backend')
+
+    baseline = None
+    for name, decode in paths:
+        elapsed = measure(decode, content, args.rounds)
+        baseline = baseline or elapsed
+        print('%-36s %8.1f ms %8.1f MiB/s %6.2fx' % (
+            name,
+            elapsed * 1000,
+            megabytes / elapsed,
+            baseline / elapsed,
+        ))
+
+
+if __name__ == '__main__':
+    main()
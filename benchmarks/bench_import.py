@@ -0,0 +1,96 @@
+"""
+Benchmark the import time of the gerrit package
+
+Runs fresh interpreters with -X importtime and reports the median
+cumulative import time of the package and of the Gerrit class, along
+with what they pulled in.
+
+    python benchmarks/bench_import.py [--runs 10] [--max-ms 20]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = (
+    'import gerrit',
+    'from gerrit import Gerrit',
+    'from gerrit.helper import decode_json',
+)
+
+# Modules that should only be loaded once they are needed
+HEAVY = ('requests', 'asyncio', 'sqlite3', 'gerrit.changes.change', 'gerrit.projects.project')
+
+
+def import_times(statement):
+    """
+    Import statement in a fresh interpreter
+    :return: Cumulative microseconds per imported module, and of the
+        gerrit modules imported by the statement itself
+    :rtype: tuple
+    """
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=ROOT,
+        stderr=subprocess.PIPE,
+        check=True,
+    ).stderr.decode('utf-8')
+
+    times = {}
+    total = 0
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Modules imported by other modules are indented further, their
+        # time is already part of the cumulative time of their importer
+        top_level = len(name) - len(name.lstrip()) == 1
+        name = name.strip()
+        times[name] = int(cumulative)
+        if top_level and (name == 'gerrit' or name.startswith('gerrit.')):
+            total += int(cumulative)
+    return times, total
+
+
+def measure(statement, runs):
+    """
+    Median milliseconds spent importing the gerrit modules of statement
+    :return: The median and the heavy modules it loaded
+    :rtype: tuple
+    """
+    totals = []
+    loaded = ()
+    for _ in range(runs):
+        times, total = import_times(statement)
+        totals.append(total)
+        loaded = [name for name in HEAVY if name in times]
+    return statistics.median(totals) / 1000.0, loaded
+
+
+def main():
+    """
+    Run the benchmark
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-ms', type=float,
+                        help='fail if importing the package takes longer')
+    args = parser.parse_args()
+
+    results = {}
+    for statement in STATEMENTS:
+        median, loaded = measure(statement, args.runs)
+        results[statement] = median
+        print('%-40s %8.1f ms  loads %s' % (statement, median, ', '.join(loaded) or '-'))
+
+    if args.max_ms is not None and results['import gerrit'] > args.max_ms:
+        print('REGRESSION import gerrit took %.1f ms, more than %.1f ms' % (
+            results['import gerrit'], args.max_ms))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
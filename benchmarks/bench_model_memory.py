@@ -0,0 +1,140 @@
+"""
+Benchmark the memory footprint of Change and Project objects
+
+Builds the objects from a decoded /changes/ and /projects/ response and
+measures what stays allocated once the response itself is released, for
+the slotted models, which share the values that repeat across objects,
+and for a replica of the previous dict based layout.
+
+    python benchmarks/bench_model_memory.py [--objects 100000]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position,protected-access
+from bench_decode_json import change_info
+from gerrit.changes.change import Change
+from gerrit.helper import decode_json
+from gerrit.projects.project import Project
+
+
+class LegacyChange(object):
+    """The attribute layout of Change before it was slotted and shared values"""
+
+    def __init__(self, gerrit_con):
+        self._gerrit_con = gerrit_con
+        self._change_id = None
+        self.full_id = None
+        self.project = None
+        self.branch = None
+        self.change_id = None
+        self.subject = None
+        self.status = None
+        self.created = None
+        self.updated = None
+        self.mergable = None
+        self.insertions = None
+        self.deletions = None
+        self.number = None
+        self.owner = None
+        self.labels = None
+
+    def _populate(self, info):
+        # Keeps the same fields as Change, so that only the layout differs
+        for key in ('id', 'project', 'branch', 'change_id', 'subject', 'status',
+                    'created', 'updated', 'mergable', 'insertions', 'deletions',
+                    'owner', 'labels'):
+            setattr(self, 'full_id' if key == 'id' else key, info.get(key))
+        self.number = info.get('_number')
+        return self
+
+
+class LegacyProject(object):
+    """The attribute layout of Project before it was slotted and shared values"""
+
+    def __init__(self, gerrit_con):
+        self._gerrit_con = gerrit_con
+        self.name = None
+        self.parent = None
+        self.description = None
+        self.state = None
+        self.branches = None
+        self.web_links = None
+
+    def _populate(self, info):
+        for key in ('name', 'parent', 'description', 'state', 'branches', 'web_links'):
+            setattr(self, key, info.get(key))
+        return self
+
+
+def project_info(number):
+    """
+    Build a ProjectInfo with branches and web links
+    """
+    name = 'platform/component%d' % number
+    return {
+        'name': name,
+        'parent': 'All-Projects',
+        'description': 'Component number %d' % number,
+        'state': 'ACTIVE',
+        'branches': {
+            'master': '%040x' % number,
+            'stable': '%040x' % (number + 1),
+        },
+        'web_links': [{'name': 'gitweb', 'url': 'gitweb?p=%s.git;a=summary' % name}],
+    }
+
+
+def footprint(model, content):
+    """
+    Bytes kept alive by the objects built from content
+    """
+    gc.collect()
+    tracemalloc.start()
+    infos = decode_json(content)
+    objects = [model(None)._populate(info) for info in infos]
+    del infos
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+def main():
+    """
+    Run the benchmark
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--objects', type=int, default=100000)
+    args = parser.parse_args()
+
+    changes = (")]}'\n" + json.dumps([change_info(i) for i in range(args.objects)])).encode()
+    projects = (")]}'\n" + json.dumps([project_info(i) for i in range(args.objects)])).encode()
+
+    for name, legacy, slotted, content in (
+            ('Change', LegacyChange, Change, changes),
+            ('Project', LegacyProject, Project, projects),
+    ):
+        before = footprint(legacy, content)
+        after = footprint(slotted, content)
+        print('%-8s %d objects: dict based %7.1f MiB (%4d B/object), '
+              'slotted %7.1f MiB (%4d B/object), %.2fx smaller' % (
+                  name,
+                  args.objects,
+                  before / 1024.0 / 1024.0,
+                  before / args.objects,
+                  after / 1024.0 / 1024.0,
+                  after / args.objects,
+                  float(before) / after,
+              ))
+
+
+if __name__ == '__main__':
+    main()
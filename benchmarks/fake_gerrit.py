@@ -0,0 +1,260 @@
+"""
+A local stand-in for the gerrit REST API
+
+Serves the change, project, reviewer and review endpoints used by the
+client benchmarks from a thread per connection, with a configurable
+latency and response size. Nothing is stored, every change and project
+exists and every write succeeds.
+
+    python benchmarks/fake_gerrit.py [--port 8080] [--latency 5] [--payload-size 4096]
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+XSSI_PREFIX = b")]}'\n"
+
+_CHANGE = re.compile(r'^/a/changes/([^/]+)/?$')
+_REVIEWERS = re.compile(r'^/a/changes/([^/]+)/reviewers/?$')
+_REVIEW = re.compile(r'^/a/changes/([^/]+)/revisions/([^/]+)/review/?$')
+_PROJECT = re.compile(r'^/a/projects/(.+?)/?$')
+
+
+def change_info(full_id, subject='Benchmark change', padding=0):
+    """
+    Build a ChangeInfo, padded with review messages to about padding bytes
+    """
+    project, branch, change_id = (full_id.split('~') + ['master', 'I0'])[:3]
+    number = int(change_id[1:9], 16) if re.match(r'^I[0-9a-f]{8}', change_id) else 1
+    info = {
+        'id': full_id,
+        'project': project,
+        'branch': branch,
+        'change_id': change_id,
+        'subject': subject,
+        'status': 'NEW',
+        'created': '2016-02-01 09:59:32.126000000',
+        'updated': '2016-02-21 11:16:36.775000000',
+        'mergeable': True,
+        'insertions': 34,
+        'deletions': 101,
+        '_number': number,
+        'owner': {
+            '_account_id': 1000096,
+            'name': 'John Doe',
+            'email': 'john.doe@example.com',
+            'username': 'jdoe',
+        },
+        'labels': {
+            'Verified': {'approved': {'_account_id': 1000096}, 'value': 1},
+            'Code-Review': {'recommended': {'_account_id': 1000097}, 'value': 1},
+        },
+    }
+    if padding > 0:
+        info['messages'] = [{
+            'id': 'message%d' % index,
+            'author': {'_account_id': 1000096},
+            'date': '2016-02-21 11:16:36.775000000',
+            'message': 'x' * 200,
+        } for index in range(max(1, padding // 300))]
+    return info
+
+
+def project_info(name):
+    """
+    Build a ProjectInfo
+    """
+    return {
+        'id': urllib.parse.quote(name, safe=''),
+        'name': name,
+        'parent': 'All-Projects',
+        'description': 'Benchmark project',
+        'state': 'ACTIVE',
+        'branches': {'master': '%040x' % 1},
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answers the requests to the fake gerrit"""
+
+    # Keep connections alive like gerrit does, so the client pool is used
+    protocol_version = 'HTTP/1.1'
+    # The headers and body are written separately, without this every
+    # response waits for the delayed ACK of the client
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+    def _reply(self, status, body=None):
+        content = b'' if body is None else XSSI_PREFIX + json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _payload(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def _handle(self, method):  # pylint: disable=too-many-return-statements
+        server = self.server
+        payload = self._payload() if method in ('POST', 'PUT') else None
+        with server.lock:
+            server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        path = urllib.parse.urlsplit(self.path).path
+        padding = server.payload_size
+
+        match = _REVIEWERS.match(path)
+        if match and method == 'POST':
+            reviewer = payload.get('reviewer')
+            return self._reply(200, {
+                'input': reviewer,
+                'reviewers': [{'_account_id': 1000097, 'username': reviewer}],
+            })
+
+        match = _REVIEW.match(path)
+        if match and method == 'POST':
+            return self._reply(200, {'labels': payload.get('labels', {})})
+
+        match = _CHANGE.match(path)
+        if match and method == 'GET':
+            full_id = urllib.parse.unquote(match.group(1))
+            return self._reply(200, change_info(full_id, padding=padding))
+
+        if path == '/a/changes/' and method == 'POST':
+            with server.lock:
+                server.created += 1
+                change_id = 'I%08x%032x' % (server.created, 0)
+            full_id = '%s~%s~%s' % (payload.get('project'), payload.get('branch'), change_id)
+            return self._reply(201, change_info(full_id, payload.get('subject'), padding))
+
+        match = _PROJECT.match(path)
+        if match and method == 'GET':
+            return self._reply(200, project_info(urllib.parse.unquote(match.group(1))))
+        if match and method == 'PUT':
+            return self._reply(201, project_info(urllib.parse.unquote(match.group(1))))
+
+        return self._reply(404)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Handle a GET request
+        """
+        self._handle('GET')
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Handle a POST request
+        """
+        self._handle('POST')
+
+    def do_PUT(self):  # pylint: disable=invalid-name
+        """
+        Handle a PUT request
+        """
+        self._handle('PUT')
+
+
+class FakeGerrit(object):
+    """
+    A fake gerrit server running in a background thread
+    """
+
+    def __init__(self, latency=0.0, payload_size=0, host='127.0.0.1', port=0):
+        """
+        :param latency: Seconds to wait before answering each request
+        :type latency: float
+        :param payload_size: Approximate size in bytes of the ChangeInfo
+            responses, 0 for a minimal change
+        :type payload_size: int
+        :param host: The address to listen on
+        :type host: str
+        :param port: The port to listen on, 0 to pick a free one
+        :type port: int
+        """
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.latency = latency
+        self._server.payload_size = payload_size
+        self._server.lock = threading.Lock()
+        self._server.requests = 0
+        self._server.created = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        The URL to connect to
+        :rtype: str
+        """
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    @property
+    def requests(self):
+        """
+        Number of requests answered
+        :rtype: int
+        """
+        return self._server.requests
+
+    def start(self):
+        """
+        Start serving in a background thread
+        :rtype: FakeGerrit
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving and close the socket
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def main():
+    """
+    Serve until interrupted
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='milliseconds to wait before each response')
+    parser.add_argument('--payload-size', type=int, default=0,
+                        help='approximate size of the ChangeInfo responses in bytes')
+    args = parser.parse_args()
+
+    server = FakeGerrit(args.latency / 1000.0, args.payload_size, port=args.port)
+    print('Serving a fake gerrit on %s' % server.url)
+    with server:
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -6,4 +6,24 @@ A module that uses the Gerrit REST API as an interface to manage
 changes,users, groups, etcetera.
 """
 
-from .gerrit import Gerrit
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    # Only for static analysis, at runtime it is loaded by __getattr__
+    from .gerrit import Gerrit
+
+__all__ = ['Gerrit']
+
+
+def __getattr__(name):
+    # Importing Gerrit loads requests, defer it until it is used so that
+    # importing the package or one of its helpers stays cheap
+    if name == 'Gerrit':
+        from .gerrit import Gerrit  # pylint: disable=import-outside-toplevel
+        globals()['Gerrit'] = Gerrit
+        return Gerrit
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,27 @@
+"""
+python-gerrit asyncio
+=====================
+
+An asyncio interface to the Gerrit REST API, requires aiohttp.
+"""
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    # Only for static analysis, at runtime it is loaded by __getattr__
+    from .gerrit import AsyncGerrit
+
+__all__ = ['AsyncGerrit']
+
+
+def __getattr__(name):
+    # Importing AsyncGerrit loads aiohttp, defer it until it is used
+    if name == 'AsyncGerrit':
+        from .gerrit import AsyncGerrit  # pylint: disable=import-outside-toplevel
+        globals()['AsyncGerrit'] = AsyncGerrit
+        return AsyncGerrit
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
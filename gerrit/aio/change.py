@@ -0,0 +1,177 @@
+"""
+AsyncChange
+===========
+
+Manage gerrit changes with asyncio
+"""
+# The coroutines intentionally override the blocking methods.
+# pylint: disable=invalid-overridden-method
+
+from gerrit.bulk import DEFAULT_WORKERS
+from gerrit.projects.project import Project
+from gerrit.changes.change import Change
+from gerrit.aio.reviewer import AsyncReviewer
+from gerrit.aio.revision import AsyncRevision
+
+
+class AsyncChange(Change):
+    """Manage gerrit changes with asyncio"""
+
+    __slots__ = ()
+
+    async def get_change(self, project, branch, change_id, options=None):
+        """
+        Get ChangeInfo for a change
+        :param options: Additional fields to include, e.g. ['LABELS']
+        :type options: list
+        :returns: Dict of the ChangeInfo for the change
+        :rtype: AsyncChange
+        :exception: ValueError, UnhandledError
+        """
+        r_endpoint = self._get_change_endpoint(project, branch, change_id, options)
+
+        req = await self._gerrit_con.call(r_endpoint=r_endpoint)
+
+        return self._get_change_result(req, options)
+
+    async def load_fields(self, fields=None):
+        """
+        Fetch lazily loaded fields of the change with a single request
+        :param fields: Names of the fields to fetch, e.g. ['labels'],
+            defaults to all fields that weren't fetched yet
+        :type fields: list
+        :rtype: AsyncChange
+        :exception: KeyError, ValueError, UnhandledError
+        """
+        r_endpoint, fields = self._load_fields_request(fields)
+        if not fields:
+            return self
+
+        req = await self._gerrit_con.call(r_endpoint=r_endpoint)
+
+        return self._load_fields_result(req, fields)
+
+    def _load_missing(self):
+        """
+        Fields can't be fetched when they are read without blocking
+        """
+        raise AttributeError(
+            'The field was not fetched, pass it in options or await load_fields() first'
+        )
+
+    async def create_change(self, project, subject, branch, options, refresh=False):
+        """
+        Create a change
+        :param project: Project to create change in
+        :type project: str or gerrit.project.Project
+        :param subject: Subject of the change
+        :type subject: str
+        :param branch: The name of the target branch
+        :type branch: str
+        :param options: Additional options
+        :type options: dict
+        :param refresh: Fetch the change after creating it
+        :type refresh: bool
+        :rtype: AsyncChange
+        :exception: UnhandledError
+        """
+
+        if isinstance(project, Project):
+            project = project.name
+
+        req = await self._gerrit_con.call(
+            request='post',
+            r_endpoint="/a/changes/",
+            r_payload=self._create_change_payload(project, subject, branch, options),
+        )
+
+        change_info = self._create_change_result(req)
+
+        change = AsyncChange(self._gerrit_con)
+        if refresh:
+            return await change.get_change(project, branch, change_info.get('change_id'))
+
+        return change._populate(change_info)  # pylint: disable=protected-access
+
+    async def submit_change(self, options=None):
+        """
+        Submit the change
+        :param options: Additional options
+        :type options: dict
+        :rtype: AsyncChange
+        """
+
+        r_endpoint = {
+            'pre': '/a/changes/',
+            'data': self.full_id,
+            'post': '/submit/',
+        }
+
+        if options is None:
+            options = {}
+
+        req = await self._gerrit_con.call(
+            request='post',
+            r_endpoint=r_endpoint,
+            r_payload=options,
+        )
+
+        return self._submit_change_result(req)
+
+    async def add_reviewer(self, account_id):
+        """
+        Add a reviewer to the change
+        :param account_id: The user account that should be added as a reviewer
+        :type account_id: str
+        :rtype: bool
+        :except: LookupError, AlreadyExists, UnhandledError
+        """
+        reviewer = AsyncReviewer(self._gerrit_con, self.change_id)
+        return await reviewer.add_reviewer(account_id)
+
+    async def add_reviewers(self, accounts, max_workers=DEFAULT_WORKERS, single_request=False):
+        """
+        Add many reviewers to the change at once
+        :param accounts: The user accounts that should be added as reviewers
+        :type accounts: list
+        :param max_workers: Maximum number of requests running at once
+        :type max_workers: int
+        :param single_request: Add all accounts with one review request
+        :type single_request: bool
+        :rtype: dict
+        """
+        reviewer = AsyncReviewer(self._gerrit_con, self.change_id)
+        return await reviewer.add_reviewers(accounts, max_workers, single_request)
+
+    async def delete_reviewer(self, account_id):
+        """
+        Delete a reviewer from the change
+        :param account_id: Remove a user with account-id as reviewer.
+        :type account_id: str
+        :rtype: bool
+        :exception: error.AuthorizationError
+        """
+        reviewer = AsyncReviewer(self._gerrit_con, self.change_id)
+        return await reviewer.delete_reviewer(account_id)
+
+    async def list_reviewers(self):
+        """
+        List reviewers for the change
+        :rtype: dict
+        :exception: ValueError, UnhandledError
+        """
+        reviewer = AsyncReviewer(self._gerrit_con, self.change_id)
+        return await reviewer.list_reviewers()
+
+    async def set_review(self, labels=None, message='', comments=None, revision='current'):
+        """
+        Create a review for the change and a specific patch set
+        :param labels: This is used to set +2 Code-Review for example.
+        :type labels: dict
+        :param message: The message will appear in the actually change-request page.
+        :type message: str
+        :param comments: This will become comments in the code.
+        :type comments: dict
+        """
+        revision = AsyncRevision(self._gerrit_con, self.change_id, revision)
+        return await revision.set_review(labels=labels, message=message, comments=comments)
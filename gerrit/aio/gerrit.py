@@ -0,0 +1,410 @@
+"""
+AsyncGerrit
+===========
+
+Set up an asyncio connection to gerrit
+"""
+
+import asyncio
+from base64 import b64encode
+
+
+from gerrit.aio.change import AsyncChange
+from gerrit.aio.project import AsyncProject
+from gerrit.aio.revision import AsyncRevision
+from gerrit.aio.singleflight import AsyncSingleFlight
+from gerrit.bulk import (
+    DEFAULT_WORKERS,
+    BulkResult,
+    review_args,
+)
+from gerrit.cache import ContentCache, MemoryCache
+from gerrit.credentials import get_netrc_auth
+from gerrit.error import CredentialsNotFound
+from gerrit.helper import process_endpoint
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+class Response(object):
+    """The parts of a gerrit response that are used by the models"""
+
+    def __init__(self, status_code, content, headers=None):
+        """
+        :param status_code: HTTP status code of the response
+        :type status_code: int
+        :param content: The raw body of the response
+        :type content: bytes
+        :param headers: The response headers
+        :type headers: dict
+        """
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers if headers is not None else {}
+
+
+class StreamedResponse(object):
+    """A gerrit response whose body is read as it is consumed"""
+
+    def __init__(self, response):
+        """
+        :param response: The response, with its body still unread
+        :type response: aiohttp.ClientResponse
+        """
+        self._response = response
+        self.status_code = response.status
+        self.headers = response.headers
+        self.content = None
+
+    async def read(self):
+        """
+        Read the whole body, e.g. the message of an error
+        :rtype: bytes
+        """
+        self.content = await self._response.read()
+        return self.content
+
+    def iter_content(self, chunk_size):
+        """
+        Read the body in pieces
+        :param chunk_size: Maximum number of bytes per piece
+        :type chunk_size: int
+        :rtype: async iterator of bytes
+        """
+        return self._response.content.iter_chunked(chunk_size)
+
+    def close(self):
+        """
+        Release the connection
+        """
+        self._response.release()
+
+
+class AsyncGerrit(object):
+    """Set up an asyncio connection to gerrit"""
+
+    def __init__(self, url, auth_type=None, limit=100, limit_per_host=10,  # pylint: disable=too-many-arguments
+                 *, single_flight=False, credentials=None, revision_cache=False, **kwargs):
+        """
+        :param url: URL to the gerrit server
+        :type url: str
+        :param auth_type: Authentication method preferred
+        :type auth_type: str
+        :param limit: Maximum number of simultaneous connections
+        :type limit: int
+        :param limit_per_host: Maximum number of simultaneous connections
+            to the gerrit server
+        :type limit_per_host: int
+        :param single_flight: Send concurrent identical GET requests once
+            and share the response between the callers. Off by default as
+            a GET sent right after a write may then get the response of a
+            GET that was sent before the write.
+        :type single_flight: bool
+        :param credentials: Where to look up the user and password when
+            auth_id and auth_pw aren't given, defaults to the netrc file
+        :type credentials: gerrit.credentials.NetrcProvider,
+            gerrit.credentials.EnvProvider,
+            gerrit.credentials.FileTokenProvider or
+            gerrit.credentials.ChainProvider
+        :param revision_cache: Keeps the files, diffs, patches and commits
+            of revisions by commit SHA, True for an in memory cache, a
+            gerrit.cache.SqliteCache to keep them on disk. Revisions that
+            aren't addressed by their SHA, e.g. 'current', are resolved
+            with an extra request the first time they are read.
+        :type revision_cache: bool or gerrit.cache.ResponseCache
+        """
+        if aiohttp is None:
+            raise ImportError('AsyncGerrit requires aiohttp to be installed')
+
+        # HTTP REST API HEADERS
+        self._requests_headers = {
+            'content-type': 'application/json',
+        }
+
+        self._url = url.rstrip('/')
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+
+        # The aiohttp session has to be created inside the event loop, so
+        # it is set up on the first call instead.
+        self._session = None
+        self._auth = None
+        self._auth_id = None
+        self._credentials = credentials
+        self._auth_kwargs = kwargs
+        self._single_flight = AsyncSingleFlight() if single_flight else None
+        if revision_cache is True:
+            revision_cache = MemoryCache(max_bytes=32 * 1024 * 1024)
+        self._revision_cache = revision_cache
+
+        if auth_type and auth_type != 'http':
+            raise NotImplementedError(
+                "Authorization type '%s' is not implemented" %
+                auth_type)
+        self._http_auth(**kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """
+        Close the session and release all pooled connections
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def single_flight_stats(self):
+        """
+        How many GET requests were sent and how many were served by an
+        identical request that was already in flight
+        :return: e.g. {'sent': 10, 'coalesced': 40}, None if single flight
+            is disabled
+        :rtype: dict
+        """
+        if self._single_flight is None:
+            return None
+        return self._single_flight.stats()
+
+    def refresh_credentials(self):
+        """
+        Look up the credentials again, e.g. after a token was rotated,
+        and use them for the following calls
+        :exception: CredentialsNotFound
+        """
+        self._http_auth(**self._auth_kwargs)
+
+    def _http_auth(self, **kwargs):
+        # Assume netrc file if no auth_id or auth_pw was given.
+        if 'auth_id' in kwargs and 'auth_pw' in kwargs:
+            auth_id = kwargs['auth_id']
+            auth_pw = kwargs['auth_pw']
+        elif 'auth_id' not in kwargs and 'auth_pw' not in kwargs:
+            if self._credentials is not None:
+                credentials = self._credentials.get_credentials(self._url)
+                source = type(self._credentials).__name__
+            else:
+                credentials = get_netrc_auth(self._url)
+                source = '.netrc'
+            if not credentials:
+                raise CredentialsNotFound(
+                    "No Credentials for %s found in %s" %
+                    (self._url, source))
+            auth_id, auth_pw = credentials
+        else:
+            raise CredentialsNotFound(
+                'Supply both auth_id and auth_pw or neither')
+
+        if kwargs.get('auth_method', 'basic') != 'basic':
+            raise NotImplementedError(
+                "Authorization method '%s' for auth_type 'http' is not implemented" %
+                kwargs['auth_method'])
+
+        self._auth = 'Basic %s' % b64encode(
+            ('%s:%s' % (auth_id, auth_pw)).encode('latin1')
+        ).decode('ascii')
+        self._auth_id = auth_id
+
+    def _get_session(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self._limit,
+                limit_per_host=self._limit_per_host,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def call(self, request='get', r_endpoint=None, r_payload=None, r_headers=None,  # pylint: disable=too-many-arguments
+                   stream=False):
+        """
+        Send request to gerrit.
+        :param request: The type of http request to perform
+        :type request: str
+        :param r_endpoint: The gerrit REST API endpoint to hit
+        :type r_endpoint: str
+        :param r_payload: The data to send to the specified API endpoint
+        :type r_payload: dict
+        :param stream: Don't read the body up front, the response has to
+            be closed once it is consumed. Streamed calls are not coalesced.
+        :type stream: bool
+
+        :return: The http response with its body read, or a
+            StreamedResponse when streaming
+        :rtype: gerrit.aio.gerrit.Response
+        """
+
+        if r_headers is None:
+            r_headers = self._requests_headers
+        url = self._url + process_endpoint(r_endpoint)
+
+        if stream:
+            return await self._stream(request, url, r_payload, r_headers)
+
+        if request == 'get' and r_payload is None and self._single_flight is not None:
+            key = (url,) + tuple(sorted(r_headers.items()))
+            return await self._single_flight.do(key, self._send, request, url, r_payload, r_headers)
+        return await self._send(request, url, r_payload, r_headers)
+
+    def _request(self, request, url, r_payload, r_headers):
+        r_headers = dict(r_headers, authorization=self._auth)
+
+        request_do = {
+            'get': 'GET',
+            'put': 'PUT',
+            'post': 'POST',
+            'delete': 'DELETE',
+        }
+        return self._get_session().request(
+            request_do[request],
+            url,
+            headers=r_headers,
+            json=r_payload,
+        )
+
+    async def _stream(self, request, url, r_payload, r_headers):
+        return StreamedResponse(await self._request(request, url, r_payload, r_headers))
+
+    async def _send(self, request, url, r_payload, r_headers):
+        async with self._request(request, url, r_payload, r_headers) as resp:
+            content = await resp.read()
+        return Response(resp.status, content, resp.headers)
+
+    def get_revision(self, change_id, revision_id=None):
+        """
+        Get a revision
+        :param change_id: The Change-Id to fetch from gerrit
+        :type change_id: str
+        :param revision_id: The optional patch set for the change
+        :type revision_id: str
+
+        :return: Review object
+        :rtype: gerrit.aio.revision.AsyncRevision
+        """
+        cache = None
+        # An empty cache is falsy, only None and False disable it
+        if self._revision_cache is not None and self._revision_cache is not False:
+            # Users may see different things, so caches shared between
+            # connections must not mix up their content
+            cache = ContentCache(self._revision_cache, '%s %s' % (self._auth_id, self._url))
+
+        return AsyncRevision(self, change_id, revision_id, cache=cache)
+
+    async def create_project(self, name, options=None, refresh=False):
+        """
+        Create a project
+        :param name: Name of the project
+        :type name: str
+        :param options: Additional options
+        :type options: dict
+        :param refresh: Fetch the project after creating it
+        :type refresh: bool
+
+        :return: Project if successful
+        :rtype: gerrit.aio.project.AsyncProject
+        :exception: AlreadyExists, UnhandledError
+        """
+
+        project = AsyncProject(self)
+        return await project.create_project(name, options, refresh)
+
+    async def get_project(self, name):
+        """
+        Get a project
+        :param name: Project name to get
+        :type name: str
+
+        :return: Project object
+        :rtype: gerrit.aio.project.AsyncProject
+        """
+
+        project = AsyncProject(self)
+        return await project.get_project(name)
+
+    async def create_change(self, project, subject, branch='master', options=None,
+                            refresh=False):
+        """
+        Create a change
+        :param project: Project to create change in
+        :type project: str or gerrit.project.Project
+        :param subject: Subject of the change
+        :type subject: str
+        :param branch: The name of the target branch
+        :type branch: str
+        :param options: Additional options
+        :type options: dict
+        :param refresh: Fetch the change after creating it
+        :type refresh: bool
+        """
+
+        change = AsyncChange(self)
+        return await change.create_change(project, subject, branch, options, refresh)
+
+    async def get_change(self, project, change_id, branch='master', options=None):
+        """
+        Get a change
+        :param project: Project that contains change
+        :type project: str or gerrit.projects.Project
+        :param change_id: ID of change
+        :type change_id: str
+        :param branch: Branch change exists in
+        :type branch: str
+        :param options: Additional fields to include, e.g. ['LABELS'],
+            fields that are left out are fetched when they are first read
+        :type options: list
+        """
+        change = AsyncChange(self)
+        return await change.get_change(project, branch, change_id, options)
+
+    async def set_reviews(self, reviews, max_workers=DEFAULT_WORKERS):
+        """
+        Set reviews on many changes with bounded concurrency
+        :param reviews: Tuples of (change, revision, labels, message,
+            comments), everything after the change is optional
+        :type reviews: iterable
+        :param max_workers: Maximum number of requests running at once
+        :type max_workers: int
+
+        :return: A result per review as soon as it completes, with the
+            exception it failed with as error
+        :rtype: async generator of gerrit.bulk.BulkResult
+        """
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1')
+
+        async def set_review(item):
+            change_id, revision_id, labels, message, comments = review_args(item)
+            revision = AsyncRevision(self, change_id, revision_id)
+            return await revision.set_review(labels=labels, message=message, comments=comments)
+
+        reviews = iter(reviews)
+        pending = {}
+
+        try:
+            while True:
+                while len(pending) < max_workers:
+                    try:
+                        item = next(reviews)
+                    except StopIteration:
+                        break
+                    pending[asyncio.ensure_future(set_review(item))] = item
+
+                if not pending:
+                    return
+
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    item = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        yield BulkResult(item, task.result(), None)
+                    else:
+                        yield BulkResult(item, None, error)
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,82 @@
+"""
+AsyncProject
+============
+
+Manage gerrit projects with asyncio
+"""
+# The coroutines intentionally override the blocking methods.
+# pylint: disable=invalid-overridden-method
+
+from gerrit.projects.project import Project
+
+
+class AsyncProject(Project):
+    """Manage gerrit projects with asyncio"""
+
+    __slots__ = ()
+
+    async def get_project(self, name):
+        """
+        Get ProjectInfo for a project
+        :rtype: AsyncProject
+        :exception: ValueError, UnhandledError
+        """
+
+        if name == '':
+            raise KeyError('Project name required')
+
+        r_endpoint = "/a/projects/%s/" % name
+
+        req = await self._gerrit_con.call(r_endpoint=r_endpoint)
+
+        return self._get_project_result(req)
+
+    async def create_project(self, name, options, refresh=False):
+        """
+        Create a project
+        :param name: Name of the project
+        :type name: str
+        :param options: Additional options
+        :type options: dict, None
+        :param refresh: Fetch the project after creating it
+        :type refresh: bool
+
+        :return: Project if successful
+        :rtype: gerrit.aio.project.AsyncProject
+        :exception: AlreadyExists, UnhandledError
+        """
+
+        r_endpoint = "/a/projects/%s" % name
+
+        if options is None:
+            options = {}
+
+        req = await self._gerrit_con.call(
+            request='put',
+            r_endpoint=r_endpoint,
+            r_payload=options,
+        )
+
+        project_info = self._create_project_result(req)
+
+        if refresh:
+            return await self.get_project(name)
+
+        return self._populate(project_info)
+
+    async def delete(self, options=None):
+        """
+        Delete the project, requires delete-project plugin
+        :returns: True if delete succeeds
+        :rtype: Bool
+        :exception: UnhandledError
+        """
+        r_endpoint = '/a/projects/%s' % self.name
+
+        req = await self._gerrit_con.call(request='delete',
+                                          r_endpoint=r_endpoint,
+                                          r_headers={},
+                                          r_payload=options,
+                                         )
+
+        return self._delete_result(req)
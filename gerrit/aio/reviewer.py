@@ -0,0 +1,105 @@
+"""
+AsyncReviewer
+=============
+
+Manage gerrit reviewers for a specific change_id with asyncio
+"""
+# The coroutines intentionally override the blocking methods.
+# pylint: disable=invalid-overridden-method
+
+import asyncio
+
+from gerrit.bulk import DEFAULT_WORKERS
+from gerrit.changes.reviewer import Reviewer
+
+
+class AsyncReviewer(Reviewer):
+    """Manage gerrit reviewers for a change with asyncio"""
+
+    __slots__ = ()
+
+    async def add_reviewer(self, account_id):
+        """
+        Endpoint for adding a reviewer to a change-id
+        :param account_id: The user account that should be added as a reviewer
+        :type account_id: str
+        :rtype: bool
+        :except: LookupError, AlreadyExists, UnhandledError
+        """
+        r_endpoint = "/a/changes/%s/reviewers" % self._change_id
+        payload = {"reviewer": "%s" % account_id}
+
+        req = await self._gerrit_con.call(
+            request='post',
+            r_endpoint=r_endpoint,
+            r_payload=payload
+        )
+
+        return self._add_reviewer_result(account_id, req.content.decode('utf-8'))
+
+    async def add_reviewers(self, accounts, max_workers=DEFAULT_WORKERS, single_request=False):
+        """
+        Endpoint for adding many reviewers to a change-id at once
+        :param accounts: The user accounts that should be added as reviewers
+        :type accounts: list
+        :param max_workers: Maximum number of requests running at once
+        :type max_workers: int
+        :param single_request: Add all accounts with one review request
+        :type single_request: bool
+        :return: Per account, True if the account was added or the
+            LookupError, AlreadyExists or UnhandledError it failed with
+        :rtype: dict
+        """
+        if single_request:
+            r_endpoint = "/a/changes/%s/revisions/current/review" % self._change_id
+
+            req = await self._gerrit_con.call(
+                request='post',
+                r_endpoint=r_endpoint,
+                r_payload=self._add_reviewers_payload(accounts)
+            )
+
+            return self._add_reviewers_result(accounts, req)
+
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def add(account_id):
+            async with semaphore:
+                return await self.add_reviewer(account_id)
+
+        results = dict.fromkeys(accounts)
+        outcomes = await asyncio.gather(*[add(account_id) for account_id in results],
+                                        return_exceptions=True)
+        results.update(zip(results, outcomes))
+
+        return results
+
+    async def delete_reviewer(self, account_id):
+        """
+        Endpoint to delete a reviewer from a change-id
+        :param account_id: Remove a user with account-id as reviewer.
+        :type account_id: str
+        :rtype: bool
+        :exception: error.AuthorizationError
+        """
+        r_endpoint = "/a/changes/%s/reviewers/%s" % (self._change_id, account_id)
+
+        req = await self._gerrit_con.call(
+            request='delete',
+            r_endpoint=r_endpoint,
+            r_headers={},
+        )
+
+        return self._delete_reviewer_result(req)
+
+    async def list_reviewers(self):
+        """
+        Endpoint to list reviewers for a change-id
+        :rtype: dict
+        :exception: ValueError, UnhandledError
+        """
+        r_endpoint = "/a/changes/%s/reviewers/" % self._change_id
+
+        req = await self._gerrit_con.call(r_endpoint=r_endpoint)
+
+        return self._list_reviewers_result(req)
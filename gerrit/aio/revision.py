@@ -0,0 +1,176 @@
+"""
+AsyncRevision
+=============
+
+Manage gerrit revisions for a change id with asyncio
+"""
+# The coroutines intentionally override the blocking methods.
+# pylint: disable=invalid-overridden-method
+
+import base64
+
+from gerrit.changes.revision import DOWNLOAD_CHUNK_SIZE, Revision, _Writer
+from gerrit.helper import Base64Decoder, decode_json
+
+
+class AsyncRevision(Revision):
+    """Manage gerrit revisions with asyncio"""
+
+    __slots__ = ()
+
+    async def set_review(self, labels=None, message='', comments=None):
+        """
+        Endpoint to create a review for a change_id and a specific patch set
+        :param labels: This is used to set +2 Code-Review for example.
+        :type labels: dict
+        :param message: The message will appear in the actually change-request page.
+        :type message: str
+        :param comments: This will become comments in the code.
+        :type comments: dict
+        """
+        r_endpoint = "/a/changes/%s/revisions/%s/review" % (self._change_id,
+                                                            self._revision_id)
+
+        req = await self._gerrit_con.call(
+            request='post',
+            r_endpoint=r_endpoint,
+            r_payload=self._set_review_payload(labels, message, comments)
+        )
+
+        return self._set_review_result(req)
+
+    async def resolve(self):
+        """
+        Get the commit SHA of the revision, symbolic ids like 'current' are
+        only resolved once
+        :rtype: str
+        :exception: ValueError, UnhandledError
+        """
+        if self._sha is None and self._cache is not None and self._patch_set_key() is not None:
+            sha = self._cache.get(self._patch_set_key())
+            if sha is not None:
+                self._sha = sha.decode('ascii')
+
+        if self._sha is None:
+            req = await self._gerrit_con.call(
+                r_endpoint=self._endpoint(self._revision_id, 'commit'))
+            self._resolved(self._content_result(req))
+
+        return self._sha
+
+    async def _read(self, view):
+        """
+        Read a view of the revision, from the cache if it was read before
+        :rtype: bytes
+        :exception: ValueError, UnhandledError
+        """
+        if self._cache is not None:
+            await self.resolve()
+            content = self._cached(view)
+            if content is not None:
+                return content
+
+        req = await self._gerrit_con.call(
+            r_endpoint=self._endpoint(self._sha or self._revision_id, view))
+        content = self._content_result(req)
+        self._store(view, content)
+        return content
+
+    async def get_commit(self):
+        """
+        Get the commit of the revision
+        :returns: The CommitInfo, with the SHA as 'commit'
+        :rtype: dict
+        :exception: ValueError, UnhandledError
+        """
+        return decode_json(await self._read('commit'))
+
+    async def get_files(self):
+        """
+        Get the files modified by the revision
+        :returns: FileInfo entities keyed on path
+        :rtype: dict
+        :exception: ValueError, UnhandledError
+        """
+        return decode_json(await self._read('files/'))
+
+    async def get_diff(self, path):
+        """
+        Get the diff of a file against the parent of the revision
+        :param path: Path of the file
+        :type path: str
+        :returns: The DiffInfo
+        :rtype: dict
+        :exception: ValueError, UnhandledError
+        """
+        return decode_json(await self._read(self._file_view(path, 'diff')))
+
+    async def get_patch(self):
+        """
+        Get the revision formatted as a patch
+        :returns: The patch, as git format-patch would write it
+        :rtype: bytes
+        :exception: ValueError, UnhandledError
+        """
+        return base64.b64decode(await self._read('patch'))
+
+    async def _download(self, view, dest, chunk_size):
+        """
+        Stream base64 content and write it decoded, a chunk at a time
+        :rtype: int
+        :exception: ValueError, UnhandledError
+        """
+        req = await self._gerrit_con.call(
+            r_endpoint=self._endpoint(self._sha or self._revision_id, view),
+            stream=True,
+        )
+        try:
+            if req.status_code != 200:
+                await req.read()
+                self._content_result(req)
+
+            writer = _Writer(dest)
+            decoder = Base64Decoder()
+            try:
+                async for chunk in req.iter_content(chunk_size):
+                    writer.write(decoder.decode(chunk))
+                decoder.finish()
+            except BaseException:
+                writer.close(failed=True)
+                raise
+            writer.close()
+            return writer.written
+        finally:
+            req.close()
+
+    async def download_patch(self, dest, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """
+        Download the revision formatted as a patch without holding it in
+        memory
+        :param dest: Path to write the patch to, or a binary file object or
+            a bytearray or memoryview large enough to hold it
+        :type dest: str, os.PathLike, file, bytearray or memoryview
+        :param chunk_size: Number of bytes to read from the socket at a time
+        :type chunk_size: int
+        :returns: The size of the patch
+        :rtype: int
+        :exception: ValueError, UnhandledError
+        """
+        return await self._download('patch', dest, chunk_size)
+
+    async def download_file(self, path, dest, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """
+        Download the content of a file of the revision without holding it
+        in memory
+        :param path: Path of the file in the revision
+        :type path: str
+        :param dest: Path to write the content to, or a binary file object
+            or a bytearray or memoryview large enough to hold it
+        :type dest: str, os.PathLike, file, bytearray or memoryview
+        :param chunk_size: Number of bytes to read from the socket at a time
+        :type chunk_size: int
+        :returns: The size of the file
+        :rtype: int
+        :exception: ValueError, UnhandledError
+        """
+        return await self._download(self._file_view(path, 'content'), dest, chunk_size)
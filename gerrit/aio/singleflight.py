@@ -0,0 +1,65 @@
+"""
+AsyncSingleFlight
+=================
+
+Coalesce concurrent identical calls into one with asyncio
+"""
+
+import asyncio
+
+
+class AsyncSingleFlight(object):
+    """
+    Run a coroutine once for all tasks asking for the same key at the same
+    time, the tasks arriving while it is in flight await its result
+    """
+
+    def __init__(self):
+        self.sent = 0
+        self.coalesced = 0
+        self._tasks = {}
+
+    def stats(self):
+        """
+        How many calls were made and how many were served by a call that
+        was already in flight
+        :rtype: dict
+        """
+        return {'sent': self.sent, 'coalesced': self.coalesced}
+
+    def in_flight(self):
+        """
+        Number of calls currently in flight
+        :rtype: int
+        """
+        return len(self._tasks)
+
+    def _done(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # The waiters may all have been cancelled, don't leave the
+        # exception unretrieved
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key, func, *args, **kwargs):
+        """
+        Await func, unless a call with the same key is already in flight.
+        Cancelling a caller doesn't cancel the call the others wait for.
+        :param key: What identifies identical calls
+        :type key: hashable
+        :param func: The coroutine function to call
+        :type func: callable
+        :return: The result of the call, shared by all callers
+        :exception: Whatever the call raised, raised in all callers
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda task: self._done(key, task))
+            self.sent += 1
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
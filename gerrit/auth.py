@@ -0,0 +1,86 @@
+"""
+Auth
+====
+
+HTTP authentication for gerrit
+"""
+
+import re
+import threading
+
+from requests.auth import HTTPDigestAuth
+from requests.utils import parse_dict_header
+
+_DIGEST = re.compile(r'digest ', flags=re.IGNORECASE)
+
+
+class SharedDigestAuth(HTTPDigestAuth):
+    """
+    Digest authentication that keeps the server nonce between calls and
+    shares it between threads, so only the first call and calls made
+    after the server marked the nonce stale pay for a 401 challenge.
+    The nonce count is shared too, each request gets the next one.
+    """
+
+    def __init__(self, username, password):
+        """
+        :param username: The gerrit user
+        :type username: str
+        :param password: The HTTP password of the user
+        :type password: str
+        """
+        super().__init__(username, password)
+        self._lock = threading.Lock()
+        self._chal = {}
+        self._last_nonce = ''
+        self._nonce_count = 0
+
+    @property
+    def nonce(self):
+        """
+        The nonce in use, None before the first challenge
+        :rtype: str
+        """
+        with self._lock:
+            return self._chal.get('nonce')
+
+    def build_digest_header(self, method, url):
+        # Sign with the shared challenge and continue its nonce count, the
+        # parent class keeps them per thread
+        with self._lock:
+            local = self._thread_local
+            local.chal = self._chal
+            local.last_nonce = self._last_nonce
+            local.nonce_count = self._nonce_count
+            header = super().build_digest_header(method, url)
+            self._last_nonce = local.last_nonce
+            self._nonce_count = local.nonce_count
+        return header
+
+    def handle_401(self, r, **kwargs):
+        s_auth = r.headers.get('www-authenticate', '')
+        if r.status_code != 401 or 'digest' not in s_auth.lower():
+            return super().handle_401(r, **kwargs)
+
+        chal = parse_dict_header(_DIGEST.sub('', s_auth, count=1))
+        if ('Authorization' in r.request.headers and
+                chal.get('stale', '').lower() != 'true'):
+            # The credentials were refused, a new nonce won't change that
+            self._thread_local.num_401_calls = 1
+            return r
+
+        with self._lock:
+            if chal.get('nonce') != self._chal.get('nonce'):
+                self._chal = chal
+                self._last_nonce = ''
+                self._nonce_count = 0
+
+        return super().handle_401(r, **kwargs)
+
+    def __call__(self, r):
+        self.init_per_thread_state()
+        # The parent class only signs up front when this thread has seen
+        # a nonce, any thread having seen one is enough
+        with self._lock:
+            self._thread_local.last_nonce = self._last_nonce
+        return super().__call__(r)
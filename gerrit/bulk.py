@@ -0,0 +1,93 @@
+"""
+Bulk
+====
+
+Run many gerrit calls over a bounded pool of workers
+"""
+
+import collections
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    wait,
+)
+
+# Keep below the connection pool size of Gerrit so workers don't queue
+# up for a connection
+DEFAULT_WORKERS = 8
+
+BulkResult = collections.namedtuple('BulkResult', ('item', 'value', 'error'))
+BulkResult.__doc__ = """
+The outcome of one item of a bulk operation, error is the exception
+raised for the item or None if it succeeded
+"""
+
+
+def run_bulk(func, items, max_workers=DEFAULT_WORKERS):
+    """
+    Call func for every item over a pool of worker threads
+    :param func: Called with one item at a time
+    :type func: callable
+    :param items: The items to process, consumed lazily
+    :type items: iterable
+    :param max_workers: Maximum number of calls running at once
+    :type max_workers: int
+
+    :return: The results in the order they complete, exceptions raised by
+        func are captured in the result instead of being raised
+    :rtype: generator of BulkResult
+    """
+    if max_workers < 1:
+        raise ValueError('max_workers must be at least 1')
+
+    items = iter(items)
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            while True:
+                # Only keep a couple of items per worker in flight so huge
+                # or endless iterables are not queued up all at once
+                while len(pending) < max_workers * 2:
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        break
+                    pending[executor.submit(func, item)] = item
+
+                if not pending:
+                    return
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        yield BulkResult(item, future.result(), None)
+                    else:
+                        yield BulkResult(item, None, error)
+        finally:
+            # The caller stopped early, don't start what is still queued
+            for future in pending:
+                future.cancel()
+
+
+def review_args(item):
+    """
+    Unpack one review of a bulk set_reviews
+    :param item: (change, revision, labels, message, comments), everything
+        after the change is optional and the revision defaults to 'current'
+    :type item: tuple
+    :return: The Change-Id, revision, labels, message and comments
+    :rtype: tuple
+    :exception: ValueError
+    """
+    if not 1 <= len(item) <= 5:
+        raise ValueError('A review is (change, revision, labels, message, comments)')
+
+    change, revision, labels, message, comments = tuple(item) + (None,) * (5 - len(item))
+
+    # Accept Change objects as well as plain Change-Ids
+    change_id = getattr(change, 'change_id', change)
+
+    return change_id, revision or 'current', labels, message or '', comments
@@ -0,0 +1,539 @@
+"""
+Cache
+=====
+
+Cache the responses of gerrit GET requests
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import requests
+
+from gerrit.helper import PROJECT_VIEWS
+
+# Seconds that responses of each endpoint family are considered fresh.
+# Families that are left out are not cached.
+DEFAULT_TTL = {
+    'projects': 60,
+    'changes': 10,
+    'reviewers': 10,
+}
+
+
+def _segments(endpoint):
+    """
+    Split an endpoint into its path segments, without the /a/ prefix
+    """
+    segments = endpoint.split('?')[0].strip('/').split('/')
+    if segments[:1] == ['a']:
+        segments = segments[1:]
+    return segments
+
+
+def endpoint_family(endpoint):
+    """
+    Get the family of a gerrit endpoint
+    :param endpoint: The processed endpoint, e.g. /a/changes/X/reviewers/
+    :type endpoint: str
+    :returns: 'changes', 'projects', 'reviewers' or None
+    :rtype: str
+    """
+    segments = _segments(endpoint)
+
+    if segments[0] == 'changes':
+        if segments[2:3] == ['reviewers']:
+            return 'reviewers'
+        return 'changes'
+    elif segments[0] == 'projects':
+        return 'projects'
+
+    return None
+
+
+def resource_tag(endpoint):
+    """
+    Get a tag identifying the resource an endpoint belongs to, so that a
+    write to a resource can invalidate all of its cached reads
+    :param endpoint: The processed endpoint, e.g. /a/changes/X/reviewers/
+    :type endpoint: str
+    :returns: e.g. 'changes/I8473b95934b5732ac55d26311a706c9c2bde9940', or
+        the family itself for collections and queries
+    :rtype: str
+    """
+    segments = _segments(endpoint)
+    family = segments[0]
+
+    if len(segments) < 2 or segments[1] == '':
+        return family
+
+    if family == 'changes':
+        # A change can be addressed by its triplet, Change-Id or number,
+        # the last part of the triplet is the same for all of them but
+        # the number.
+        return 'changes/%s' % urllib.parse.unquote(segments[1]).split('~')[-1]
+    elif family == 'projects':
+        name = []
+        for segment in segments[1:]:
+            if segment in PROJECT_VIEWS:
+                break
+            name.append(segment)
+        return 'projects/%s' % urllib.parse.unquote('/'.join(name))
+
+    return family
+
+
+class CacheEntry(object):
+    """A cached gerrit response"""
+
+    def __init__(self, status_code, content, etag, expires, tags):
+        """
+        :param status_code: HTTP status code of the response
+        :type status_code: int
+        :param content: The raw body of the response
+        :type content: bytes
+        :param etag: The ETag header of the response, if any
+        :type etag: str
+        :param expires: Epoch time until which the entry is fresh
+        :type expires: float
+        :param tags: Resource tags used for invalidation
+        :type tags: tuple
+        """
+        self.status_code = status_code
+        self.content = content
+        self.etag = etag
+        self.expires = expires
+        self.tags = tags
+
+    @property
+    def headers(self):
+        """
+        The headers of the response that are kept
+        """
+        if self.etag is None:
+            return {}
+        return {'ETag': self.etag}
+
+    @property
+    def ok(self):  # pylint: disable=invalid-name
+        """
+        True if the status code is less than 400, like requests.Response
+        """
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        """
+        The body of the response as text
+        """
+        return self.content.decode('utf-8')
+
+    def json(self, **kwargs):
+        """
+        Decode the body as JSON, like requests.Response.json it doesn't
+        strip the XSSI prefix, use gerrit.helper.decode_json for that
+        :exception: ValueError
+        """
+        return json.loads(self.text, **kwargs)
+
+    def raise_for_status(self):
+        """
+        Raise requests.HTTPError if the status code is an error
+        :exception: requests.HTTPError
+        """
+        if not self.ok:
+            raise requests.HTTPError('%d Error for a cached response' % self.status_code,
+                                     response=self)
+
+    def close(self):
+        """
+        Nothing to release, the body is already read
+        """
+
+    def is_fresh(self, now=None):
+        """
+        :returns: True if the entry can be used without revalidation
+        :rtype: bool
+        """
+        if now is None:
+            now = time.time()
+        return now < self.expires
+
+
+class ResponseCache(object):
+    """Base class for response caches"""
+
+    def __init__(self, ttl=None):
+        """
+        :param ttl: Seconds to keep responses of each endpoint family
+            fresh, families that are left out are not cached
+        :type ttl: dict
+        """
+        self.ttl = DEFAULT_TTL if ttl is None else ttl
+
+    def get(self, key):
+        """
+        Get a cached entry
+        :rtype: CacheEntry or None
+        """
+        raise NotImplementedError
+
+    def set(self, key, entry):
+        """
+        Store an entry
+        """
+        raise NotImplementedError
+
+    def touch(self, key, expires):
+        """
+        Mark an entry as fresh again after it was revalidated
+        """
+        raise NotImplementedError
+
+    def invalidate(self, tag):
+        """
+        Drop all entries tagged with tag
+        """
+        raise NotImplementedError
+
+
+class MemoryCache(ResponseCache):
+    """An in memory LRU response cache"""
+
+    def __init__(self, ttl=None, max_entries=1024, max_bytes=16 * 1024 * 1024):
+        """
+        :param ttl: Seconds to keep responses of each endpoint family
+            fresh, families that are left out are not cached
+        :type ttl: dict
+        :param max_entries: Maximum number of responses to keep
+        :type max_entries: int
+        :param max_bytes: Maximum total size of the kept responses
+        :type max_bytes: int
+        """
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        """
+        Total size in bytes of the cached responses
+        """
+        return self._size
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._size -= len(entry.content)
+        for tag in entry.tags:
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.etag is None and not entry.is_fresh():
+                # Can't be revalidated, no use keeping it
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        if len(entry.content) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._size += len(entry.content)
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def touch(self, key, expires):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.expires = expires
+                self._entries.move_to_end(key)
+
+    def invalidate(self, tag):
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def clear(self):
+        """
+        Drop all entries
+        """
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._size = 0
+
+
+_SQLITE_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS entries ('
+    ' key TEXT PRIMARY KEY,'
+    ' status_code INTEGER NOT NULL,'
+    ' content BLOB NOT NULL,'
+    ' etag TEXT,'
+    ' expires REAL NOT NULL,'
+    ' accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)',
+    'CREATE TABLE IF NOT EXISTS tags ('
+    ' tag TEXT NOT NULL,'
+    ' key TEXT NOT NULL,'
+    ' PRIMARY KEY (tag, key))',
+    'CREATE INDEX IF NOT EXISTS tags_key ON tags (key)',
+    # Running totals, so the limits can be checked without a table scan
+    'CREATE TABLE IF NOT EXISTS totals ('
+    ' id INTEGER PRIMARY KEY CHECK (id = 0),'
+    ' entries INTEGER NOT NULL,'
+    ' bytes INTEGER NOT NULL)',
+    'INSERT OR IGNORE INTO totals (id, entries, bytes) VALUES (0, 0, 0)',
+    'CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN'
+    ' UPDATE totals SET entries = entries + 1, bytes = bytes + length(NEW.content);'
+    ' END',
+    'CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN'
+    ' UPDATE totals SET entries = entries - 1, bytes = bytes - length(OLD.content);'
+    ' DELETE FROM tags WHERE key = OLD.key;'
+    ' END',
+)
+
+
+class SqliteCache(ResponseCache):
+    """
+    A response cache in a sqlite database, it outlives the process and
+    can be shared by all processes on a host
+    """
+
+    # Entries evicted at a time once a limit is reached
+    EVICT_BATCH = 32
+
+    def __init__(self, path, ttl=None, max_entries=10000,  # pylint: disable=too-many-arguments
+                 max_bytes=64 * 1024 * 1024, timeout=30.0):
+        """
+        :param path: The database file, created if it doesn't exist
+        :type path: str
+        :param ttl: Seconds to keep responses of each endpoint family
+            fresh, families that are left out are not cached
+        :type ttl: dict
+        :param max_entries: Maximum number of responses to keep
+        :type max_entries: int
+        :param max_bytes: Maximum total size of the kept responses
+        :type max_bytes: int
+        :param timeout: Seconds to wait for another process holding the
+            write lock
+        :type timeout: float
+        """
+        super().__init__(ttl)
+        self.path = os.path.expanduser(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        # sqlite connections can't be shared between threads
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+        with self._transaction() as db:
+            for statement in _SQLITE_SCHEMA:
+                db.execute(statement)
+
+    def _connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # Autocommit, transactions are started explicitly. Each thread
+            # uses its own connection, close() may run on another thread.
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                 check_same_thread=False)
+            # Readers don't block the writer and the other way around
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+            with self._lock:
+                self._connections.append(db)
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._connection()
+        # Take the write lock up front, a deferred transaction that has
+        # to upgrade its lock fails instead of waiting when busy
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        else:
+            db.execute('COMMIT')
+
+    def __len__(self):
+        return self._connection().execute('SELECT entries FROM totals').fetchone()[0]
+
+    @property
+    def size(self):
+        """
+        Total size in bytes of the cached responses
+        """
+        return self._connection().execute('SELECT bytes FROM totals').fetchone()[0]
+
+    def get(self, key):
+        now = time.time()
+        row = self._connection().execute(
+            'SELECT status_code, content, etag, expires, accessed FROM entries WHERE key = ?',
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        status_code, content, etag, expires, accessed = row
+        if etag is None and now >= expires:
+            # Can't be revalidated, no use keeping it
+            with self._transaction() as db:
+                db.execute('DELETE FROM entries WHERE key = ? AND expires = ?', (key, expires))
+            return None
+
+        # Keep the LRU order roughly up to date without a write per read
+        if now - accessed > 1:
+            with self._transaction() as db:
+                db.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+
+        tags = tuple(tag for (tag,) in self._connection().execute(
+            'SELECT tag FROM tags WHERE key = ?', (key,)))
+        return CacheEntry(status_code, bytes(content), etag, expires, tags)
+
+    def set(self, key, entry):
+        if len(entry.content) > self.max_bytes:
+            return
+
+        with self._transaction() as db:
+            db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            db.execute(
+                'INSERT INTO entries (key, status_code, content, etag, expires, accessed) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, entry.status_code, sqlite3.Binary(entry.content), entry.etag,
+                 entry.expires, time.time()),
+            )
+            db.executemany(
+                'INSERT OR IGNORE INTO tags (tag, key) VALUES (?, ?)',
+                [(tag, key) for tag in entry.tags],
+            )
+            self._evict(db)
+
+    def _evict(self, db):
+        """
+        Drop the least recently used entries until the limits are met
+        """
+        while True:
+            entries, size = db.execute('SELECT entries, bytes FROM totals').fetchone()
+            if entries <= self.max_entries and size <= self.max_bytes:
+                return
+            db.execute(
+                'DELETE FROM entries WHERE key IN '
+                '(SELECT key FROM entries ORDER BY accessed LIMIT ?)',
+                (max(1, min(self.EVICT_BATCH, entries - self.max_entries)),),
+            )
+
+    def touch(self, key, expires):
+        with self._transaction() as db:
+            db.execute(
+                'UPDATE entries SET expires = ?, accessed = ? WHERE key = ?',
+                (expires, time.time(), key),
+            )
+
+    def invalidate(self, tag):
+        with self._transaction() as db:
+            db.execute(
+                'DELETE FROM entries WHERE key IN (SELECT key FROM tags WHERE tag = ?)',
+                (tag,),
+            )
+
+    def purge(self):
+        """
+        Drop the entries that are expired and can't be revalidated
+        """
+        with self._transaction() as db:
+            db.execute(
+                'DELETE FROM entries WHERE etag IS NULL AND expires <= ?',
+                (time.time(),),
+            )
+
+    def clear(self):
+        """
+        Drop all entries
+        """
+        with self._transaction() as db:
+            db.execute('DELETE FROM entries')
+
+    def close(self):
+        """
+        Close the database connections of all threads
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for db in connections:
+            db.close()
+        self._local = threading.local()
+
+
+class ContentCache(object):
+    """
+    Immutable content, such as the files of a revision keyed on its
+    commit SHA. Entries never expire, the backend bounds how many are kept.
+    """
+
+    def __init__(self, backend, scope=''):
+        """
+        :param backend: Where the content is kept, e.g. a MemoryCache or a
+            SqliteCache to keep it on disk
+        :type backend: ResponseCache
+        :param scope: Prefix of the keys, backends may be shared between
+            servers and users
+        :type scope: str
+        """
+        self.backend = backend
+        self.scope = scope
+
+    def _key(self, key):
+        return '%s %s' % (self.scope, key)
+
+    def get(self, key):
+        """
+        Get cached content
+        :rtype: bytes or None
+        """
+        entry = self.backend.get(self._key(key))
+        if entry is None:
+            return None
+        return entry.content
+
+    def set(self, key, content):
+        """
+        Store content, it is kept until the backend evicts it
+        :param content: The content
+        :type content: bytes
+        """
+        self.backend.set(self._key(key), CacheEntry(200, content, None, float('inf'), ()))
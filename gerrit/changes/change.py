@@ -6,15 +6,99 @@ Manage gerrit changes
 """
 
 import urllib
-from gerrit.helper import decode_json
+from gerrit.helper import (
+    decode_json,
+    intern_str,
+    LazyField,
+    NOT_FETCHED,
+    shared_account,
+)
 from gerrit.error import UnhandledError
 from gerrit.projects.project import Project
 from gerrit.changes.reviewer import Reviewer
 from gerrit.changes.revision import Revision
+from gerrit.bulk import DEFAULT_WORKERS
+
+# Fields of a ChangeInfo that are only returned with an option, and the
+# option they are loaded with when they are first read
+LAZY_FIELDS = {
+    'labels': 'LABELS',
+    'permitted_labels': 'DETAILED_LABELS',
+    'removable_reviewers': 'DETAILED_LABELS',
+    'current_revision': 'CURRENT_REVISION',
+    'revisions': 'CURRENT_REVISION',
+    'messages': 'MESSAGES',
+    'submittable': 'SUBMITTABLE',
+}
+
+# Options that also return fields that are loaded with another option
+IMPLIED_FIELDS = {
+    'DETAILED_LABELS': ('labels',),
+    'ALL_REVISIONS': ('current_revision', 'revisions'),
+}
+
+
+def option_fields(options):
+    """
+    Get the lazy fields that are returned with a set of options
+    :param options: ListChangesOption names, e.g. ['LABELS']
+    :type options: list
+    :rtype: set
+    """
+    if not options:
+        return set()
+    options = set(options)
+    fields = {field for field, option in LAZY_FIELDS.items() if option in options}
+    for option in options:
+        fields.update(IMPLIED_FIELDS.get(option, ()))
+    return fields
+
+
+def options_query(options):
+    """
+    Build the query string that asks for a set of options
+    :rtype: str
+    """
+    return urllib.parse.urlencode([('o', option) for option in options])
+
 
 class Change(object):
     """Manage gerrit changes"""
 
+    __slots__ = (
+        '_gerrit_con',
+        '_change_id',
+        'full_id',
+        'project',
+        'branch',
+        'change_id',
+        'subject',
+        'status',
+        'created',
+        'updated',
+        'mergable',
+        'insertions',
+        'deletions',
+        'number',
+        'owner',
+        '_labels',
+        '_permitted_labels',
+        '_removable_reviewers',
+        '_current_revision',
+        '_revisions',
+        '_messages',
+        '_submittable',
+        '__weakref__',
+    )
+
+    labels = LazyField('_labels', '_load_missing')
+    permitted_labels = LazyField('_permitted_labels', '_load_missing')
+    removable_reviewers = LazyField('_removable_reviewers', '_load_missing')
+    current_revision = LazyField('_current_revision', '_load_missing')
+    revisions = LazyField('_revisions', '_load_missing')
+    messages = LazyField('_messages', '_load_missing')
+    submittable = LazyField('_submittable', '_load_missing')
+
     def __init__(self, gerrit_con):
         self._gerrit_con = gerrit_con
         self._change_id = None
@@ -31,14 +115,31 @@ class Change(object):
         self.deletions = None
         self.number = None
         self.owner = None
+        for field in LAZY_FIELDS:
+            setattr(self, '_' + field, NOT_FETCHED)
 
-    def get_change(self, project, branch, change_id):
+    def get_change(self, project, branch, change_id, options=None):
         """
         Get ChangeInfo for a change
+        :param options: Additional fields to include, e.g. ['LABELS'],
+            fields that are left out are fetched when they are first read
+        :type options: list
         :returns: Dict of the ChangeInfo for the change
         :rtype: Change
         :exception: ValueError, UnhandledError
         """
+        r_endpoint = self._get_change_endpoint(project, branch, change_id, options)
+
+        req = self._gerrit_con.call(r_endpoint=r_endpoint)
+
+        return self._get_change_result(req, options)
+
+    def _get_change_endpoint(self, project, branch, change_id, options=None):
+        """
+        Validate the identifiers of a change and build its endpoint
+        :rtype: dict
+        :exception: KeyError
+        """
         if isinstance(project, Project):
             project = project.name
 
@@ -58,38 +159,140 @@ class Change(object):
             'pre': '/a/changes/',
             'data': self._change_id,
         }
+        if options:
+            r_endpoint['post'] = '/?%s' % options_query(options)
 
-        req = self._gerrit_con.call(r_endpoint=r_endpoint)
+        return r_endpoint
+
+    def _get_change_result(self, req, options=None):
+        """
+        Handle the response of a get_change request
+        :rtype: Change
+        :exception: ValueError, UnhandledError
+        """
+        return self._populate(self._change_info_result(req), options)
 
+    @staticmethod
+    def _change_info_result(req):
+        """
+        Handle a response carrying a ChangeInfo
+        :rtype: dict
+        :exception: ValueError, UnhandledError
+        """
         status_code = req.status_code
-        result = req.content.decode('utf-8')
 
         if status_code == 200:
-            change_info = decode_json(result)
-        elif status_code == 404:
+            return decode_json(req.content)
+
+        result = req.content.decode('utf-8')
+        if status_code == 404:
             raise ValueError(result)
         else:
             raise UnhandledError(result)
 
+    def _populate(self, change_info, options=None):
+        """
+        Set the attributes of the change from a ChangeInfo
+        :param change_info: The ChangeInfo returned by gerrit
+        :type change_info: dict
+        :param options: The options the ChangeInfo was fetched with
+        :type options: list
+        :rtype: Change
+        """
         self.full_id = change_info.get('id')
         if self.full_id is not None:
             self.full_id = urllib.parse.unquote(self.full_id)
-        self.project = change_info.get('project')
-        self.branch = change_info.get('branch')
+        # Values that repeat across changes are shared between them
+        self.project = intern_str(change_info.get('project'))
+        self.branch = intern_str(change_info.get('branch'))
         self.change_id = change_info.get('change_id')
         self.subject = change_info.get('subject')
-        self.status = change_info.get('status')
+        self.status = intern_str(change_info.get('status'))
         self.created = change_info.get('created')
         self.updated = change_info.get('updated')
         self.mergable = change_info.get('mergable')
         self.insertions = change_info.get('insertions')
         self.deletions = change_info.get('deletions')
-        self.number = change_info.get('number')
-        self.owner = change_info.get('owner')
+        # Gerrit calls the legacy numeric id '_number'
+        self.number = change_info.get('_number', change_info.get('number'))
+        self.owner = shared_account(change_info.get('owner'))
+
+        fetched = option_fields(options)
+        for field in LAZY_FIELDS:
+            if field in change_info or field in fetched:
+                setattr(self, '_' + field, change_info.get(field))
+            else:
+                setattr(self, '_' + field, NOT_FETCHED)
+
+        return self
+
+    def load_fields(self, fields=None):
+        """
+        Fetch lazily loaded fields of the change with a single request
+        :param fields: Names of the fields to fetch, e.g. ['labels'],
+            defaults to all fields that weren't fetched yet
+        :type fields: list
+        :rtype: Change
+        :exception: KeyError, ValueError, UnhandledError
+        """
+        r_endpoint, fields = self._load_fields_request(fields)
+        if not fields:
+            return self
+
+        req = self._gerrit_con.call(r_endpoint=r_endpoint)
+
+        return self._load_fields_result(req, fields)
+
+    def _load_missing(self):
+        """
+        Fetch all fields that weren't fetched, called when one is read
+        """
+        self.load_fields()
+
+    def _load_fields_request(self, fields):
+        """
+        Build the endpoint that fetches lazily loaded fields
+        :returns: The endpoint and the fields it fetches
+        :rtype: tuple
+        :exception: KeyError, ValueError
+        """
+        if fields is None:
+            fields = [field for field in LAZY_FIELDS
+                      if getattr(self, '_' + field) is NOT_FETCHED]
+        else:
+            for field in fields:
+                if field not in LAZY_FIELDS:
+                    raise KeyError('%s is not a lazily loaded field' % field)
+
+        if not fields:
+            return None, fields
+
+        if self.full_id is None:
+            raise ValueError('The change has no id to fetch %s with' % ', '.join(fields))
+
+        options = sorted({LAZY_FIELDS[field] for field in fields})
+        r_endpoint = {
+            'pre': '/a/changes/',
+            'data': self.full_id,
+            'post': '/?%s' % options_query(options),
+        }
+
+        return r_endpoint, fields
+
+    def _load_fields_result(self, req, fields):
+        """
+        Handle the response of a load_fields request
+        :rtype: Change
+        :exception: ValueError, UnhandledError
+        """
+        change_info = self._change_info_result(req)
+
+        for field in fields:
+            setattr(self, '_' + field, change_info.get(field))
 
         return self
 
-    def create_change(self, project, subject, branch, options):
+    def create_change(self, project, subject, branch, options, refresh=False):
         """
         Create a change
         :param project: Project to create change in
@@ -100,6 +303,11 @@ class Change(object):
         :type branch: str
         :param options: Additional options
         :type options: dict
+        :param refresh: Fetch the change after creating it instead of using
+            the ChangeInfo gerrit returns when creating it
+        :type refresh: bool
+        :rtype: Change
+        :exception: UnhandledError
         """
 
         r_endpoint = "/a/changes/"
@@ -107,6 +315,41 @@ class Change(object):
         if isinstance(project, Project):
             project = project.name
 
+        req = self._gerrit_con.call(
+            request='post',
+            r_endpoint=r_endpoint,
+            r_payload=self._create_change_payload(project, subject, branch, options),
+        )
+
+        change_info = self._create_change_result(req)
+
+        change = type(self)(self._gerrit_con)
+        if refresh:
+            return change.get_change(project, branch, change_info.get('change_id'))
+
+        return change._populate(change_info)  # pylint: disable=protected-access
+
+    @staticmethod
+    def _create_change_result(req):
+        """
+        Handle the response of a create_change request
+        :returns: The ChangeInfo of the new change
+        :rtype: dict
+        :exception: UnhandledError
+        """
+        result = req.content.decode('utf-8')
+
+        if req.status_code == 201:
+            return decode_json(result)
+        else:
+            raise UnhandledError(result)
+
+    @staticmethod
+    def _create_change_payload(project, subject, branch, options):
+        """
+        Build the ChangeInput used to create a change
+        :rtype: dict
+        """
         data = {
             'project': project,
             'subject': subject,
@@ -119,30 +362,15 @@ class Change(object):
         for key in options.keys():
             data[key] = options[key]
 
-        req = self._gerrit_con.call(
-            request='post',
-            r_endpoint=r_endpoint,
-            r_payload=data,
-        )
-
-        result = req.content.decode('utf-8')
-
-        if req.status_code == 201:
-            change = Change(self._gerrit_con)
-            return change.get_change(
-                project,
-                branch,
-                decode_json(result).get('change_id')
-            )
-        else:
-            raise UnhandledError(result)
+        return data
 
     def submit_change(self, options=None):
         """
         Submit the change
         :param options: Additional options
         :type options: dict
-        :return: On success, the updated Change object
+        :return: On success, the Change object updated from the ChangeInfo
+            returned by gerrit
         :rtype: Change object
         """
 
@@ -161,10 +389,18 @@ class Change(object):
             r_payload=options,
         )
 
+        return self._submit_change_result(req)
+
+    def _submit_change_result(self, req):
+        """
+        Handle the response of a submit_change request
+        :rtype: Change
+        :exception: UnhandledError
+        """
         result = req.content.decode('utf-8')
 
         if req.status_code == 200:
-            self.status = decode_json(result).get('status')
+            return self._populate(decode_json(result))
         else:
             raise UnhandledError(result)
 
@@ -180,6 +416,22 @@ class Change(object):
         reviewer = Reviewer(self._gerrit_con, self.change_id)
         return reviewer.add_reviewer(account_id)
 
+    def add_reviewers(self, accounts, max_workers=DEFAULT_WORKERS, single_request=False):
+        """
+        Add many reviewers to the change at once
+        :param accounts: The user accounts that should be added as reviewers
+        :type accounts: list
+        :param max_workers: Maximum number of requests running at once
+        :type max_workers: int
+        :param single_request: Add all accounts with one review request
+        :type single_request: bool
+        :return: Per account, True if the account was added or the
+            LookupError, AlreadyExists or UnhandledError it failed with
+        :rtype: dict
+        """
+        reviewer = Reviewer(self._gerrit_con, self.change_id)
+        return reviewer.add_reviewers(accounts, max_workers, single_request)
+
     def delete_reviewer(self, account_id):
         """
         Delete a reviewer from the change
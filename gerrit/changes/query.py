@@ -0,0 +1,232 @@
+"""
+Query
+=====
+
+Search gerrit for changes
+"""
+
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from gerrit.helper import decode_json
+from gerrit.error import UnhandledError
+from gerrit.projects.project import Project
+from gerrit.changes.change import Change
+
+# Request lines longer than 8 KiB are commonly refused by gerrit and the
+# proxies in front of it, keep a safe margin below that.
+MAX_URL_LENGTH = 4096
+
+
+class Query(object):
+    """Search gerrit for changes"""
+
+    def __init__(self, gerrit_con):
+        """
+        :param gerrit_con: The connection object to gerrit
+        :type gerrit_con: gerrit.Connection
+        """
+        self._gerrit_con = gerrit_con
+
+    @staticmethod
+    def _query_endpoint(query, options=None, start=None, limit=None):
+        """
+        Build the endpoint for a change query
+        :rtype: str
+        """
+        params = [('q', query)]
+        for option in options or []:
+            params.append(('o', option))
+        if start:
+            params.append(('S', start))
+        if limit:
+            params.append(('n', limit))
+
+        return '/a/changes/?%s' % urllib.parse.urlencode(params)
+
+    def _query_page(self, query, options=None, start=None, limit=None):
+        """
+        Fetch one page of ChangeInfo entities
+        :rtype: list
+        :exception: ValueError, UnhandledError
+        """
+        req = self._gerrit_con.call(
+            r_endpoint=self._query_endpoint(query, options, start, limit),
+        )
+
+        status_code = req.status_code
+
+        if status_code == 200:
+            return decode_json(req.content)
+
+        result = req.content.decode('utf-8')
+        if status_code == 400:
+            raise ValueError(result)
+        else:
+            raise UnhandledError(result)
+
+    def query_changes(self, query, options=None, limit=None):
+        """
+        Get all changes matching a query
+        :param query: The gerrit search query, e.g. 'status:open'
+        :type query: str
+        :param options: Additional fields to include, e.g. ['LABELS']
+        :type options: list
+        :param limit: The maximum number of changes to return
+        :type limit: int
+        :returns: The matching changes
+        :rtype: list of Change
+        :exception: ValueError, UnhandledError
+        """
+        changes = []
+
+        while True:
+            page = self._query_page(
+                query,
+                options,
+                start=len(changes),
+                limit=limit - len(changes) if limit else None,
+            )
+            for change_info in page:
+                change = Change(self._gerrit_con)
+                # pylint: disable=protected-access
+                changes.append(change._populate(change_info, options))
+
+            if not page or not page[-1].get('_more_changes'):
+                break
+            if limit and len(changes) >= limit:
+                break
+
+        return changes
+
+    def iter_changes(self, query, page_size=100, options=None, prefetch=True):
+        """
+        Lazily iterate over all changes matching a query. Only the page
+        being consumed and the next one are held in memory.
+        :param query: The gerrit search query, e.g. 'status:open'
+        :type query: str
+        :param page_size: Number of changes to fetch per request
+        :type page_size: int
+        :param options: Additional fields to include, e.g. ['LABELS']
+        :type options: list
+        :param prefetch: Fetch the next page in the background while the
+            current one is consumed
+        :type prefetch: bool
+        :returns: The matching changes
+        :rtype: generator of Change
+        :exception: ValueError, UnhandledError
+        """
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        future = None
+        start = 0
+
+        try:
+            page = self._query_page(query, options, start, page_size)
+            while page:
+                more = page[-1].get('_more_changes')
+                start += len(page)
+                if more and executor is not None:
+                    future = executor.submit(
+                        self._query_page, query, options, start, page_size)
+
+                # Pop the entities so they can be freed once consumed
+                page.reverse()
+                while page:
+                    change = Change(self._gerrit_con)
+                    # pylint: disable=protected-access
+                    yield change._populate(page.pop(), options)
+
+                if not more:
+                    break
+                if future is not None:
+                    page = future.result()
+                    future = None
+                else:
+                    page = self._query_page(query, options, start, page_size)
+        finally:
+            if future is not None:
+                future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    @staticmethod
+    def _change_term(change):
+        """
+        Build the search term and lookup key for a change identifier
+        :param change: A change id or number, or a tuple of
+            (project, change_id) or (project, change_id, branch)
+        :type change: str, int or tuple
+        :rtype: tuple
+        """
+        if not isinstance(change, tuple):
+            return 'change:%s' % change, str(change)
+
+        if len(change) == 2:
+            project, change_id = change
+            branch = 'master'
+        else:
+            project, change_id, branch = change
+
+        if isinstance(project, Project):
+            project = project.name
+
+        term = '(project:"%s" branch:"%s" change:%s)' % (project, branch, change_id)
+        return term, '%s~%s~%s' % (project, branch, change_id)
+
+    def _chunk_terms(self, terms, options, max_url_length):
+        """
+        Join search terms into OR-ed queries that fit in a request line
+        :rtype: generator of str
+        """
+        # The query is encoded character by character, so the length of
+        # the endpoint is kept up to date term by term
+        base = len(self._query_endpoint('', options))
+        separator = len(urllib.parse.quote_plus(' OR '))
+        chunk = []
+        length = base
+
+        for term in terms:
+            size = len(urllib.parse.quote_plus(term))
+            if chunk and length + separator + size > max_url_length:
+                yield ' OR '.join(chunk)
+                chunk = []
+                length = base
+            if chunk:
+                length += separator
+            length += size
+            chunk.append(term)
+
+        if chunk:
+            yield ' OR '.join(chunk)
+
+    def get_changes(self, changes, options=None, max_url_length=MAX_URL_LENGTH):
+        """
+        Get many changes with as few requests as possible
+        :param changes: Change ids or numbers, or tuples of
+            (project, change_id) or (project, change_id, branch)
+        :type changes: list
+        :param options: Additional fields to include, e.g. ['LABELS']
+        :type options: list
+        :param max_url_length: Longest request line to send
+        :type max_url_length: int
+        :returns: The changes that were found, in the requested order
+        :rtype: list of Change
+        :exception: ValueError, UnhandledError
+        """
+        terms = []
+        keys = []
+        seen = set()
+        for change in changes:
+            term, key = self._change_term(change)
+            if key not in seen:
+                seen.add(key)
+                terms.append(term)
+                keys.append(key)
+
+        found = {}
+        for query in self._chunk_terms(terms, options, max_url_length):
+            for change in self.query_changes(query, options):
+                found['%s~%s~%s' % (change.project, change.branch, change.change_id)] = change
+                found[change.change_id] = change
+                found[str(change.number)] = change
+
+        return [found[key] for key in keys if key in found]
@@ -11,11 +11,17 @@ from gerrit.error import (
     AuthorizationError,
 )
 from gerrit.helper import decode_json
+from gerrit.bulk import (
+    DEFAULT_WORKERS,
+    run_bulk,
+)
 
 
 class Reviewer(object):
     """Manage gerrit reviewers for a change"""
 
+    __slots__ = ('_change_id', '_gerrit_con')
+
     def __init__(self, gerrit_con, change_id):
         """
         :param gerrit_con: The connection object to gerrit
@@ -44,8 +50,15 @@ class Reviewer(object):
             r_payload=payload
         )
 
-        result = req.content.decode('utf-8')
+        return self._add_reviewer_result(account_id, req.content.decode('utf-8'))
 
+    @staticmethod
+    def _add_reviewer_result(account_id, result):
+        """
+        Handle the response of an add_reviewer request
+        :rtype: bool
+        :except: LookupError, AlreadyExists, UnhandledError
+        """
         if "does not identify a registered user or group" in result:
             raise LookupError(result)
 
@@ -61,6 +74,80 @@ class Reviewer(object):
         except TypeError:
             raise UnhandledError(json_result)
 
+    def add_reviewers(self, accounts, max_workers=DEFAULT_WORKERS, single_request=False):
+        """
+        Endpoint for adding many reviewers to a change-id at once
+        :param accounts: The user accounts that should be added as reviewers
+        :type accounts: list
+        :param max_workers: Maximum number of requests running at once
+        :type max_workers: int
+        :param single_request: Add all accounts with one review request on
+            the current revision instead of one request per account
+        :type single_request: bool
+        :return: Per account, True if the account was added or the
+            LookupError, AlreadyExists or UnhandledError it failed with
+        :rtype: dict
+        """
+        if single_request:
+            r_endpoint = "/a/changes/%s/revisions/current/review" % self._change_id
+
+            req = self._gerrit_con.call(
+                request='post',
+                r_endpoint=r_endpoint,
+                r_payload=self._add_reviewers_payload(accounts)
+            )
+
+            return self._add_reviewers_result(accounts, req)
+
+        results = dict.fromkeys(accounts)
+        for result in run_bulk(self.add_reviewer, results, max_workers):
+            results[result.item] = result.value if result.error is None else result.error
+
+        return results
+
+    @staticmethod
+    def _add_reviewers_payload(accounts):
+        """
+        Build the ReviewInput used to add many reviewers
+        :rtype: dict
+        """
+        return {"reviewers": [{"reviewer": "%s" % account_id} for account_id in accounts]}
+
+    @staticmethod
+    def _add_reviewers_result(accounts, req):
+        """
+        Handle the response of a review request adding many reviewers,
+        gerrit rejects the whole review if any of the accounts fails
+        :rtype: dict
+        """
+        result = req.content.decode('utf-8')
+
+        try:
+            added = decode_json(result).get('reviewers') or {}
+        except (ValueError, AttributeError):
+            return dict.fromkeys(accounts, UnhandledError(result))
+
+        results = {}
+        for account_id in accounts:
+            outcome = added.get("%s" % account_id)
+            if outcome is None:
+                results[account_id] = UnhandledError(result)
+            elif 'error' in outcome:
+                if "does not identify a registered user or group" in outcome['error']:
+                    results[account_id] = LookupError(outcome['error'])
+                else:
+                    results[account_id] = UnhandledError(outcome['error'])
+            elif req.status_code != 200:
+                results[account_id] = UnhandledError(
+                    'The review adding \'%s\' was rejected: %s' % (account_id, result))
+            elif outcome.get('reviewers') or outcome.get('ccs'):
+                results[account_id] = True
+            else:
+                results[account_id] = AlreadyExists(
+                    'The requested user \'%s\' is already an reviewer' % account_id)
+
+        return results
+
     def delete_reviewer(self, account_id):
         """
         Endpoint to delete a reviewer from a change-id
@@ -77,6 +164,15 @@ class Reviewer(object):
             r_headers={},
         )
 
+        return self._delete_reviewer_result(req)
+
+    @staticmethod
+    def _delete_reviewer_result(req):
+        """
+        Handle the response of a delete_reviewer request
+        :rtype: bool
+        :exception: error.AuthorizationError
+        """
         status_code = req.status_code
         result = req.content.decode('utf-8')
 
@@ -99,14 +195,22 @@ class Reviewer(object):
 
         req = self._gerrit_con.call(r_endpoint=r_endpoint)
 
+        return self._list_reviewers_result(req)
+
+    @staticmethod
+    def _list_reviewers_result(req):
+        """
+        Handle the response of a list_reviewers request
+        :rtype: dict
+        :exception: ValueError, UnhandledError
+        """
         status_code = req.status_code
-        result = req.content.decode('utf-8')
 
         if status_code == 404:
-            raise ValueError(result)
+            raise ValueError(req.content.decode('utf-8'))
         elif status_code != 200:
-            raise UnhandledError(result)
+            raise UnhandledError(req.content.decode('utf-8'))
 
-        json_result = decode_json(result)
+        json_result = decode_json(req.content)
 
         return json_result
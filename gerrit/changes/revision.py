@@ -5,15 +5,70 @@ Revision
 Manage gerrit revisions for a change id
 """
 
+import base64
+import os
+import re
+import urllib.parse
+
 from gerrit.error import (
     UnhandledError
 )
+from gerrit.helper import decode_json, iter_base64
+
+_SHA = re.compile('^[0-9a-f]{40}$')
+
+# Bytes of base64 to read from the socket at a time when downloading
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class _Writer(object):
+    """Write downloaded content to a path, a file object or a buffer"""
+
+    def __init__(self, dest):
+        self.written = 0
+        self._path = None
+        self._file = None
+        self._buffer = None
+        if isinstance(dest, (str, os.PathLike)):
+            self._path = dest
+            self._file = open(dest, 'wb')  # pylint: disable=consider-using-with
+        elif isinstance(dest, (bytearray, memoryview)):
+            self._buffer = memoryview(dest).cast('B')
+        else:
+            self._file = dest
+
+    def write(self, data):
+        """
+        :exception: ValueError if the content doesn't fit in the buffer
+        """
+        if self._buffer is not None:
+            end = self.written + len(data)
+            if end > len(self._buffer):
+                raise ValueError('The content is larger than the buffer of %d bytes' %
+                                 len(self._buffer))
+            self._buffer[self.written:end] = data
+        else:
+            self._file.write(data)
+        self.written += len(data)
+
+    def close(self, failed=False):
+        """
+        Close the file the writer opened, it is removed if the download
+        failed
+        """
+        if self._path is None:
+            return
+        self._file.close()
+        if failed:
+            os.remove(self._path)
 
 
 class Revision(object):
     """Manage gerrit revisions"""
 
-    def __init__(self, gerrit_con, change_id, revision_id):
+    __slots__ = ('_change_id', '_revision_id', '_gerrit_con', '_cache', '_sha')
+
+    def __init__(self, gerrit_con, change_id, revision_id, cache=None):
         """
         :param gerrit_con: The connection object to gerrit
         :type gerrit_con: gerrit.Connection
@@ -21,11 +76,18 @@ class Revision(object):
         :type change_id: str
         :param revision_id: The Change Request Patch Set/Revision ID
         :type revision_id: str
+        :param cache: Keeps the files, diffs, patch and commit of the
+            revision, they never change once the patch set is uploaded
+        :type cache: gerrit.cache.ContentCache
         """
         # HTTP REST API HEADERS
         self._change_id = change_id
         self._revision_id = revision_id
         self._gerrit_con = gerrit_con
+        self._cache = cache
+        self._sha = None
+        if revision_id is not None and _SHA.match(str(revision_id)):
+            self._sha = revision_id
 
     def set_review(self, labels=None, message='', comments=None):
         """
@@ -38,12 +100,23 @@ class Revision(object):
         :type comments: dict
         """
 
-        if not labels:
-            labels = {}
-        if not comments:
-            comments = {}
         r_endpoint = "/a/changes/%s/revisions/%s/review" % (self._change_id,
                                                             self._revision_id)
+
+        req = self._gerrit_con.call(
+            request='post',
+            r_endpoint=r_endpoint,
+            r_payload=self._set_review_payload(labels, message, comments)
+        )
+
+        return self._set_review_result(req)
+
+    @staticmethod
+    def _set_review_payload(labels, message, comments):
+        """
+        Build the ReviewInput used to set a review
+        :rtype: dict
+        """
         payload = {}
 
         if labels:
@@ -53,14 +126,210 @@ class Revision(object):
         if comments:
             payload['comments'] = comments
 
-        req = self._gerrit_con.call(
-            request='post',
-            r_endpoint=r_endpoint,
-            r_payload=payload
-        )
+        return payload
 
+    @staticmethod
+    def _set_review_result(req):
+        """
+        Handle the response of a set_review request
+        :rtype: bool
+        :exception: UnhandledError
+        """
         status_code = req.status_code
         if status_code == 200:
             return True
         else:
             raise UnhandledError(req.content)
+
+    def _endpoint(self, revision_id, view):
+        """
+        Build the endpoint of a view of the revision
+        :rtype: str
+        """
+        return '/a/changes/%s/revisions/%s/%s' % (self._change_id, revision_id or 'current', view)
+
+    def _patch_set_key(self):
+        """
+        Cache key of the SHA of a patch set number, None for the symbolic
+        ids as they move when a patch set is uploaded
+        :rtype: str
+        """
+        if str(self._revision_id).isdigit():
+            return 'changes/%s/revisions/%s' % (self._change_id, self._revision_id)
+        return None
+
+    @staticmethod
+    def _content_result(req):
+        """
+        Handle the response of a read of the revision
+        :rtype: bytes
+        :exception: ValueError, UnhandledError
+        """
+        status_code = req.status_code
+        if status_code == 200:
+            return req.content
+
+        result = req.content.decode('utf-8')
+        if status_code == 404:
+            raise ValueError(result)
+        else:
+            raise UnhandledError(result)
+
+    def _cached(self, view):
+        """
+        Get a view of the revision from the cache
+        :rtype: bytes or None
+        """
+        if self._cache is None or self._sha is None:
+            return None
+        return self._cache.get('revisions/%s/%s' % (self._sha, view))
+
+    def _store(self, view, content):
+        if self._cache is not None and self._sha is not None:
+            self._cache.set('revisions/%s/%s' % (self._sha, view), content)
+
+    def _resolved(self, commit):
+        """
+        Remember the SHA of the revision from its CommitInfo
+        :rtype: str
+        """
+        self._sha = decode_json(commit)['commit']
+        self._store('commit', commit)
+        if self._cache is not None and self._patch_set_key() is not None:
+            self._cache.set(self._patch_set_key(), self._sha.encode('ascii'))
+        return self._sha
+
+    def resolve(self):
+        """
+        Get the commit SHA of the revision, symbolic ids like 'current' are
+        only resolved once
+        :rtype: str
+        :exception: ValueError, UnhandledError
+        """
+        if self._sha is None and self._cache is not None and self._patch_set_key() is not None:
+            sha = self._cache.get(self._patch_set_key())
+            if sha is not None:
+                self._sha = sha.decode('ascii')
+
+        if self._sha is None:
+            req = self._gerrit_con.call(r_endpoint=self._endpoint(self._revision_id, 'commit'))
+            self._resolved(self._content_result(req))
+
+        return self._sha
+
+    def _read(self, view):
+        """
+        Read a view of the revision, from the cache if it was read before
+        :rtype: bytes
+        :exception: ValueError, UnhandledError
+        """
+        if self._cache is not None:
+            self.resolve()
+            content = self._cached(view)
+            if content is not None:
+                return content
+
+        req = self._gerrit_con.call(r_endpoint=self._endpoint(self._sha or self._revision_id, view))
+        content = self._content_result(req)
+        self._store(view, content)
+        return content
+
+    @staticmethod
+    def _file_view(path, view):
+        return 'files/%s/%s' % (urllib.parse.quote(path, safe=''), view)
+
+    def get_commit(self):
+        """
+        Get the commit of the revision
+        :returns: The CommitInfo, with the SHA as 'commit'
+        :rtype: dict
+        :exception: ValueError, UnhandledError
+        """
+        return decode_json(self._read('commit'))
+
+    def get_files(self):
+        """
+        Get the files modified by the revision
+        :returns: FileInfo entities keyed on path
+        :rtype: dict
+        :exception: ValueError, UnhandledError
+        """
+        return decode_json(self._read('files/'))
+
+    def get_diff(self, path):
+        """
+        Get the diff of a file against the parent of the revision
+        :param path: Path of the file
+        :type path: str
+        :returns: The DiffInfo
+        :rtype: dict
+        :exception: ValueError, UnhandledError
+        """
+        return decode_json(self._read(self._file_view(path, 'diff')))
+
+    def get_patch(self):
+        """
+        Get the revision formatted as a patch
+        :returns: The patch, as git format-patch would write it
+        :rtype: bytes
+        :exception: ValueError, UnhandledError
+        """
+        return base64.b64decode(self._read('patch'))
+
+    def _download(self, view, dest, chunk_size):
+        """
+        Stream base64 content and write it decoded, a chunk at a time
+        :rtype: int
+        :exception: ValueError, UnhandledError
+        """
+        req = self._gerrit_con.call(
+            r_endpoint=self._endpoint(self._sha or self._revision_id, view),
+            stream=True,
+        )
+        try:
+            if req.status_code != 200:
+                self._content_result(req)
+
+            writer = _Writer(dest)
+            try:
+                for data in iter_base64(req.iter_content(chunk_size)):
+                    writer.write(data)
+            except BaseException:
+                writer.close(failed=True)
+                raise
+            writer.close()
+            return writer.written
+        finally:
+            req.close()
+
+    def download_patch(self, dest, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """
+        Download the revision formatted as a patch without holding it in
+        memory
+        :param dest: Path to write the patch to, or a binary file object or
+            a bytearray or memoryview large enough to hold it
+        :type dest: str, os.PathLike, file, bytearray or memoryview
+        :param chunk_size: Number of bytes to read from the socket at a time
+        :type chunk_size: int
+        :returns: The size of the patch
+        :rtype: int
+        :exception: ValueError, UnhandledError
+        """
+        return self._download('patch', dest, chunk_size)
+
+    def download_file(self, path, dest, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """
+        Download the content of a file of the revision without holding it
+        in memory
+        :param path: Path of the file in the revision
+        :type path: str
+        :param dest: Path to write the content to, or a binary file object
+            or a bytearray or memoryview large enough to hold it
+        :type dest: str, os.PathLike, file, bytearray or memoryview
+        :param chunk_size: Number of bytes to read from the socket at a time
+        :type chunk_size: int
+        :returns: The size of the file
+        :rtype: int
+        :exception: ValueError, UnhandledError
+        """
+        return self._download(self._file_view(path, 'content'), dest, chunk_size)
@@ -0,0 +1,210 @@
+"""
+Credentials
+===========
+
+Look up the credentials to connect to gerrit with
+"""
+
+import netrc
+import os
+import threading
+import urllib.parse
+
+from gerrit.error import CredentialsNotFound
+
+NETRC_FILES = ('.netrc', '_netrc')
+
+# Parsed netrc files of the process, by path, with the modification time
+# and size they were parsed at
+_NETRC_CACHE = {}
+_NETRC_LOCK = threading.Lock()
+
+
+def _netrc_path():
+    """
+    The netrc file to use, $NETRC or the first one found in the home
+    directory, None if there is none
+    :rtype: str
+    """
+    if os.environ.get('NETRC'):
+        candidates = (os.environ['NETRC'],)
+    else:
+        candidates = [os.path.join('~', name) for name in NETRC_FILES]
+
+    for candidate in candidates:
+        path = os.path.expanduser(candidate)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _parse_netrc(path):
+    """
+    Get a parsed netrc file, it is only parsed again once it changed
+    :rtype: netrc.netrc
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    version = (stat.st_mtime_ns, stat.st_size)
+
+    with _NETRC_LOCK:
+        cached = _NETRC_CACHE.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    try:
+        parsed = netrc.netrc(path)
+    except (netrc.NetrcParseError, OSError):
+        parsed = None
+
+    with _NETRC_LOCK:
+        _NETRC_CACHE[path] = (version, parsed)
+    return parsed
+
+
+def clear_netrc_cache():
+    """
+    Forget the parsed netrc files
+    """
+    with _NETRC_LOCK:
+        _NETRC_CACHE.clear()
+
+
+def get_netrc_auth(url):
+    """
+    Get the credentials for a URL from the netrc file, like
+    requests.utils.get_netrc_auth but the file is parsed once per
+    process and again only when it changes
+    :param url: URL to the gerrit server
+    :type url: str
+    :return: The login and password, None unless both are found
+    :rtype: tuple
+    """
+    path = _netrc_path()
+    if path is None:
+        return None
+
+    parsed = _parse_netrc(path)
+    if parsed is None:
+        return None
+
+    host = urllib.parse.urlsplit(url).hostname
+    if host is None:
+        return None
+
+    authenticators = parsed.authenticators(host)
+    if authenticators is None:
+        return None
+
+    # Like requests, fall back to the account if there is no login
+    login = authenticators[0] or authenticators[1]
+    if not login or not authenticators[2]:
+        return None
+    return login, authenticators[2]
+
+
+class NetrcProvider(object):
+    """Credentials from the netrc file"""
+
+    def get_credentials(self, url):
+        """
+        :param url: URL to the gerrit server
+        :type url: str
+        :return: The user and password, None if there are none
+        :rtype: tuple
+        """
+        return get_netrc_auth(url)
+
+
+class EnvProvider(object):
+    """Credentials from environment variables"""
+
+    def __init__(self, id_var='GERRIT_USERNAME', pw_var='GERRIT_PASSWORD'):
+        """
+        :param id_var: Variable holding the user
+        :type id_var: str
+        :param pw_var: Variable holding the HTTP password or token
+        :type pw_var: str
+        """
+        self.id_var = id_var
+        self.pw_var = pw_var
+
+    def get_credentials(self, url):  # pylint: disable=unused-argument
+        """
+        :param url: URL to the gerrit server
+        :type url: str
+        :return: The user and password, None unless both are set
+        :rtype: tuple
+        """
+        auth_id = os.environ.get(self.id_var)
+        auth_pw = os.environ.get(self.pw_var)
+        if not auth_id or not auth_pw:
+            return None
+        return auth_id, auth_pw
+
+
+class FileTokenProvider(object):
+    """
+    Credentials from a token file, read on every lookup so that a rotated
+    token is picked up by refresh_credentials
+    """
+
+    def __init__(self, path, username=None):
+        """
+        :param path: File holding the HTTP password or token, or
+            'user:token' if no username is given
+        :type path: str
+        :param username: The user the token belongs to
+        :type username: str
+        """
+        self.path = path
+        self.username = username
+
+    def get_credentials(self, url):  # pylint: disable=unused-argument
+        """
+        :param url: URL to the gerrit server
+        :type url: str
+        :return: The user and token, None if the file doesn't exist
+        :rtype: tuple
+        :exception: CredentialsNotFound
+        """
+        try:
+            with open(os.path.expanduser(self.path), encoding='utf-8') as token_file:
+                token = token_file.read().strip()
+        except FileNotFoundError:
+            return None
+
+        if self.username is not None:
+            auth_id, auth_pw = self.username, token
+        else:
+            auth_id, _, auth_pw = token.partition(':')
+
+        if not auth_id or not auth_pw:
+            raise CredentialsNotFound('No user and token found in %s' % self.path)
+        return auth_id, auth_pw
+
+
+class ChainProvider(object):
+    """Credentials from the first provider that has some"""
+
+    def __init__(self, *providers):
+        """
+        :param providers: The providers to ask, in order
+        :type providers: list
+        """
+        self.providers = providers
+
+    def get_credentials(self, url):
+        """
+        :param url: URL to the gerrit server
+        :type url: str
+        :return: The user and password, None if no provider has any
+        :rtype: tuple
+        """
+        for provider in self.providers:
+            credentials = provider.get_credentials(url)
+            if credentials:
+                return credentials
+        return None
@@ -0,0 +1,583 @@
+"""
+Events
+======
+
+Consume the gerrit event stream
+"""
+
+import datetime
+import json
+import queue
+import subprocess
+import threading
+import urllib
+
+from gerrit.changes.change import Change
+from gerrit.error import UnhandledError
+from gerrit.helper import decode_json
+from gerrit.projects.project import Project
+
+# Events that are read but not consumed yet, the reader stops reading
+# from gerrit while the queue is full
+DEFAULT_QUEUE_SIZE = 1000
+
+SSH_PORT = 29418
+
+
+def _timestamp(epoch):
+    """
+    Format epoch seconds like the timestamps of the REST API
+    """
+    if epoch is None:
+        return None
+    utc = datetime.datetime.fromtimestamp(epoch, datetime.timezone.utc)
+    return utc.strftime('%Y-%m-%d %H:%M:%S.000000000')
+
+
+class Event(object):
+    """An event from the gerrit event stream"""
+
+    __slots__ = ('_gerrit_con', 'type', 'created_on', 'raw')
+
+    def __init__(self, gerrit_con, raw):
+        """
+        :param gerrit_con: The connection object to gerrit, used by the
+            models of the event
+        :type gerrit_con: gerrit.Gerrit
+        :param raw: The event as sent by gerrit
+        :type raw: dict
+        """
+        self._gerrit_con = gerrit_con
+        self.type = raw.get('type')
+        self.created_on = raw.get('eventCreatedOn')
+        self.raw = raw
+
+    def __repr__(self):
+        return '<%s %s at %s>' % (type(self).__name__, self.type, self.created_on)
+
+    @property
+    def project(self):
+        """
+        The project the event happened in
+        :rtype: gerrit.projects.Project
+        """
+        name = self.raw.get('project', self.raw.get('projectName'))
+        if isinstance(name, dict):
+            name = name.get('name')
+        if name is None:
+            name = self.raw.get('change', {}).get('project')
+        if name is None:
+            return None
+
+        project = Project(self._gerrit_con)
+        return project._populate({'name': name})  # pylint: disable=protected-access
+
+
+class ChangeEvent(Event):
+    """An event about a change"""
+
+    __slots__ = ('_change',)
+
+    # The key of the account that caused the event
+    ACCOUNT_KEY = None
+
+    def __init__(self, gerrit_con, raw):
+        super().__init__(gerrit_con, raw)
+        self._change = None
+
+    @property
+    def change(self):
+        """
+        The change as it was when the event happened
+        :rtype: gerrit.changes.Change
+        """
+        if self._change is None:
+            attribute = self.raw.get('change', {})
+            change = Change(self._gerrit_con)
+            # pylint: disable=protected-access
+            self._change = change._populate({
+                'id': '%s~%s~%s' % (
+                    attribute.get('project'),
+                    attribute.get('branch'),
+                    attribute.get('id'),
+                ),
+                'project': attribute.get('project'),
+                'branch': attribute.get('branch'),
+                'change_id': attribute.get('id'),
+                'subject': attribute.get('subject'),
+                'status': attribute.get('status'),
+                'created': _timestamp(attribute.get('createdOn')),
+                'updated': _timestamp(attribute.get('lastUpdated')),
+                '_number': attribute.get('number'),
+                'owner': attribute.get('owner'),
+            })
+        return self._change
+
+    @property
+    def patch_set(self):
+        """
+        The patch set the event is about
+        :rtype: dict
+        """
+        return self.raw.get('patchSet')
+
+    @property
+    def account(self):
+        """
+        The account that caused the event
+        :rtype: dict
+        """
+        if self.ACCOUNT_KEY is None:
+            return None
+        return self.raw.get(self.ACCOUNT_KEY)
+
+
+class PatchSetCreatedEvent(ChangeEvent):
+    """A change or a new patch set was uploaded"""
+
+    __slots__ = ()
+    ACCOUNT_KEY = 'uploader'
+
+
+class CommentAddedEvent(ChangeEvent):
+    """A review was posted on a change"""
+
+    __slots__ = ()
+    ACCOUNT_KEY = 'author'
+
+    @property
+    def approvals(self):
+        """
+        The votes of the review
+        :rtype: list
+        """
+        return self.raw.get('approvals', [])
+
+    @property
+    def comment(self):
+        """
+        The message of the review
+        :rtype: str
+        """
+        return self.raw.get('comment')
+
+
+class ReviewerAddedEvent(ChangeEvent):
+    """A reviewer was added to a change"""
+
+    __slots__ = ()
+    ACCOUNT_KEY = 'reviewer'
+
+
+class ChangeMergedEvent(ChangeEvent):
+    """A change was submitted and merged"""
+
+    __slots__ = ()
+    ACCOUNT_KEY = 'submitter'
+
+
+class ChangeAbandonedEvent(ChangeEvent):
+    """A change was abandoned"""
+
+    __slots__ = ()
+    ACCOUNT_KEY = 'abandoner'
+
+
+class ChangeRestoredEvent(ChangeEvent):
+    """An abandoned change was restored"""
+
+    __slots__ = ()
+    ACCOUNT_KEY = 'restorer'
+
+
+class RefUpdatedEvent(Event):
+    """A ref was updated, e.g. by a direct push"""
+
+    __slots__ = ()
+
+    @property
+    def ref_update(self):
+        """
+        The project, ref and old and new revisions
+        :rtype: dict
+        """
+        return self.raw.get('refUpdate', {})
+
+    @property
+    def project(self):
+        name = self.ref_update.get('project')
+        if name is None:
+            return super().project
+        project = Project(self._gerrit_con)
+        return project._populate({'name': name})  # pylint: disable=protected-access
+
+
+class ProjectCreatedEvent(Event):
+    """A project was created"""
+
+    __slots__ = ()
+
+
+EVENT_TYPES = {
+    'patchset-created': PatchSetCreatedEvent,
+    'comment-added': CommentAddedEvent,
+    'reviewer-added': ReviewerAddedEvent,
+    'change-merged': ChangeMergedEvent,
+    'change-abandoned': ChangeAbandonedEvent,
+    'change-restored': ChangeRestoredEvent,
+    'ref-updated': RefUpdatedEvent,
+    'project-created': ProjectCreatedEvent,
+}
+
+
+def parse_event(gerrit_con, raw):
+    """
+    Wrap an event in its typed class
+    :param gerrit_con: The connection object to gerrit
+    :type gerrit_con: gerrit.Gerrit
+    :param raw: The event as sent by gerrit
+    :type raw: dict
+    :rtype: Event
+    """
+    event_class = EVENT_TYPES.get(raw.get('type'))
+    if event_class is None:
+        event_class = ChangeEvent if 'change' in raw else Event
+    return event_class(gerrit_con, raw)
+
+
+class SshEventSource(object):
+    """
+    Read events with 'gerrit stream-events' over ssh, this needs the
+    Stream Events capability. The stream can't replay events, those sent
+    while disconnected are lost, use the events-log plugin for that.
+    """
+
+    def __init__(self, host, port=SSH_PORT, username=None, ssh_command=('ssh',)):
+        """
+        :param host: The gerrit ssh host
+        :type host: str
+        :param port: The gerrit ssh port
+        :type port: int
+        :param username: The user to log in as, defaults to the ssh config
+        :type username: str
+        :param ssh_command: The ssh client and its options
+        :type ssh_command: tuple
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.ssh_command = tuple(ssh_command)
+        self._process = None
+        self._lock = threading.Lock()
+
+    def command(self):
+        """
+        The command that streams the events
+        :rtype: list
+        """
+        target = self.host if self.username is None else '%s@%s' % (self.username, self.host)
+        return list(self.ssh_command) + [
+            '-p', str(self.port),
+            '-o', 'BatchMode=yes',
+            '-o', 'ServerAliveInterval=30',
+            target, 'gerrit', 'stream-events',
+        ]
+
+    def events(self, since=None):  # pylint: disable=unused-argument
+        """
+        Read events until the connection is closed
+        :param since: Ignored, stream-events can't replay events
+        :type since: int
+        :rtype: generator of dict
+        """
+        with self._lock:
+            self._process = subprocess.Popen(  # pylint: disable=consider-using-with
+                self.command(),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            process = self._process
+
+        try:
+            for line in process.stdout:
+                if line.strip():
+                    yield decode_json(line)
+        finally:
+            self._stop(process)
+
+    def _stop(self, process):
+        if process.poll() is None:
+            process.terminate()
+        process.stdout.close()
+        process.wait()
+
+    def close(self):
+        """
+        Disconnect, this ends a running events()
+        """
+        with self._lock:
+            process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+
+class RestEventLogSource(object):
+    """
+    Poll the events-log plugin over the REST API, it keeps a history of
+    events so nothing is lost while disconnected
+    """
+
+    ENDPOINT = '/a/plugins/events-log/events/'
+
+    def __init__(self, gerrit_con, poll_interval=5.0):
+        """
+        :param gerrit_con: The connection object to gerrit
+        :type gerrit_con: gerrit.Gerrit
+        :param poll_interval: Seconds to wait between polls
+        :type poll_interval: float
+        """
+        self._gerrit_con = gerrit_con
+        self.poll_interval = poll_interval
+        self._closed = threading.Event()
+
+    def events(self, since=None):
+        """
+        Poll for events until closed
+        :param since: Epoch seconds of the last event already seen
+        :type since: int
+        :rtype: generator of dict
+        :exception: UnhandledError
+        """
+        self._closed.clear()
+
+        while not self._closed.is_set():
+            r_endpoint = self.ENDPOINT
+            if since is not None:
+                t1 = datetime.datetime.fromtimestamp(since, datetime.timezone.utc)
+                r_endpoint += '?%s' % urllib.parse.urlencode(
+                    {'t1': t1.strftime('%Y-%m-%d %H:%M:%S')})
+
+            req = self._gerrit_con.call(r_endpoint=r_endpoint)
+            if req.status_code != 200:
+                raise UnhandledError(req.content.decode('utf-8'))
+
+            # One event per line
+            for line in req.content.splitlines():
+                if line.strip():
+                    event = decode_json(line)
+                    since = max(since or 0, event.get('eventCreatedOn', 0))
+                    yield event
+
+            self._closed.wait(self.poll_interval)
+
+    def close(self):
+        """
+        Stop polling, this ends a running events()
+        """
+        self._closed.set()
+
+
+class EventStream(object):
+    """
+    Read events from a source on a background thread into a bounded
+    queue, reconnecting and resuming from the last event after errors
+    """
+
+    def __init__(self, source, gerrit_con=None, *,  # pylint: disable=too-many-arguments
+                 maxsize=DEFAULT_QUEUE_SIZE, since=None,
+                 reconnect_delay=1.0, reconnect_max=60.0):
+        """
+        :param source: Where the events are read from
+        :type source: SshEventSource or RestEventLogSource
+        :param gerrit_con: The connection the models of events use
+        :type gerrit_con: gerrit.Gerrit
+        :param maxsize: Events to buffer before reading is paused
+        :type maxsize: int
+        :param since: Epoch seconds of the last event already handled,
+            e.g. from a previous run
+        :type since: int
+        :param reconnect_delay: Seconds to wait before the first reconnect
+        :type reconnect_delay: float
+        :param reconnect_max: Longest wait between reconnects
+        :type reconnect_max: float
+        """
+        self._source = source
+        self._gerrit_con = gerrit_con
+        self._queue = queue.Queue(maxsize)
+        # Time of the last event handed to the consumer, what to persist
+        # and resume from, and of the last event read from the source
+        self.last_timestamp = since
+        self._read_timestamp = since
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max = reconnect_max
+        self.reconnects = 0
+        self.last_error = None
+        self._seen = set()
+        self._handlers = []
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __iter__(self):
+        """
+        The events as they arrive, until the stream is stopped
+        :rtype: generator of Event
+        """
+        while True:
+            try:
+                event = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stopped.is_set():
+                    return
+            else:
+                yield self._handed(event)
+
+    def start(self):
+        """
+        Start reading events in the background
+        :rtype: EventStream
+        """
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._read, name='gerrit-events', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """
+        Stop reading events, those already queued can still be consumed
+        :param timeout: Seconds to wait for the reader to finish
+        :type timeout: float
+        """
+        self._stopped.set()
+        self._source.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def get(self, timeout=None):
+        """
+        Take the next event
+        :param timeout: Seconds to wait for an event, None to wait forever
+        :type timeout: float
+        :rtype: Event
+        :exception: queue.Empty
+        """
+        return self._handed(self._queue.get(timeout=timeout))
+
+    def qsize(self):
+        """
+        Number of events waiting to be consumed
+        :rtype: int
+        """
+        return self._queue.qsize()
+
+    def on(self, event_type, handler):  # pylint: disable=invalid-name
+        """
+        Register a handler for dispatch
+        :param event_type: An Event class, handlers of a class also get
+            the events of its subclasses, or an event type name such as
+            'patchset-created'
+        :type event_type: type or str
+        :param handler: Called with each matching event
+        :type handler: callable
+        :rtype: EventStream
+        """
+        self._handlers.append((event_type, handler))
+        return self
+
+    def dispatch(self, event):
+        """
+        Call the handlers registered for an event
+        :param event: The event
+        :type event: Event
+        """
+        for event_type, handler in self._handlers:
+            if isinstance(event_type, str):
+                if event.type == event_type:
+                    handler(event)
+            elif isinstance(event, event_type):
+                handler(event)
+
+    def run(self):
+        """
+        Dispatch events as they arrive until the stream is stopped
+        """
+        for event in self:
+            self.dispatch(event)
+
+    def _handed(self, event):
+        """
+        Account for an event taken by the consumer, events still in the
+        queue are not handled yet
+        :rtype: Event
+        """
+        created_on = event.created_on
+        if created_on is not None and (self.last_timestamp is None or
+                                       created_on > self.last_timestamp):
+            self.last_timestamp = created_on
+        return event
+
+    def _is_new(self, raw):
+        """
+        Drop events that were already read before a reconnect
+        """
+        created_on = raw.get('eventCreatedOn')
+        if created_on is None:
+            return True
+
+        if self._read_timestamp is not None and created_on < self._read_timestamp:
+            return False
+
+        key = json.dumps(raw, sort_keys=True)
+        if created_on == self._read_timestamp:
+            if key in self._seen:
+                return False
+            self._seen.add(key)
+        else:
+            self._read_timestamp = created_on
+            self._seen = {key}
+        return True
+
+    def _put(self, event):
+        """
+        Queue an event, blocking while the queue is full
+        :returns: False if the stream was stopped while waiting
+        """
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(event, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self):
+        delay = self.reconnect_delay
+
+        while not self._stopped.is_set():
+            events = self._source.events(self._read_timestamp)
+            try:
+                for raw in events:
+                    if not self._is_new(raw):
+                        continue
+                    if not self._put(parse_event(self._gerrit_con, raw)):
+                        return
+                    delay = self.reconnect_delay
+            except Exception as error:  # pylint: disable=broad-except
+                # Keep the stream alive, the error is exposed for monitoring
+                self.last_error = error
+            finally:
+                events.close()
+
+            if self._stopped.wait(delay):
+                return
+            self.reconnects += 1
+            delay = min(delay * 2, self.reconnect_max)
@@ -5,27 +5,87 @@ Gerrit
 Set up connection to gerrit
 """
 
+# The models, the identity map and the cache are imported on first use,
+# most scripts only need a few of them
+# pylint: disable=import-outside-toplevel
+
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
-from requests.auth import HTTPDigestAuth
-from requests.utils import get_netrc_auth
+from urllib3.exceptions import NewConnectionError
 
-from gerrit.changes.revision import Revision
-from gerrit.changes.change import Change
+from gerrit.auth import SharedDigestAuth
+from gerrit.credentials import get_netrc_auth
 from gerrit.error import CredentialsNotFound
-from gerrit.projects.project import Project
-from gerrit.helper import process_endpoint
+from gerrit.helper import (
+    endpoint_template,
+    process_endpoint,
+)
+from gerrit.retry import Retry
+from gerrit.bulk import (
+    DEFAULT_WORKERS,
+    review_args,
+    run_bulk,
+)
+from gerrit.singleflight import SingleFlight
+
+
+# Seconds to wait for a connection to gerrit and between bytes of a response
+DEFAULT_TIMEOUT = (10, 60)
 
 
 class Gerrit(object):
     """Set up connection to gerrit"""
 
-    def __init__(self, url, auth_type=None, **kwargs):
+    def __init__(self, url, auth_type=None, *, pool_connections=10,  # pylint: disable=too-many-arguments,too-many-locals
+                 pool_maxsize=10, pool_block=False, cache=None,
+                 timeout=DEFAULT_TIMEOUT, retry=None, rate_limiter=None,
+                 identity_map=None, single_flight=False, credentials=None,
+                 revision_cache=False, **kwargs):
         """
         :param url: URL to the gerrit server
         :type url: str
         :param auth_type: Authentication method preferred
         :type auth_type: str
+        :param pool_connections: Number of host pools to keep alive
+        :type pool_connections: int
+        :param pool_maxsize: Maximum number of connections kept per host
+        :type pool_maxsize: int
+        :param pool_block: Block when all connections to a host are in use
+            instead of opening throwaway connections
+        :type pool_block: bool
+        :param cache: Cache for the responses of GET requests
+        :type cache: gerrit.cache.ResponseCache
+        :param timeout: Connect and read timeouts in seconds
+        :type timeout: tuple
+        :param retry: Retry policy, defaults to Retry(), use Retry(total=0)
+            to disable retries
+        :type retry: gerrit.retry.Retry
+        :param rate_limiter: Limits the rate of requests, may be shared
+            with other connections
+        :type rate_limiter: gerrit.retry.TokenBucket
+        :param identity_map: Returns the same instance every time the same
+            project or change is fetched, updated in place
+        :type identity_map: gerrit.identity.IdentityMap
+        :param single_flight: Send concurrent identical GET requests once
+            and share the response between the callers. Off by default as
+            a GET sent right after a write may then get the response of a
+            GET that was sent before the write.
+        :type single_flight: bool
+        :param credentials: Where to look up the user and password when
+            auth_id and auth_pw aren't given, defaults to the netrc file
+        :type credentials: gerrit.credentials.NetrcProvider,
+            gerrit.credentials.EnvProvider,
+            gerrit.credentials.FileTokenProvider or
+            gerrit.credentials.ChainProvider
+        :param revision_cache: Keeps the files, diffs, patches and commits
+            of revisions by commit SHA, True for an in memory cache, a
+            gerrit.cache.SqliteCache to keep them on disk. Revisions that
+            aren't addressed by their SHA, e.g. 'current', are resolved
+            with an extra request the first time they are read.
+        :type revision_cache: bool or gerrit.cache.ResponseCache
         """
 
         # HTTP REST API HEADERS
@@ -36,6 +96,32 @@ class Gerrit(object):
         self._url = url.rstrip('/')
 
         self._auth = None
+        self._auth_id = None
+        self._credentials = credentials
+        self._auth_kwargs = kwargs
+        self._cache = cache
+        self._timeout = timeout
+        self._retry = retry if retry is not None else Retry()
+        self._rate_limiter = rate_limiter
+        self._identity_map = identity_map
+        self._single_flight = SingleFlight() if single_flight else None
+        if revision_cache is True:
+            from gerrit.cache import MemoryCache
+            revision_cache = MemoryCache(max_bytes=32 * 1024 * 1024)
+        self._revision_cache = revision_cache
+        self._pre_call_hooks = []
+        self._post_call_hooks = []
+
+        # One session per instance, so that connections are kept alive
+        # and reused between calls. The adapter pool is thread safe.
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
 
         if auth_type:
             if auth_type == 'http':
@@ -47,14 +133,82 @@ class Gerrit(object):
         else:
             self._http_auth(**kwargs)
 
+    def add_call_hook(self, pre=None, post=None):
+        """
+        Instrument the calls to gerrit. Endpoints are passed to the hooks
+        without their ids, e.g. '/a/changes/{id}/reviewers/'.
+        :param pre: Called as pre(request, endpoint) before each call
+        :type pre: callable
+        :param post: Called as post(request, endpoint, status, size, elapsed)
+            after each call, status is None if the call raised and size is
+            the number of bytes in the body when it is known
+        :type post: callable
+        """
+        if pre is not None:
+            self._pre_call_hooks.append(pre)
+        if post is not None:
+            self._post_call_hooks.append(post)
+
+    def remove_call_hook(self, pre=None, post=None):
+        """
+        Remove hooks added with add_call_hook
+        :param pre: The pre call hook to remove
+        :type pre: callable
+        :param post: The post call hook to remove
+        :type post: callable
+        """
+        if pre is not None:
+            self._pre_call_hooks.remove(pre)
+        if post is not None:
+            self._post_call_hooks.remove(post)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Close the session and release all pooled connections
+        """
+        self._session.close()
+
+    def single_flight_stats(self):
+        """
+        How many GET requests were sent and how many were served by an
+        identical request that was already in flight
+        :return: e.g. {'sent': 10, 'coalesced': 40}, None if single flight
+            is disabled
+        :rtype: dict
+        """
+        if self._single_flight is None:
+            return None
+        return self._single_flight.stats()
+
+    def refresh_credentials(self):
+        """
+        Look up the credentials again, e.g. after a token was rotated,
+        and use them for the following calls
+        :exception: CredentialsNotFound
+        """
+        self._http_auth(**self._auth_kwargs)
+
     def _netrc_auth(self):
-        if get_netrc_auth(self._url):
-            netrc_id, netrc_pw = get_netrc_auth(self._url)
-        else:
+        netrc_auth = get_netrc_auth(self._url)
+        if not netrc_auth:
             raise CredentialsNotFound(
                 "No Credentials for %s found in .netrc" %
                 self._url)
-        return netrc_id, netrc_pw
+        return netrc_auth
+
+    def _provider_auth(self):
+        credentials = self._credentials.get_credentials(self._url)
+        if not credentials:
+            raise CredentialsNotFound(
+                "No Credentials for %s found by %s" %
+                (self._url, type(self._credentials).__name__))
+        return credentials
 
     def _http_auth(self, **kwargs):
         # Assume netrc file if no auth_id or auth_pw was given.
@@ -62,7 +216,10 @@ class Gerrit(object):
             auth_id = kwargs['auth_id']
             auth_pw = kwargs['auth_pw']
         elif 'auth_id' not in kwargs and 'auth_pw' not in kwargs:
-            auth_id, auth_pw = self._netrc_auth()
+            if self._credentials is not None:
+                auth_id, auth_pw = self._provider_auth()
+            else:
+                auth_id, auth_pw = self._netrc_auth()
         else:
             raise CredentialsNotFound(
                 'Supply both auth_id and auth_pw or neither')
@@ -78,15 +235,19 @@ class Gerrit(object):
                 "Authorization method '%s' for auth_type 'http' is not implemented" %
                 kwargs['auth_method'])
 
+        self._auth_id = auth_id
+
     def _http_basic_auth(self, auth_id, auth_pw):
         # We got everything as we expected, create the HTTPBasicAuth object.
         self._auth = HTTPBasicAuth(auth_id, auth_pw)
 
     def _http_digest_auth(self, auth_id, auth_pw):
-        # We got everything as we expected, create the HTTPDigestAuth object.
-        self._auth = HTTPDigestAuth(auth_id, auth_pw)
+        # We got everything as we expected, create the digest auth object.
+        # It is shared by all calls so the nonce is only negotiated once.
+        self._auth = SharedDigestAuth(auth_id, auth_pw)
 
-    def call(self, request='get', r_endpoint=None, r_payload=None, r_headers=None):
+    def call(self, request='get', r_endpoint=None, r_payload=None, r_headers=None,
+             stream=False):
         """
         Send request to gerrit.
         :param request: The type of http request to perform
@@ -95,28 +256,201 @@ class Gerrit(object):
         :type r_endpoint: str
         :param r_payload: The data to send to the specified API endpoint
         :type r_payload: dict
+        :param stream: Don't read the body up front, it can then be parsed
+            incrementally with gerrit.helper.iter_response. Streamed
+            responses are never cached.
+        :type stream: bool
 
-        :return: The http request
-        :rtype: requests.packages.urllib3.response.HTTPResponse
+        :return: The http response. With a cache, GET requests may be
+            served from it as a gerrit.cache.CacheEntry, which has the
+            status_code, content, headers, ok, text, json(),
+            raise_for_status() and close() of a response.
+        :rtype: requests.Response or gerrit.cache.CacheEntry
         """
 
+        if not self._pre_call_hooks and not self._post_call_hooks:
+            return self._call(request, r_endpoint, r_payload, r_headers, stream)
+
+        template = endpoint_template(r_endpoint)
+        for hook in self._pre_call_hooks:
+            hook(request, template)
+
+        status = None
+        size = None
+        start = time.perf_counter()
+        try:
+            req = self._call(request, r_endpoint, r_payload, r_headers, stream)
+            status = req.status_code
+            if stream:
+                size = req.headers.get('Content-Length')
+                size = int(size) if size is not None else None
+            else:
+                size = len(req.content)
+            return req
+        finally:
+            elapsed = time.perf_counter() - start
+            for hook in self._post_call_hooks:
+                hook(request, template, status, size, elapsed)
+
+    def _call(self, request, r_endpoint, r_payload, r_headers, stream):
         if r_headers is None:
             r_headers = self._requests_headers
 
+        endpoint = process_endpoint(r_endpoint)
+        url = self._url + endpoint
+
+        if request == 'get' and not stream:
+            if self._single_flight is not None and r_payload is None:
+                key = (url,) + tuple(sorted(r_headers.items()))
+                return self._single_flight.do(key, self._get, endpoint, url, r_payload, r_headers)
+            return self._get(endpoint, url, r_payload, r_headers)
+
+        if self._cache is None or request == 'get':
+            return self._send(request, url, r_payload, r_headers, stream)
+
+        from gerrit.cache import resource_tag
+
+        req = self._send(request, url, r_payload, r_headers, stream)
+
+        # Drop the cached reads of the written resource, and the cached
+        # lists and queries it may show up in.
+        tag = resource_tag(endpoint)
+        self._cache.invalidate(self._cache_tag(tag))
+        self._cache.invalidate(self._cache_tag(tag.split('/')[0]))
+
+        return req
+
+    def _send(self, request, url, r_payload, r_headers, stream=False):
         request_do = {
-            'get': requests.get,
-            'put': requests.put,
-            'post': requests.post,
-            'delete': requests.delete
+            'get': self._session.get,
+            'put': self._session.put,
+            'post': self._session.post,
+            'delete': self._session.delete
         }
-        req = request_do[request](
-            url=self._url + process_endpoint(r_endpoint),
-            auth=self._auth,
-            headers=r_headers,
-            json=r_payload
+        send = request_do[request]
+        attempt = 0
+
+        while True:
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire()
+
+            try:
+                req = send(
+                    url=url,
+                    auth=self._auth,
+                    headers=r_headers,
+                    json=r_payload,
+                    stream=stream,
+                    timeout=self._timeout,
+                )
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if not self._retry.can_retry(request, attempt, self._maybe_sent(error)):
+                    raise
+                wait = self._retry.backoff(attempt)
+            else:
+                # Gerrit rejects requests over its rate limit before
+                # processing them
+                sent = req.status_code != 429
+                if (req.status_code not in self._retry.status_forcelist or
+                        not self._retry.can_retry(request, attempt, sent)):
+                    return req
+                wait = self._retry.wait_time(attempt, req)
+                req.close()
+
+            time.sleep(wait)
+            attempt += 1
+
+    @staticmethod
+    def _maybe_sent(error):
+        """
+        Whether a request that failed may have reached gerrit, it didn't
+        if no connection could be made
+        :rtype: bool
+        """
+        if isinstance(error, requests.ConnectTimeout):
+            return False
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return not isinstance(reason, NewConnectionError)
+
+    def _cache_tag(self, tag):
+        # Tags are scoped per server as caches may be shared
+        return '%s %s' % (self._url, tag)
+
+    def _cache_key(self, url):
+        # Users may see different things, so caches shared between
+        # connections must not mix up their responses
+        return '%s %s' % (self._auth_id, url)
+
+    def _get(self, endpoint, url, r_payload, r_headers):
+        if self._cache is None:
+            return self._send('get', url, r_payload, r_headers)
+        return self._cached_get(endpoint, url, r_payload, r_headers)
+
+    def _cached_get(self, endpoint, url, r_payload, r_headers):
+        from gerrit.cache import (
+            CacheEntry,
+            endpoint_family,
+            resource_tag,
         )
+
+        ttl = self._cache.ttl.get(endpoint_family(endpoint))
+        if ttl is None:
+            return self._send('get', url, r_payload, r_headers)
+
+        key = self._cache_key(url)
+        entry = self._cache.get(key)
+        if entry is not None:
+            if entry.is_fresh():
+                return entry
+            # Stale, ask gerrit if it still has the same version
+            r_headers = dict(r_headers)
+            r_headers['If-None-Match'] = entry.etag
+
+        req = self._send('get', url, r_payload, r_headers)
+
+        if req.status_code == 304 and entry is not None:
+            self._cache.touch(key, time.time() + ttl)
+            return entry
+
+        if req.status_code == 200:
+            self._cache.set(key, CacheEntry(
+                req.status_code,
+                req.content,
+                req.headers.get('ETag'),
+                time.time() + ttl,
+                (self._cache_tag(resource_tag(endpoint)),),
+            ))
+
         return req
 
+    def _content_cache(self):
+        """
+        Get the cache of the revisions for this connection
+        :rtype: gerrit.cache.ContentCache
+        """
+        # An empty cache is falsy, only None and False disable it
+        if self._revision_cache is None or self._revision_cache is False:
+            return None
+
+        from gerrit.cache import ContentCache
+
+        return ContentCache(self._revision_cache, self._cache_key(self._url))
+
+    def _intern(self, instance):
+        """
+        Get the canonical instance of a project or change that was fetched
+        """
+        if self._identity_map is None:
+            return instance
+        return self._identity_map.intern(instance)
+
+    def _intern_all(self, instances):
+        """
+        Get the canonical instances of changes as they are fetched
+        """
+        for instance in instances:
+            yield self._intern(instance)
+
     def get_revision(self, change_id, revision_id=None):
         """
         Get a revision
@@ -128,24 +462,28 @@ class Gerrit(object):
         :return: Review object
         :rtype: gerrit.changes.Revision
         """
+        from gerrit.changes.revision import Revision
 
-        return Revision(self, change_id, revision_id)
+        return Revision(self, change_id, revision_id, cache=self._content_cache())
 
-    def create_project(self, name, options=None):
+    def create_project(self, name, options=None, refresh=False):
         """
         Create a project
         :param name: Name of the project
         :type name: str
         :param options: Additional options
         :type options: dict
+        :param refresh: Fetch the project after creating it
+        :type refresh: bool
 
         :return: Project if successful
         :rtype: gerrit.projects.Project
         :exception: AlreadyExists, UnhandledError
         """
+        from gerrit.projects.project import Project
 
         project = Project(self)
-        return project.create_project(name, options)
+        return self._intern(project.create_project(name, options, refresh))
 
     def get_project(self, name):
         """
@@ -156,11 +494,18 @@ class Gerrit(object):
         :return: Project object
         :rtype: gerrit.projects.Project
         """
+        from gerrit.identity import PROJECTS
+        from gerrit.projects.project import Project
+
+        if self._identity_map is not None:
+            project = self._identity_map.get_fresh(PROJECTS, name)
+            if project is not None:
+                return project
 
         project = Project(self)
-        return project.get_project(name)
+        return self._intern(project.get_project(name))
 
-    def create_change(self, project, subject, branch='master', options=None):
+    def create_change(self, project, subject, branch='master', options=None, refresh=False):
         """
         Create a change
 	:param project: Project to create change in
@@ -171,12 +516,15 @@ class Gerrit(object):
 	:type branch: str
 	:param options: Additional options
 	:type options: dict
+	:param refresh: Fetch the change after creating it
+	:type refresh: bool
 	"""
+        from gerrit.changes.change import Change
 
         change = Change(self)
-        return change.create_change(project, subject, branch, options)
+        return self._intern(change.create_change(project, subject, branch, options, refresh))
 
-    def get_change(self, project, change_id, branch='master'):
+    def get_change(self, project, change_id, branch='master', options=None):
         """
         Get a change
         :param project: Project that contains change
@@ -185,6 +533,144 @@ class Gerrit(object):
         :type change_id: str
         :param branch: Branch change exists in
         :type branch: str
+        :param options: Additional fields to include, e.g. ['LABELS'],
+            fields that are left out are fetched when they are first read
+        :type options: list
         """
+        from gerrit.changes.change import Change
+        from gerrit.identity import CHANGES
+
+        if self._identity_map is not None:
+            full_id = '%s~%s~%s' % (getattr(project, 'name', project), branch, change_id)
+            change = self._identity_map.get_fresh(CHANGES, full_id)
+            if change is not None:
+                return change
+
         change = Change(self)
-        return change.get_change(project, branch, change_id)
+        return self._intern(change.get_change(project, branch, change_id, options))
+
+    def get_changes(self, changes, options=None):
+        """
+        Get many changes using as few requests as possible
+        :param changes: Change ids or numbers, or tuples of
+            (project, change_id) or (project, change_id, branch)
+        :type changes: list
+        :param options: Additional fields to include, e.g. ['LABELS']
+        :type options: list
+
+        :return: The changes that were found, in the requested order
+        :rtype: list of gerrit.changes.Change
+        """
+        from gerrit.changes.query import Query
+
+        query = Query(self)
+        return list(self._intern_all(query.get_changes(changes, options)))
+
+    def query_changes(self, query, options=None, limit=None):
+        """
+        Get all changes matching a query
+        :param query: The gerrit search query, e.g. 'status:open'
+        :type query: str
+        :param options: Additional fields to include, e.g. ['LABELS']
+        :type options: list
+        :param limit: The maximum number of changes to return
+        :type limit: int
+
+        :return: The matching changes
+        :rtype: list of gerrit.changes.Change
+        """
+        from gerrit.changes.query import Query
+
+        change_query = Query(self)
+        return list(self._intern_all(change_query.query_changes(query, options, limit)))
+
+    def iter_changes(self, query, page_size=100, options=None):
+        """
+        Lazily iterate over all changes matching a query, the next page
+        is fetched in the background while the current one is consumed
+        :param query: The gerrit search query, e.g. 'status:open'
+        :type query: str
+        :param page_size: Number of changes to fetch per request
+        :type page_size: int
+        :param options: Additional fields to include, e.g. ['LABELS']
+        :type options: list
+
+        :return: The matching changes
+        :rtype: generator of gerrit.changes.Change
+        """
+        from gerrit.changes.query import Query
+
+        change_query = Query(self)
+        changes = change_query.iter_changes(query, page_size, options)
+        if self._identity_map is None:
+            return changes
+        return self._intern_all(changes)
+
+    def add_reviewers_bulk(self, assignments, max_workers=DEFAULT_WORKERS,  # pylint: disable=too-many-locals
+                           single_request=False):
+        """
+        Add reviewers to many changes over a bounded pool of workers
+        :param assignments: The accounts to add, keyed on change
+        :type assignments: dict of gerrit.changes.Change or Change-Id to list
+        :param max_workers: Maximum number of requests running at once
+        :type max_workers: int
+        :param single_request: Add the reviewers of each change with one
+            review request instead of one request per account
+        :type single_request: bool
+
+        :return: Per change and account, True if the account was added or
+            the LookupError, AlreadyExists or UnhandledError it failed with
+        :rtype: dict
+        """
+        from gerrit.changes.change import Change
+        from gerrit.changes.reviewer import Reviewer
+
+        results = {}
+        reviewers = {}
+        for change, accounts in assignments.items():
+            results[change] = dict.fromkeys(accounts)
+            change_id = change.change_id if isinstance(change, Change) else change
+            reviewers[change] = Reviewer(self, change_id)
+
+        if single_request:
+            def add_all(change):
+                return reviewers[change].add_reviewers(results[change], single_request=True)
+
+            for result in run_bulk(add_all, list(results), max_workers):
+                if result.error is None:
+                    results[result.item].update(result.value)
+                else:
+                    results[result.item].update(dict.fromkeys(results[result.item], result.error))
+        else:
+            def add_one(item):
+                return reviewers[item[0]].add_reviewer(item[1])
+
+            pairs = [(change, account) for change, accounts in results.items()
+                     for account in accounts]
+            for result in run_bulk(add_one, pairs, max_workers):
+                change, account = result.item
+                results[change][account] = result.value if result.error is None else result.error
+
+        return results
+
+    def set_reviews(self, reviews, max_workers=DEFAULT_WORKERS):
+        """
+        Set reviews on many changes over a bounded pool of workers
+        :param reviews: Tuples of (change, revision, labels, message,
+            comments), everything after the change is optional
+        :type reviews: iterable
+        :param max_workers: Maximum number of requests running at once
+        :type max_workers: int
+
+        :return: A result per review as soon as it completes, with the
+            exception it failed with as error
+        :rtype: generator of gerrit.bulk.BulkResult
+        """
+        from gerrit.changes.revision import Revision
+
+        def set_review(item):
+            change_id, revision_id, labels, message, comments = review_args(item)
+            revision = Revision(self, change_id, revision_id)
+            return revision.set_review(labels=labels, message=message, comments=comments)
+
+        return run_bulk(set_review, reviews, max_workers)
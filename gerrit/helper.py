@@ -4,17 +4,402 @@ Helper
 Helper functions
 """
 
+import base64
+import codecs
+import re
+import sys
 import urllib
 import json
+from json.decoder import WHITESPACE
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Gerrit prefixes all JSON responses with this to prevent Cross Site
+# Script Inclusion
+XSSI_PREFIX = ")]}'"
+
+_DECODER = json.JSONDecoder()
+
+# What is left of the buffer after a number that may continue in the next
+# chunk, e.g. after 1 in '1.' or 1.5 in '1.5e'
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*$')
+
+# Collections in the REST API whose next path segment is an id
+ID_COLLECTIONS = (
+    'accounts', 'branches', 'changes', 'comments', 'drafts', 'files',
+    'groups', 'members', 'projects', 'reviewers', 'revisions', 'tags',
+)
+
+# Sub resources of a project, used to find where a project name ends as
+# the names of nested projects aren't always quoted
+PROJECT_VIEWS = (
+    'access', 'branches', 'children', 'config', 'dashboards',
+    'description', 'HEAD', 'parent', 'statistics.git', 'tags',
+)
+
+
+def _xssi_offset(gerrit_response):
+    """
+    Get the offset of the JSON text after the XSSI prefix
+    """
+    prefix = XSSI_PREFIX
+    if not isinstance(gerrit_response, str):
+        prefix = XSSI_PREFIX.encode('ascii')
+
+    offset = 0
+    while offset < len(gerrit_response) and gerrit_response[offset:offset + 1] in prefix:
+        offset += 1
+    return offset
 
 
 def decode_json(gerrit_response):
     """
     Strip Cross Site Script Inclusion prefix from
-    gerrit API response and return it as an object
+    gerrit API response and return it as an object.
+    The response is parsed from the offset after the prefix instead of
+    being copied, bytes are parsed directly with orjson when it is
+    installed.
+    :param gerrit_response: The body of the response
+    :type gerrit_response: str, bytes, bytearray or memoryview
+    :exception: ValueError
+    """
+
+    offset = _xssi_offset(gerrit_response)
+
+    if isinstance(gerrit_response, str):
+        if orjson is not None and offset == 0:
+            return orjson.loads(gerrit_response)  # pylint: disable=no-member
+        text = gerrit_response
+    else:
+        view = memoryview(gerrit_response)[offset:]
+        if orjson is not None:
+            return orjson.loads(view)  # pylint: disable=no-member
+        text = str(view, 'utf-8')
+        offset = 0
+
+    offset = WHITESPACE.match(text, offset).end()
+    obj, end = _DECODER.raw_decode(text, offset)
+    end = WHITESPACE.match(text, end).end()
+    if end != len(text):
+        raise json.JSONDecodeError('Extra data', text, end)
+    return obj
+
+
+class _NotFetched(object):
+    """Type of NOT_FETCHED"""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'NOT_FETCHED'
+
+    def __bool__(self):
+        return False
+
+
+# Value of a lazy field that wasn't part of the response it was read from
+NOT_FETCHED = _NotFetched()
+
+# AccountInfos seen in responses by _account_id, see shared_account
+_ACCOUNTS = {}
+_MAX_ACCOUNTS = 4096
+
+
+def intern_str(value):
+    """
+    Intern a string that repeats across entities, such as the project,
+    branch or status of a change, so that they all hold one copy of it
+    :param value: The value of the field, may be None
+    :rtype: str
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def shared_account(account):
+    """
+    Get one AccountInfo per account, so that the changes owned by the same
+    account hold a single dict instead of a copy each. The returned dict is
+    shared and must not be modified.
+    :param account: The AccountInfo from a response, may be None
+    :type account: dict
+    :rtype: dict
+    """
+    if not isinstance(account, dict) or '_account_id' not in account:
+        return account
+
+    key = account['_account_id']
+    known = _ACCOUNTS.get(key)
+    if known == account:
+        return known
+
+    if len(_ACCOUNTS) >= _MAX_ACCOUNTS:
+        _ACCOUNTS.clear()
+    for field, value in account.items():
+        if isinstance(value, str):
+            account[field] = sys.intern(value)
+    _ACCOUNTS[key] = account
+    return account
+
+
+class LazyField(object):
+    """
+    Attribute holding a field of a JSON entity that is only fetched once
+    it is read. Store NOT_FETCHED in slot to have it fetched by the loader
+    when it is first read.
+    """
+
+    def __init__(self, slot, loader=None):
+        """
+        :param slot: Name of the attribute holding the value
+        :type slot: str
+        :param loader: Name of the method that fetches the value when the
+            slot holds NOT_FETCHED
+        :type loader: str
+        """
+        self._slot = slot
+        self._loader = loader
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self._slot)
+        if value is NOT_FETCHED:
+            if self._loader is None:
+                return None
+            getattr(obj, self._loader)()
+            value = getattr(obj, self._slot)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self._slot, value)
+
+
+def iter_json(chunks):
     """
+    Incrementally parse the top level array or object of a gerrit
+    response, yielding each element as soon as it is complete so that
+    only one element is held in memory at a time.
+    Arrays yield their items and objects yield (key, value) tuples.
+    :param chunks: The body of the response in pieces
+    :type chunks: iterable of bytes
+    :exception: ValueError
+    """
+    return _JsonStream(chunks).elements()
+
+
+def iter_response(response, chunk_size=64 * 1024):
+    """
+    Incrementally parse a response fetched with Gerrit.call(stream=True)
+    :param response: The streamed http response
+    :type response: requests.Response
+    :param chunk_size: Number of bytes to read from the socket at a time
+    :type chunk_size: int
+    :exception: ValueError
+    """
+    try:
+        yield from iter_json(response.iter_content(chunk_size))
+    finally:
+        response.close()
+
+
+class Base64Decoder(object):
+    """
+    Decode base64 that arrives in pieces, such as a patch or file content
+    read from the socket, without holding more than a piece in memory
+    """
+
+    def __init__(self):
+        self._pending = b''
+
+    def decode(self, chunk):
+        """
+        Decode the next piece, a group of characters split across pieces
+        is decoded once it is complete
+        :param chunk: The next piece of base64
+        :type chunk: bytes
+        :return: The decoded bytes, may be empty
+        :rtype: bytes
+        :exception: ValueError
+        """
+        data = self._pending + bytes(chunk).translate(None, b' \t\r\n')
+        end = len(data) - len(data) % 4
+        self._pending = data[end:]
+        return base64.b64decode(data[:end], validate=True)
+
+    def finish(self):
+        """
+        Check that nothing is left over
+        :exception: ValueError
+        """
+        if self._pending:
+            raise ValueError('Truncated base64 content')
+
+
+def iter_base64(chunks):
+    """
+    Decode base64 piece by piece
+    :param chunks: The base64 text in pieces
+    :type chunks: iterable of bytes
+    :exception: ValueError
+    """
+    decoder = Base64Decoder()
+    for chunk in chunks:
+        data = decoder.decode(chunk)
+        if data:
+            yield data
+    decoder.finish()
+
+
+class _JsonStream(object):
+    """Parser state for iter_json"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._done = False
+
+    def _more(self, min_size=1):
+        """
+        Append at least min_size characters to the buffer, unless the
+        stream ends first
+        :returns: False if the stream has ended
+        """
+        if self._done:
+            return False
+
+        pending = [self._buf[self._pos:]]
+        size = 0
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            pending.append(text)
+            size += len(text)
+            if size >= min_size:
+                break
+        else:
+            pending.append(self._decoder.decode(b'', final=True))
+            self._done = True
+
+        self._buf = ''.join(pending)
+        self._pos = 0
+        return size > 0 or not self._done
+
+    def _peek(self):
+        """
+        Skip whitespace and return the next character, '' at the end
+        """
+        while True:
+            self._pos = WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._more():
+                return ''
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char == '' or char not in chars:
+            raise ValueError(
+                'Expected one of %r at position %d of the buffer, got %r' %
+                (chars, self._pos, char))
+        self._pos += 1
+        return char
+
+    def _number_continues(self, obj, end):
+        """
+        Whether a number was cut short by the end of the buffer, the
+        decoder stops at a '.' or an exponent that isn't followed by digits
+        """
+        if isinstance(obj, bool) or not isinstance(obj, (int, float)):
+            return False
+        return _NUMBER_TAIL.match(self._buf, end) is not None
+
+    def _value(self):
+        """
+        Parse the next complete value
+        """
+        self._peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._done:
+                    raise
+            else:
+                # A number or literal at the end of the buffer may continue
+                # in the next chunk
+                if self._done or (end < len(self._buf) and not self._number_continues(obj, end)):
+                    self._pos = end
+                    return obj
+            # Grow the buffer by at least its size before retrying, so that
+            # large elements are parsed in linear time
+            self._more(max(1, len(self._buf) - self._pos))
+
+    def elements(self):
+        """
+        Yield the elements of the top level array or object
+        """
+        char = self._peek()
+        while char != '' and char in XSSI_PREFIX:
+            self._pos += 1
+            char = self._peek()
+
+        opener = self._expect('[{')
+        closer = ']' if opener == '[' else '}'
+
+        if self._peek() == closer:
+            self._pos += 1
+        else:
+            while True:
+                if opener == '{':
+                    key = self._value()
+                    self._expect(':')
+                    yield key, self._value()
+                else:
+                    yield self._value()
+
+                if self._expect(',' + closer) == closer:
+                    break
+
+        if self._peek() != '':
+            raise ValueError('Extra data after the top level %s' % opener)
+
+
+def endpoint_template(endpoint):
+    """
+    Get an endpoint with its ids and query replaced by placeholders, so
+    that calls to the same endpoint can be grouped together
+    :param endpoint: The endpoint as passed to Gerrit.call
+    :type endpoint: str/dict
+
+    :return: e.g. '/a/changes/{id}/reviewers/'
+    :rtype: str
+    """
+    if not isinstance(endpoint, str):
+        post = (endpoint.get('post') or '/').split('?')[0]
+        return '%s{id}%s' % (endpoint.get('pre'), post)
+
+    segments = endpoint.split('?')[0].split('/')
+    template = segments[:1]
+    index = 1
+    while index < len(segments):
+        if template[-1] in ID_COLLECTIONS and segments[index] != '':
+            if template[-1] == 'projects':
+                # A nested project name is a single id
+                while (index + 1 < len(segments) and segments[index + 1] != '' and
+                       segments[index + 1] not in PROJECT_VIEWS):
+                    index += 1
+            template.append('{id}')
+        else:
+            template.append(segments[index])
+        index += 1
+    return '/'.join(template)
 
-    return json.loads(gerrit_response.lstrip(')]}\''))
 
 def process_endpoint(endpoint):
     """
@@ -0,0 +1,159 @@
+"""
+Identity
+========
+
+Keep a single canonical instance per gerrit project and change
+"""
+
+import threading
+import time
+import weakref
+
+from gerrit.changes.change import Change
+from gerrit.projects.project import Project
+
+PROJECTS = 'projects'
+CHANGES = 'changes'
+
+
+def identity_key(instance):
+    """
+    Get what identifies a project or change
+    :param instance: The project or change
+    :type instance: gerrit.projects.Project or gerrit.changes.Change
+    :return: The kind and key, projects are keyed on their name and
+        changes on their full id, the key is None if it is not known yet
+    :rtype: tuple
+    :exception: TypeError
+    """
+    if isinstance(instance, Project):
+        return PROJECTS, instance.name
+    if isinstance(instance, Change):
+        return CHANGES, instance.full_id
+    raise TypeError('Only projects and changes can be interned, got %r' % instance)
+
+
+def _slots(cls):
+    """
+    All instance attributes declared in the slots of a class and its bases
+    """
+    names = []
+    for klass in reversed(cls.__mro__):
+        slots = klass.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        names.extend(name for name in slots if name not in ('__weakref__', '__dict__'))
+    return names
+
+
+class IdentityMap(object):
+    """
+    Weakly referenced canonical projects and changes of a connection, an
+    instance lives as long as the application holds on to it
+    """
+
+    def __init__(self, ttl=None):
+        """
+        :param ttl: Seconds an instance is considered fresh after it was
+            fetched, None to always fetch again
+        :type ttl: float
+        """
+        self.ttl = ttl
+        self._entries = {}
+        # Reentrant as the garbage collector can drop an entry while the
+        # map is being updated on the same thread
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _forget(self, key, ref):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is ref:
+                del self._entries[key]
+
+    def get(self, kind, key):
+        """
+        Get the canonical instance
+        :param kind: PROJECTS or CHANGES
+        :type kind: str
+        :param key: The project name or the full id of the change
+        :type key: str
+        :return: The instance, None if it isn't known
+        :rtype: gerrit.projects.Project or gerrit.changes.Change
+        """
+        with self._lock:
+            entry = self._entries.get((kind, key))
+        if entry is None:
+            return None
+        return entry[0]()
+
+    def get_fresh(self, kind, key):
+        """
+        Get the canonical instance if it was fetched within the ttl
+        :param kind: PROJECTS or CHANGES
+        :type kind: str
+        :param key: The project name or the full id of the change
+        :type key: str
+        :return: The instance, None if it isn't known or is stale
+        :rtype: gerrit.projects.Project or gerrit.changes.Change
+        """
+        if self.ttl is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get((kind, key))
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            return None
+        return entry[0]()
+
+    def intern(self, instance):
+        """
+        Make an instance that was just fetched canonical, if there already
+        is a canonical instance it is updated in place and returned instead
+        :param instance: The project or change
+        :type instance: gerrit.projects.Project or gerrit.changes.Change
+        :return: The canonical instance
+        :rtype: gerrit.projects.Project or gerrit.changes.Change
+        """
+        kind, key = identity_key(instance)
+        if key is None:
+            return instance
+
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            canonical = entry[0]() if entry is not None else None
+
+            if canonical is None:
+                canonical = instance
+                ref = weakref.ref(instance, lambda ref: self._forget((kind, key), ref))
+            else:
+                ref = entry[0]
+                if canonical is not instance:
+                    for name in _slots(type(instance)):
+                        if hasattr(instance, name):
+                            setattr(canonical, name, getattr(instance, name))
+
+            self._entries[(kind, key)] = (ref, time.monotonic())
+
+        return canonical
+
+    def discard(self, kind, key):
+        """
+        Forget an instance, e.g. after it was deleted
+        :param kind: PROJECTS or CHANGES
+        :type kind: str
+        :param key: The project name or the full id of the change
+        :type key: str
+        """
+        with self._lock:
+            self._entries.pop((kind, key), None)
+
+    def clear(self):
+        """
+        Forget all instances
+        """
+        with self._lock:
+            self._entries.clear()
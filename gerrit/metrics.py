@@ -0,0 +1,186 @@
+"""
+Metrics
+=======
+
+Collect call counts and latency histograms per gerrit endpoint
+"""
+
+import threading
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label(value):
+    """
+    Escape a Prometheus label value
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _EndpointStats(object):
+    """Counters for one request type and endpoint"""
+
+    __slots__ = ('count', 'errors', 'bytes', 'sum', 'buckets', 'statuses')
+
+    def __init__(self, buckets):
+        self.count = 0
+        self.errors = 0
+        self.bytes = 0
+        self.sum = 0.0
+        self.buckets = [0] * len(buckets)
+        self.statuses = {}
+
+
+class CallMetrics(object):
+    """
+    Per endpoint call counts and latency histograms, fed by the call
+    hooks of one or more Gerrit connections
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        :param buckets: Upper bounds in seconds of the latency buckets
+        :type buckets: tuple
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def install(self, gerrit_con):
+        """
+        Start collecting metrics for the calls of a connection
+        :param gerrit_con: The connection object to gerrit
+        :type gerrit_con: gerrit.Gerrit
+        :rtype: CallMetrics
+        """
+        gerrit_con.add_call_hook(post=self.observe)
+        return self
+
+    def uninstall(self, gerrit_con):
+        """
+        Stop collecting metrics for the calls of a connection
+        :param gerrit_con: The connection object to gerrit
+        :type gerrit_con: gerrit.Gerrit
+        """
+        gerrit_con.remove_call_hook(post=self.observe)
+
+    def observe(self, request, endpoint, status, size, elapsed):
+        """
+        Record a call, this is the post call hook
+        :param request: The type of http request, e.g. 'get'
+        :type request: str
+        :param endpoint: The endpoint template
+        :type endpoint: str
+        :param status: HTTP status code, None if the call raised
+        :type status: int
+        :param size: Bytes in the response body, if known
+        :type size: int
+        :param elapsed: Seconds the call took
+        :type elapsed: float
+        """
+        with self._lock:
+            stats = self._stats.get((request, endpoint))
+            if stats is None:
+                stats = _EndpointStats(self.buckets)
+                self._stats[(request, endpoint)] = stats
+
+            stats.count += 1
+            stats.sum += elapsed
+            if size:
+                stats.bytes += size
+            if status is None or status >= 400:
+                stats.errors += 1
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            for index, bound in enumerate(self.buckets):
+                if elapsed <= bound:
+                    stats.buckets[index] += 1
+                    break
+
+    def reset(self):
+        """
+        Forget all recorded calls
+        """
+        with self._lock:
+            self._stats.clear()
+
+    def _snapshot(self):
+        with self._lock:
+            snapshot = []
+            for key, stats in sorted(self._stats.items()):
+                copy = _EndpointStats(self.buckets)
+                copy.count = stats.count
+                copy.errors = stats.errors
+                copy.bytes = stats.bytes
+                copy.sum = stats.sum
+                copy.buckets = list(stats.buckets)
+                copy.statuses = dict(stats.statuses)
+                snapshot.append((key, copy))
+            return snapshot
+
+    def _cumulative(self, stats):
+        seen = 0
+        for bound, bucket in zip(self.buckets, stats.buckets):
+            seen += bucket
+            yield bound, seen
+        yield float('inf'), stats.count
+
+    def as_dict(self):
+        """
+        Export the metrics
+        :returns: Keyed on 'REQUEST endpoint', with count, errors, bytes,
+            sum of latencies, cumulative latency buckets and status counts
+        :rtype: dict
+        """
+        result = {}
+        for key, stats in self._snapshot():
+            result['%s %s' % (key[0].upper(), key[1])] = {
+                'count': stats.count,
+                'errors': stats.errors,
+                'bytes': stats.bytes,
+                'sum': stats.sum,
+                'buckets': dict(self._cumulative(stats)),
+                'statuses': stats.statuses,
+            }
+        return result
+
+    def prometheus(self, prefix='gerrit_client'):
+        """
+        Export the metrics in the Prometheus text format
+        :param prefix: Prefix of the metric names
+        :type prefix: str
+        :rtype: str
+        """
+        duration = []
+        requests = []
+        size = []
+
+        for key, stats in self._snapshot():
+            labels = 'method="%s",endpoint="%s"' % (_label(key[0].upper()), _label(key[1]))
+
+            for bound, seen in self._cumulative(stats):
+                duration.append('%s_request_duration_seconds_bucket{%s,le="%s"} %d' % (
+                    prefix, labels, '+Inf' if bound == float('inf') else repr(bound), seen))
+            duration.append('%s_request_duration_seconds_sum{%s} %r' % (
+                prefix, labels, stats.sum))
+            duration.append('%s_request_duration_seconds_count{%s} %d' % (
+                prefix, labels, stats.count))
+
+            for status, calls in sorted(stats.statuses.items(), key=lambda item: str(item[0])):
+                requests.append('%s_requests_total{%s,status="%s"} %d' % (
+                    prefix, labels, 'error' if status is None else status, calls))
+
+            size.append('%s_response_bytes_total{%s} %d' % (prefix, labels, stats.bytes))
+
+        lines = [
+            '# HELP %s_request_duration_seconds Latency of calls to gerrit' % prefix,
+            '# TYPE %s_request_duration_seconds histogram' % prefix,
+        ] + duration + [
+            '# HELP %s_requests_total Calls to gerrit by response status' % prefix,
+            '# TYPE %s_requests_total counter' % prefix,
+        ] + requests + [
+            '# HELP %s_response_bytes_total Bytes received from gerrit' % prefix,
+            '# TYPE %s_response_bytes_total counter' % prefix,
+        ] + size
+
+        return '\n'.join(lines) + '\n'
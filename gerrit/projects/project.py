@@ -5,7 +5,7 @@ Project
 Manage gerrit projects
 """
 
-from gerrit.helper import decode_json
+from gerrit.helper import decode_json, intern_str
 from gerrit.error import (
     UnhandledError,
     AlreadyExists,
@@ -15,6 +15,17 @@ from gerrit.error import (
 class Project(object):
     """Manage gerrit reviews"""
 
+    __slots__ = (
+        '_gerrit_con',
+        'name',
+        'parent',
+        'description',
+        'state',
+        'branches',
+        'web_links',
+        '__weakref__',
+    )
+
     def __init__(self, gerrit_con):
         """
         :param gerrit_con: The connection object to gerrit
@@ -51,30 +62,50 @@ class Project(object):
 
         req = self._gerrit_con.call(r_endpoint=r_endpoint)
 
+        return self._get_project_result(req)
+
+    def _get_project_result(self, req):
+        """
+        Handle the response of a get_project request
+        :rtype: Project
+        :exception: ValueError, UnhandledError
+        """
         status_code = req.status_code
-        result = req.content.decode('utf-8')
 
         if status_code == 200:
-            project_info = decode_json(result)
-            self.name = project_info.get('name')
-            self.parent = project_info.get('parent')
-            self.description = project_info.get('description')
-            self.state = project_info.get('state')
-            self.branches = project_info.get('branches')
-            self.web_links = project_info.get('web_links')
-            return self
-        elif status_code == 404:
+            return self._populate(decode_json(req.content))
+
+        result = req.content.decode('utf-8')
+        if status_code == 404:
             raise ValueError(result)
         else:
             raise UnhandledError(result)
 
-    def create_project(self, name, options):
+    def _populate(self, project_info):
+        """
+        Set the attributes of the project from a ProjectInfo
+        :param project_info: The ProjectInfo returned by gerrit
+        :type project_info: dict
+        :rtype: Project
+        """
+        self.name = project_info.get('name')
+        self.parent = intern_str(project_info.get('parent'))
+        self.description = project_info.get('description')
+        self.state = intern_str(project_info.get('state'))
+        self.branches = project_info.get('branches')
+        self.web_links = project_info.get('web_links')
+        return self
+
+    def create_project(self, name, options, refresh=False):
         """
         Create a project
         :param name: Name of the project
         :type name: str
         :param options: Additional options
         :type options: dict, None
+        :param refresh: Fetch the project after creating it instead of
+            using the ProjectInfo gerrit returns when creating it
+        :type refresh: bool
 
         :return: Project if successful
         :rtype: gerrit.projects.Project
@@ -92,15 +123,30 @@ class Project(object):
             r_payload=options,
         )
 
-        result = req.content.decode('utf-8')
+        project_info = self._create_project_result(req)
 
-        if req.status_code == 201:
+        if refresh:
             return self.get_project(name)
-        elif req.status_code == 409:
+
+        return self._populate(project_info)
+
+    @staticmethod
+    def _create_project_result(req):
+        """
+        Handle the response of a create_project request
+        :returns: The ProjectInfo of the new project
+        :rtype: dict
+        :exception: AlreadyExists, UnhandledError
+        """
+        result = req.content.decode('utf-8')
+
+        if req.status_code == 409:
             raise AlreadyExists(result)
-        else:
+        elif req.status_code != 201:
             raise UnhandledError(result)
 
+        return decode_json(result)
+
 
     def delete(self, options=None):
         """
@@ -117,6 +163,15 @@ class Project(object):
                                     r_payload=options,
                                    )
 
+        return self._delete_result(req)
+
+    @staticmethod
+    def _delete_result(req):
+        """
+        Handle the response of a delete request
+        :rtype: Bool
+        :exception: UnhandledError
+        """
         status_code = req.status_code
 
         if status_code == 204:
@@ -0,0 +1,157 @@
+"""
+Retry
+=====
+
+Retry and throttle requests to gerrit
+"""
+
+import email.utils
+import random
+import threading
+import time
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header
+    :param value: Delay in seconds or an HTTP date
+    :type value: str
+    :returns: Seconds to wait, or None if the value can't be parsed
+    :rtype: float
+    """
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date is None:
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class Retry(object):
+    """When and how long to wait before retrying a request"""
+
+    def __init__(self, total=3, *, backoff_factor=0.5, backoff_max=30.0,  # pylint: disable=too-many-arguments
+                 status_forcelist=(429, 502, 503, 504),
+                 methods=('get',), unsent_methods=('put', 'delete'),
+                 retry_after_max=300.0):
+        """
+        :param total: Number of retries, 0 disables retrying
+        :type total: int
+        :param backoff_factor: Base of the exponential backoff in seconds
+        :type backoff_factor: float
+        :param backoff_max: Longest backoff between two attempts
+        :type backoff_max: float
+        :param status_forcelist: HTTP status codes that are retried
+        :type status_forcelist: tuple
+        :param methods: Request types that may be retried after any
+            failure, e.g. a read timeout or a 503
+        :type methods: tuple
+        :param unsent_methods: Request types that are only retried when
+            gerrit provably didn't process them, i.e. the connection
+            couldn't be made or the request got a 429. Retrying a PUT or
+            DELETE that was processed fails with a 409 or a 404.
+        :type unsent_methods: tuple
+        :param retry_after_max: Longest Retry-After that is honored
+        :type retry_after_max: float
+        """
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.status_forcelist = status_forcelist
+        self.methods = methods
+        self.unsent_methods = unsent_methods
+        self.retry_after_max = retry_after_max
+
+    def can_retry(self, request, attempt, sent=True):
+        """
+        :param request: The type of http request, e.g. 'get'
+        :type request: str
+        :param attempt: Number of retries done so far
+        :type attempt: int
+        :param sent: False if gerrit provably didn't process the request
+        :type sent: bool
+        :rtype: bool
+        """
+        if attempt >= self.total:
+            return False
+        return request in self.methods or (not sent and request in self.unsent_methods)
+
+    def backoff(self, attempt):
+        """
+        Exponential backoff with full jitter
+        :param attempt: Number of retries done so far
+        :type attempt: int
+        :returns: Seconds to wait
+        :rtype: float
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * 2 ** attempt))
+
+    def wait_time(self, attempt, response):
+        """
+        Time to wait before retrying after a response, the Retry-After
+        header is honored when gerrit sends one
+        :param attempt: Number of retries done so far
+        :type attempt: int
+        :param response: The response that is retried
+        :type response: requests.Response
+        :returns: Seconds to wait
+        :rtype: float
+        """
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is not None:
+            return min(retry_after, self.retry_after_max)
+        return self.backoff(attempt)
+
+
+class TokenBucket(object):
+    """
+    Client side rate limiter. It can be shared between threads and
+    between Gerrit connections to the same server.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        :param rate: Requests per second
+        :type rate: float
+        :param capacity: Size of bursts that are let through, defaults
+            to one second worth of requests
+        :type capacity: float
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """
+        Take tokens from the bucket, blocking until they are available.
+        Callers that have to wait reserve their tokens up front so they
+        are served in order.
+        :param tokens: Number of tokens to take
+        :type tokens: float
+        :returns: Seconds spent waiting
+        :rtype: float
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity,
+                self._tokens + (now - self._updated) * self.rate,
+            )
+            self._updated = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
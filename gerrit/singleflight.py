@@ -0,0 +1,85 @@
+"""
+SingleFlight
+============
+
+Coalesce concurrent identical calls into one
+"""
+
+import threading
+
+
+class _Call(object):
+    """A call in flight and its outcome"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Run a call once for all threads asking for the same key at the same
+    time, the threads arriving while it is in flight wait for its result
+    """
+
+    def __init__(self):
+        self.sent = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """
+        How many calls were made and how many were served by a call that
+        was already in flight
+        :rtype: dict
+        """
+        with self._lock:
+            return {'sent': self.sent, 'coalesced': self.coalesced}
+
+    def in_flight(self):
+        """
+        Number of calls currently in flight
+        :rtype: int
+        """
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Call func, unless a call with the same key is already in flight
+        :param key: What identifies identical calls
+        :type key: hashable
+        :param func: The call to make
+        :type func: callable
+        :return: The result of the call, shared by all callers
+        :exception: Whatever the call raised, raised in all callers
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.sent += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
@@ -0,0 +1,200 @@
+"""
+Sync
+====
+
+Incrementally mirror gerrit changes, keeping the state on disk
+"""
+
+import collections
+import datetime
+import sqlite3
+
+# Seconds to query back from the last seen update, covers changes updated
+# within the same second and clock skew between gerrit replicas
+DEFAULT_OVERLAP = 60
+
+ADDED = 'added'
+MODIFIED = 'modified'
+CLOSED = 'closed'
+
+CLOSED_STATUSES = ('MERGED', 'ABANDONED')
+
+# The format of timestamps in gerrit responses and queries, always UTC
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+Delta = collections.namedtuple('Delta', ('kind', 'change'))
+Delta.__doc__ = """
+A change that was added, modified or closed since the last sync
+"""
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS checkpoint ('
+    ' scope TEXT PRIMARY KEY,'
+    ' updated TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS changes ('
+    ' scope TEXT NOT NULL,'
+    ' full_id TEXT NOT NULL,'
+    ' updated TEXT NOT NULL,'
+    ' status TEXT,'
+    ' PRIMARY KEY (scope, full_id))',
+)
+
+
+class ChangeSync(object):
+    """
+    Fetch only the changes updated since the previous sync and report
+    what was added, modified or closed
+    """
+
+    def __init__(self, gerrit_con, path, *, scope='',  # pylint: disable=too-many-arguments
+                 initial_query='status:open', overlap=DEFAULT_OVERLAP,
+                 page_size=100, options=None):
+        """
+        :param gerrit_con: The connection object to gerrit
+        :type gerrit_con: gerrit.Gerrit
+        :param path: The sqlite database to keep the state in
+        :type path: str
+        :param scope: Search terms limiting what is synced, e.g.
+            'project:tools', also names the state in the database
+        :type scope: str
+        :param initial_query: What to fetch on the first sync
+        :type initial_query: str
+        :param overlap: Seconds to query back from the checkpoint
+        :type overlap: int
+        :param page_size: Number of changes to fetch per request
+        :type page_size: int
+        :param options: Additional fields to include, e.g. ['LABELS']
+        :type options: list
+        """
+        self._gerrit_con = gerrit_con
+        self.scope = scope
+        self.initial_query = initial_query
+        self.overlap = overlap
+        self.page_size = page_size
+        self.options = options
+
+        self._db = sqlite3.connect(path)
+        with self._db:
+            for statement in _SCHEMA:
+                self._db.execute(statement)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Close the state database
+        """
+        self._db.close()
+
+    @property
+    def checkpoint(self):
+        """
+        The most recent update seen, None before the first sync
+        :rtype: str
+        """
+        row = self._db.execute(
+            'SELECT updated FROM checkpoint WHERE scope = ?', (self.scope,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def reset(self):
+        """
+        Forget the checkpoint and the known changes, the next sync
+        starts over with the initial query
+        """
+        with self._db:
+            self._db.execute('DELETE FROM checkpoint WHERE scope = ?', (self.scope,))
+            self._db.execute('DELETE FROM changes WHERE scope = ?', (self.scope,))
+
+    def _since(self, checkpoint):
+        """
+        The timestamp to query from, the checkpoint minus the overlap
+        :rtype: str
+        """
+        updated = datetime.datetime.strptime(checkpoint[:19], TIMESTAMP_FORMAT)
+        return (updated - datetime.timedelta(seconds=self.overlap)).strftime(TIMESTAMP_FORMAT)
+
+    def _query(self, checkpoint):
+        """
+        Build the query of the next sync
+        :rtype: str
+        """
+        if checkpoint is None:
+            terms = [self.scope, self.initial_query]
+        else:
+            terms = [self.scope, 'since:"%s"' % self._since(checkpoint)]
+        return ' '.join(term for term in terms if term)
+
+    def _delta(self, change):
+        """
+        Classify a fetched change against the known state, None if it was
+        already seen by a previous sync
+        :rtype: str
+        """
+        row = self._db.execute(
+            'SELECT updated, status FROM changes WHERE scope = ? AND full_id = ?',
+            (self.scope, change.full_id),
+        ).fetchone()
+
+        if row is not None and row[0] == change.updated and row[1] == change.status:
+            return None
+
+        if change.status in CLOSED_STATUSES:
+            if row is not None and row[1] in CLOSED_STATUSES:
+                return MODIFIED
+            return CLOSED
+
+        return ADDED if row is None else MODIFIED
+
+    def sync(self):
+        """
+        Fetch the changes updated since the last sync. The checkpoint is
+        only saved once all deltas were consumed, a sync that is stopped
+        early is repeated in full by the next one.
+        :return: The added, modified and closed changes
+        :rtype: generator of Delta
+        :exception: ValueError, UnhandledError
+        """
+        checkpoint = self.checkpoint
+        newest = checkpoint
+        query = self._query(checkpoint)
+
+        try:
+            for change in self._gerrit_con.iter_changes(query, self.page_size, self.options):
+                if change.full_id is None or change.updated is None:
+                    continue
+
+                kind = self._delta(change)
+                if kind is None:
+                    continue
+
+                self._db.execute(
+                    'INSERT OR REPLACE INTO changes (scope, full_id, updated, status) '
+                    'VALUES (?, ?, ?, ?)',
+                    (self.scope, change.full_id, change.updated, change.status),
+                )
+                if newest is None or change.updated > newest:
+                    newest = change.updated
+
+                yield Delta(kind, change)
+
+            if newest is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO checkpoint (scope, updated) VALUES (?, ?)',
+                    (self.scope, newest),
+                )
+                # Closed changes are only kept for as long as the overlap
+                # can return them again
+                self._db.execute(
+                    'DELETE FROM changes WHERE scope = ? AND updated < ? AND status IN (?, ?)',
+                    (self.scope, self._since(newest)) + CLOSED_STATUSES,
+                )
+        except BaseException:
+            self._db.rollback()
+            raise
+        else:
+            self._db.commit()
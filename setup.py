@@ -28,7 +28,12 @@ setup(
     include_package_data=True,
     url='https://github.com/propyless/python-gerrit',
     description='python-gerrit is a module that interfaces with Gerrits REST API.',
+    python_requires='>=3.7',
     install_requires=[
         "requests"
     ],
+    extras_require={
+        "async": ["aiohttp"],
+        "fast": ["orjson"],
+    },
 )
@@ -0,0 +1,112 @@
+"""
+Unit tests for gerrit.auth
+"""
+import threading
+import mock
+import requests
+from requests.utils import parse_dict_header
+from gerrit.auth import SharedDigestAuth
+from tests import GerritUnitTest
+
+CHALLENGE = 'Digest realm="Gerrit Code Review", qop="auth", nonce="%s"'
+
+
+class SharedDigestAuthTestCase(GerritUnitTest):
+    """
+    Unit tests for digest authentication shared between calls and threads
+    """
+    def setUp(self):
+        self.auth = SharedDigestAuth(self.USERNAME, self.PASSWORD)
+
+    def prepare(self, path='/a/changes/'):
+        """
+        Prepare a request signed by the auth
+        """
+        return self.auth(requests.Request('GET', self.URL + path).prepare())
+
+    def challenge(self, request, nonce, stale=False):
+        """
+        Answer a request with a 401 challenge
+        """
+        header = CHALLENGE % nonce
+        if stale:
+            header += ', stale=true'
+        response = mock.Mock(
+            status_code=401,
+            headers={'www-authenticate': header},
+            request=request,
+            raw=None,
+        )
+        response.connection.send.return_value = mock.Mock(status_code=200, history=[])
+        return response
+
+    @staticmethod
+    def digest(request):
+        """
+        Parse the Authorization header of a request
+        """
+        header = request.headers.get('Authorization')
+        if header is None:
+            return None
+        return parse_dict_header(header[len('Digest '):])
+
+    def test_challenge_once(self):
+        """
+        Test that only the first call is challenged
+        """
+        request = self.prepare()
+        self.assertIsNone(self.digest(request))
+
+        response = self.challenge(request, 'nonce1')
+        self.auth.handle_401(response)
+        retried = response.connection.send.call_args[0][0]
+        self.assertEqual(self.digest(retried)['nonce'], 'nonce1')
+        self.assertEqual(self.digest(retried)['nc'], '00000001')
+        self.assertEqual(self.auth.nonce, 'nonce1')
+
+        digest = self.digest(self.prepare('/a/projects/'))
+        self.assertEqual(digest['nonce'], 'nonce1')
+        self.assertEqual(digest['nc'], '00000002')
+        self.assertEqual(digest['uri'], '/a/projects/')
+
+    def test_shared_between_threads(self):
+        """
+        Test that all threads continue the same nonce count
+        """
+        request = self.prepare()
+        self.auth.handle_401(self.challenge(request, 'nonce1'))
+
+        counts = []
+        threads = [threading.Thread(target=lambda: counts.append(self.digest(self.prepare())['nc']))
+                   for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(counts), ['%08x' % count for count in range(2, 12)])
+
+    def test_stale(self):
+        """
+        Test that a stale nonce is replaced and the count restarted
+        """
+        self.auth.handle_401(self.challenge(self.prepare(), 'nonce1'))
+        request = self.prepare()
+
+        response = self.challenge(request, 'nonce2', stale=True)
+        self.auth.handle_401(response)
+        retried = response.connection.send.call_args[0][0]
+        self.assertEqual(self.digest(retried)['nonce'], 'nonce2')
+        self.assertEqual(self.digest(retried)['nc'], '00000001')
+        self.assertEqual(self.auth.nonce, 'nonce2')
+
+    def test_refused(self):
+        """
+        Test that refused credentials are not retried
+        """
+        self.auth.handle_401(self.challenge(self.prepare(), 'nonce1'))
+        response = self.challenge(self.prepare(), 'nonce2')
+
+        self.assertIs(self.auth.handle_401(response), response)
+        response.connection.send.assert_not_called()
+        self.assertEqual(self.auth.nonce, 'nonce1')
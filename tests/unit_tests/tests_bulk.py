@@ -0,0 +1,115 @@
+"""
+Unit tests for gerrit.bulk
+"""
+import threading
+import time
+import mock
+from gerrit.bulk import (
+    BulkResult,
+    review_args,
+    run_bulk,
+)
+from tests import GerritUnitTest
+
+
+class RunBulkTestCase(GerritUnitTest):
+    """
+    Unit tests for running calls over a worker pool
+    """
+    def test_results(self):
+        """
+        Test that every item gets a result with its value
+        """
+        results = list(run_bulk(lambda item: item * 2, range(10), max_workers=3))
+        self.assertEqual(
+            sorted(results),
+            [BulkResult(item, item * 2, None) for item in range(10)],
+        )
+
+    def test_errors_are_captured(self):
+        """
+        Test that an exception is captured in the result of its item
+        """
+        def func(item):
+            if item == 2:
+                raise LookupError(item)
+            return item
+
+        results = {result.item: result for result in run_bulk(func, range(4))}
+        self.assertIsInstance(results[2].error, LookupError)
+        self.assertIsNone(results[2].value)
+        self.assertEqual(results[3], BulkResult(3, 3, None))
+
+    def test_concurrency_is_bounded(self):
+        """
+        Test that no more than max_workers calls run at once
+        """
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def func(item):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return item
+
+        list(run_bulk(func, range(20), max_workers=4))
+        self.assertLessEqual(running[1], 4)
+        self.assertGreater(running[1], 1)
+
+    def test_items_consumed_lazily(self):
+        """
+        Test that items are only taken from the iterable as workers free up
+        """
+        consumed = []
+
+        def items():
+            for item in range(1000):
+                consumed.append(item)
+                yield item
+
+        results = run_bulk(lambda item: item, items(), max_workers=2)
+        next(results)
+        results.close()
+        self.assertLess(len(consumed), 10)
+
+    def test_invalid_workers(self):
+        """
+        Test that it raises if there are no workers
+        """
+        with self.assertRaises(ValueError):
+            list(run_bulk(lambda item: item, range(3), max_workers=0))
+
+
+class ReviewArgsTestCase(GerritUnitTest):
+    """
+    Unit tests for unpacking the reviews of a bulk set_reviews
+    """
+    def test_defaults(self):
+        """
+        Test that everything after the change is optional
+        """
+        self.assertEqual(
+            review_args((self.CHANGE_ID,)),
+            (self.CHANGE_ID, 'current', None, '', None),
+        )
+
+    def test_change_object(self):
+        """
+        Test that the Change-Id is taken from a change object
+        """
+        change = mock.Mock(change_id=self.CHANGE_ID)
+        self.assertEqual(
+            review_args((change, self.REVISION_ID, {'Verified': 1}, 'Build ok', {})),
+            (self.CHANGE_ID, self.REVISION_ID, {'Verified': 1}, 'Build ok', {}),
+        )
+
+    def test_too_long(self):
+        """
+        Test that it raises on reviews with unknown parts
+        """
+        with self.assertRaises(ValueError):
+            review_args((self.CHANGE_ID, None, None, None, None, None))
@@ -0,0 +1,473 @@
+"""
+Unit tests for gerrit.cache
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import mock
+import requests
+from gerrit.cache import (
+    CacheEntry,
+    ContentCache,
+    MemoryCache,
+    SqliteCache,
+    endpoint_family,
+    resource_tag,
+)
+from gerrit.gerrit import Gerrit
+from tests import GerritUnitTest
+
+
+class EndpointTestCase(GerritUnitTest):
+    """
+    Unit tests for classifying endpoints
+    """
+    def test_family(self):
+        """
+        Test that endpoints are sorted into families
+        """
+        self.assertEqual(endpoint_family('/a/projects/{}/'.format(self.PROJECT)), 'projects')
+        self.assertEqual(endpoint_family('/a/changes/{}/'.format(self.FULL_ID)), 'changes')
+        self.assertEqual(endpoint_family('/a/changes/?q=status:open'), 'changes')
+        self.assertEqual(
+            endpoint_family('/a/changes/{}/reviewers/'.format(self.CHANGE_ID)),
+            'reviewers',
+        )
+        self.assertIsNone(endpoint_family('/a/accounts/self'))
+
+    def test_change_tag(self):
+        """
+        Test that all ids of a change share a tag
+        """
+        tag = 'changes/{}'.format(self.CHANGE_ID)
+        self.assertEqual(resource_tag('/a/changes/{}/'.format(self.FULL_ID_QUOTED)), tag)
+        self.assertEqual(
+            resource_tag('/a/changes/{}/reviewers/{}'.format(self.CHANGE_ID, self.USER)),
+            tag,
+        )
+        self.assertEqual(resource_tag('/a/changes/?q=status:open'), 'changes')
+
+    def test_project_tag(self):
+        """
+        Test that project names with slashes are kept together
+        """
+        self.assertEqual(resource_tag('/a/projects/platform/foo/'), 'projects/platform/foo')
+        self.assertEqual(
+            resource_tag('/a/projects/platform%2Ffoo/branches/'),
+            'projects/platform/foo',
+        )
+
+
+class CacheEntryTestCase(GerritUnitTest):
+    """
+    Unit tests for cached responses
+    """
+    def test_response_accessors(self):
+        """
+        Test that a cached response can be used like a requests response
+        """
+        entry = CacheEntry(200, b'{"name": "M\xc3\xa4rz"}', '"1"', 0, ())
+        self.assertTrue(entry.ok)
+        self.assertEqual(entry.text, '{"name": "M\u00e4rz"}')
+        self.assertEqual(entry.json(), {'name': 'M\u00e4rz'})
+        self.assertEqual(entry.headers, {'ETag': '"1"'})
+        entry.raise_for_status()
+        entry.close()
+
+        entry = CacheEntry(404, b'Not found', None, 0, ())
+        self.assertFalse(entry.ok)
+        with self.assertRaises(requests.HTTPError):
+            entry.raise_for_status()
+
+
+class MemoryCacheTestCase(GerritUnitTest):
+    """
+    Unit tests for the in memory cache
+    """
+    @staticmethod
+    def entry(content=b'{}', etag=None, expires=None, tags=('changes',)):
+        """
+        Build a cache entry
+        """
+        if expires is None:
+            expires = time.time() + 60
+        return CacheEntry(200, content, etag, expires, tags)
+
+    def test_get_set(self):
+        """
+        Test that an entry can be stored and fetched
+        """
+        cache = MemoryCache()
+        entry = self.entry()
+        cache.set('a', entry)
+        self.assertIs(cache.get('a'), entry)
+        self.assertIsNone(cache.get('b'))
+
+    def test_lru_entries(self):
+        """
+        Test that the least recently used entry is evicted first
+        """
+        cache = MemoryCache(max_entries=2)
+        cache.set('a', self.entry())
+        cache.set('b', self.entry())
+        cache.get('a')
+        cache.set('c', self.entry())
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+
+    def test_max_bytes(self):
+        """
+        Test that entries are evicted to stay under the size limit
+        """
+        cache = MemoryCache(max_bytes=10)
+        cache.set('a', self.entry(b'x' * 6))
+        cache.set('b', self.entry(b'x' * 6))
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.size, 6)
+        cache.set('c', self.entry(b'x' * 11))
+        self.assertIsNone(cache.get('c'))
+
+    def test_expired_without_etag(self):
+        """
+        Test that stale entries that can't be revalidated are dropped
+        """
+        cache = MemoryCache()
+        cache.set('a', self.entry(expires=0))
+        cache.set('b', self.entry(etag='"1"', expires=0))
+        self.assertIsNone(cache.get('a'))
+        self.assertFalse(cache.get('b').is_fresh())
+
+    def test_invalidate(self):
+        """
+        Test that entries are dropped by tag
+        """
+        cache = MemoryCache()
+        cache.set('a', self.entry(tags=('changes/1',)))
+        cache.set('b', self.entry(tags=('changes/2',)))
+        cache.invalidate('changes/1')
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('b'))
+        self.assertEqual(cache.size, 2)
+
+
+class SqliteCacheTestCase(GerritUnitTest):
+    """
+    Unit tests for the sqlite cache
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def cache(self, **kwargs):
+        """
+        Open the cache database
+        """
+        cache = SqliteCache(self.path, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    @staticmethod
+    def entry(content=b'{}', etag=None, expires=None, tags=('changes',)):
+        """
+        Build a cache entry
+        """
+        if expires is None:
+            expires = time.time() + 60
+        return CacheEntry(200, content, etag, expires, tags)
+
+    def test_get_set(self):
+        """
+        Test that an entry can be stored and fetched
+        """
+        cache = self.cache()
+        cache.set('a', self.entry(b'{"a": 1}', '"1"'))
+        entry = cache.get('a')
+        self.assertEqual(entry.content, b'{"a": 1}')
+        self.assertEqual(entry.etag, '"1"')
+        self.assertEqual(entry.tags, ('changes',))
+        self.assertTrue(entry.is_fresh())
+        self.assertIsNone(cache.get('b'))
+
+    def test_shared_between_connections(self):
+        """
+        Test that entries are seen by other connections to the database
+        """
+        self.cache().set('a', self.entry())
+        other = self.cache()
+        self.assertIsNotNone(other.get('a'))
+        other.invalidate('changes')
+        self.assertIsNone(self.cache().get('a'))
+
+    def test_threads(self):
+        """
+        Test that the cache can be used from many threads
+        """
+        cache = self.cache()
+
+        def worker(number):
+            for index in range(20):
+                cache.set('%d-%d' % (number, index), self.entry())
+                cache.get('%d-%d' % (number, index))
+
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(cache), 80)
+
+    def test_lru_entries(self):
+        """
+        Test that the least recently used entry is evicted first
+        """
+        cache = self.cache(max_entries=2)
+        with mock.patch('gerrit.cache.time.time', return_value=1000.0) as mock_time:
+            cache.set('a', self.entry(expires=2000))
+            mock_time.return_value = 1010.0
+            cache.set('b', self.entry(expires=2000))
+            mock_time.return_value = 1020.0
+            cache.get('a')
+            cache.set('c', self.entry(expires=2000))
+            self.assertIsNotNone(cache.get('a'))
+            self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+
+    def test_max_bytes(self):
+        """
+        Test that entries are evicted to stay under the size limit
+        """
+        cache = self.cache(max_bytes=10)
+        cache.set('a', self.entry(b'x' * 6))
+        cache.set('b', self.entry(b'x' * 6))
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.size, 6)
+        cache.set('c', self.entry(b'x' * 11))
+        self.assertIsNone(cache.get('c'))
+
+    def test_expired_without_etag(self):
+        """
+        Test that stale entries that can't be revalidated are dropped
+        """
+        cache = self.cache()
+        cache.set('a', self.entry(expires=0))
+        cache.set('b', self.entry(etag='"1"', expires=0))
+        self.assertIsNone(cache.get('a'))
+        self.assertFalse(cache.get('b').is_fresh())
+        cache.touch('b', time.time() + 60)
+        self.assertTrue(cache.get('b').is_fresh())
+
+    def test_invalidate(self):
+        """
+        Test that entries are dropped by tag
+        """
+        cache = self.cache()
+        cache.set('a', self.entry(tags=('changes/1', 'changes')))
+        cache.set('b', self.entry(tags=('changes/2',)))
+        cache.invalidate('changes/1')
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('b'))
+        self.assertEqual(cache.size, 2)
+        self.assertEqual(len(cache), 1)
+
+    def test_purge_and_clear(self):
+        """
+        Test that expired entries can be purged and everything cleared
+        """
+        cache = self.cache()
+        cache.set('a', self.entry(expires=0))
+        cache.set('b', self.entry())
+        cache.purge()
+        self.assertEqual(len(cache), 1)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.size, 0)
+
+
+class GerritCacheTestCase(GerritUnitTest):
+    """
+    Unit tests for caching the responses of a Gerrit connection
+    """
+    def setUp(self):
+        self.cache = MemoryCache()
+        self.reference = Gerrit(
+            url=self.URL,
+            auth_id=self.USERNAME,
+            auth_pw=self.PASSWORD,
+            cache=self.cache,
+        )
+        self.response = mock.Mock(
+            status_code=200,
+            content=self.build_response({'name': self.PROJECT}),
+            headers={'ETag': '"1"'},
+        )
+        self.mock_get = mock.patch.object(self.reference, '_send').start()
+        self.mock_get.return_value = self.response
+        self.addCleanup(mock.patch.stopall)
+
+    def test_fresh(self):
+        """
+        Test that a fresh response is served without a request
+        """
+        first = self.reference.call(r_endpoint='/a/projects/foo/')
+        second = self.reference.call(r_endpoint='/a/projects/foo/')
+        self.assertEqual(self.mock_get.call_count, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second.status_code, 200)
+
+    def test_revalidate(self):
+        """
+        Test that a stale response is revalidated with its ETag
+        """
+        self.reference.call(r_endpoint='/a/projects/foo/')
+        self.cache.get('{} {}/a/projects/foo/'.format(self.USERNAME, self.URL)).expires = 0
+        self.mock_get.return_value = mock.Mock(status_code=304, content=b'')
+        req = self.reference.call(r_endpoint='/a/projects/foo/')
+        self.assertEqual(req.content, self.response.content)
+        self.assertEqual(
+            self.mock_get.call_args[0][3]['If-None-Match'],
+            '"1"',
+        )
+        self.assertTrue(
+            self.cache.get('{} {}/a/projects/foo/'.format(self.USERNAME, self.URL)).is_fresh()
+        )
+
+    def test_write_invalidates(self):
+        """
+        Test that writing a resource invalidates its cached reads
+        """
+        self.reference.call(r_endpoint='/a/changes/{}/reviewers/'.format(self.CHANGE_ID))
+        self.reference.call(r_endpoint='/a/changes/?q=status%3Aopen')
+        self.reference.call(r_endpoint='/a/projects/foo/')
+        self.reference.call(
+            request='post',
+            r_endpoint={
+                'pre': '/a/changes/',
+                'data': self.FULL_ID,
+                'post': '/submit/',
+            },
+        )
+        self.assertEqual(len(self.cache), 1)
+        self.reference.call(r_endpoint='/a/changes/{}/reviewers/'.format(self.CHANGE_ID))
+        self.assertEqual(self.mock_get.call_count, 5)
+
+    def test_keyed_on_user(self):
+        """
+        Test that a shared cache doesn't mix up the responses of users
+        """
+        other = Gerrit(
+            url=self.URL,
+            auth_id='other_user',
+            auth_pw=self.PASSWORD,
+            cache=self.cache,
+        )
+        mock.patch.object(other, '_send', return_value=self.response).start()
+        self.reference.call(r_endpoint='/a/projects/foo/')
+        other.call(r_endpoint='/a/projects/foo/')
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.mock_get.call_count, 1)
+
+    def test_family_not_cached(self):
+        """
+        Test that families without a ttl are not cached
+        """
+        self.cache.ttl = {'projects': 60}
+        self.reference.call(r_endpoint='/a/changes/{}/'.format(self.CHANGE_ID))
+        self.reference.call(r_endpoint='/a/changes/{}/'.format(self.CHANGE_ID))
+        self.assertEqual(self.mock_get.call_count, 2)
+
+    def test_errors_not_cached(self):
+        """
+        Test that error responses are not cached
+        """
+        self.response.status_code = 404
+        self.reference.call(r_endpoint='/a/projects/foo/')
+        self.reference.call(r_endpoint='/a/projects/foo/')
+        self.assertEqual(self.mock_get.call_count, 2)
+
+
+class ContentCacheTestCase(GerritUnitTest):
+    """
+    Unit tests for the immutable content cache
+    """
+    def test_memory(self):
+        """
+        Test that content is kept without expiring and scoped
+        """
+        backend = MemoryCache()
+        cache = ContentCache(backend, 'alice')
+        cache.set('revisions/abc/patch', b'patch')
+        self.assertEqual(cache.get('revisions/abc/patch'), b'patch')
+        self.assertIsNone(ContentCache(backend, 'bob').get('revisions/abc/patch'))
+        self.assertIsNone(cache.get('revisions/def/patch'))
+
+    def test_sqlite(self):
+        """
+        Test that content is kept on disk between connections
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'cache.db')
+
+        backend = SqliteCache(path)
+        ContentCache(backend).set('revisions/abc/patch', b'patch')
+        backend.close()
+
+        backend = SqliteCache(path)
+        self.addCleanup(backend.close)
+        backend.purge()
+        self.assertEqual(ContentCache(backend).get('revisions/abc/patch'), b'patch')
+
+    def test_gerrit(self):
+        """
+        Test that the revisions of a connection share its content cache
+        when it is enabled
+        """
+        sha = '0123456789abcdef0123456789abcdef01234567'
+        for kwargs, calls in (({'revision_cache': True}, 1), ({}, 2)):
+            reference = Gerrit(url=self.URL, auth_id=self.USERNAME, auth_pw=self.PASSWORD,
+                               **kwargs)
+            with mock.patch.object(reference, '_send') as mock_send:
+                mock_send.return_value = mock.Mock(
+                    status_code=200,
+                    content=self.build_response({'README.md': {}}),
+                )
+                reference.get_revision(self.CHANGE_ID, sha).get_files()
+                reference.get_revision(self.CHANGE_ID, sha).get_files()
+            self.assertEqual(mock_send.call_count, calls)
+
+    def test_gerrit_shared_backend(self):
+        """
+        Test that all revisions of a connection use the same backend,
+        created with the connection
+        """
+        reference = Gerrit(url=self.URL, auth_id=self.USERNAME, auth_pw=self.PASSWORD,
+                           revision_cache=True)
+        # pylint: disable=protected-access
+        backend = reference._revision_cache
+        self.assertIsInstance(backend, MemoryCache)
+        caches = [reference._content_cache() for _ in range(2)]
+        self.assertTrue(all(cache.backend is backend for cache in caches))
+
+    def test_gerrit_uncached(self):
+        """
+        Test that without the cache reading the current revision is a
+        single request
+        """
+        reference = Gerrit(url=self.URL, auth_id=self.USERNAME, auth_pw=self.PASSWORD)
+        with mock.patch.object(reference, '_send') as mock_send:
+            mock_send.return_value = mock.Mock(
+                status_code=200,
+                content=self.build_response({'README.md': {}}),
+            )
+            self.assertEqual(reference.get_revision(self.CHANGE_ID).get_files(), {'README.md': {}})
+        self.assertEqual(mock_send.call_count, 1)
+        self.assertEqual(
+            mock_send.call_args[0][1],
+            '%s/a/changes/%s/revisions/current/files/' % (self.URL, self.CHANGE_ID),
+        )
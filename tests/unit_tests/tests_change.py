@@ -8,7 +8,7 @@ from gerrit.projects.project import Project
 from tests import GerritUnitTest
 
 
-class ChangeTestCase(GerritUnitTest):
+class ChangeTestCase(GerritUnitTest):  # pylint: disable=too-many-public-methods
     """
     Unit tests for gerrit.changes.change
     """
@@ -66,6 +66,130 @@ class ChangeTestCase(GerritUnitTest):
         self.assertEqual(self.change.number, self.NUMBER)
         self.assertEqual(self.change.owner, self.OWNER)
 
+    def test_change_is_slotted(self):
+        """
+        Test that a change keeps no instance dict
+        """
+        self.assertFalse(hasattr(self.change, '__dict__'))
+
+    def test_owner(self):
+        """
+        Test that the owner is kept as it was decoded and can be replaced
+        """
+        self.assertEqual(self.change.owner, self.OWNER)
+        self.assertIs(self.change.owner, self.change.owner)
+        self.change.owner = None
+        self.assertIsNone(self.change.owner)
+
+    def test_repeated_values_shared(self):
+        """
+        Test that changes of the same account and project share their values
+        """
+        owner = {'_account_id': 1000096, 'name': 'John Doe'}
+        changes = []
+        for number in (1, 2):
+            self.req.content = self.build_response({
+                "id": self.FULL_ID,
+                "project": ''.join(['gerrit', 'project']),
+                "status": ''.join(['NE', 'W']),
+                "_number": number,
+                "owner": dict(owner),
+            })
+            changes.append(Change(self.gerrit_con).get_change(
+                self.PROJECT,
+                self.BRANCH,
+                self.CHANGE_ID,
+            ))
+
+        self.assertEqual(changes[0].owner, owner)
+        self.assertIs(changes[0].owner, changes[1].owner)
+        self.assertIs(changes[0].project, changes[1].project)
+        self.assertIs(changes[0].status, changes[1].status)
+
+    def test_get_change_options(self):
+        """
+        Test that option sets are requested and their fields populated
+        """
+        self.req.content = self.build_response({
+            "id": self.FULL_ID,
+            "labels": {"Verified": {"approved": {"name": "CI"}}},
+            "current_revision": "184ebe53805e102605d11f6b143486d15c23a09c",
+        })
+        change = Change(self.gerrit_con).get_change(
+            self.PROJECT,
+            self.BRANCH,
+            self.CHANGE_ID,
+            ['LABELS', 'CURRENT_REVISION'],
+        )
+        self.gerrit_con.call.assert_called_with(
+            r_endpoint={
+                'pre': '/a/changes/',
+                'data': self.FULL_ID,
+                'post': '/?o=LABELS&o=CURRENT_REVISION',
+            },
+        )
+        self.assertEqual(change.labels, {"Verified": {"approved": {"name": "CI"}}})
+        self.assertEqual(change.current_revision, '184ebe53805e102605d11f6b143486d15c23a09c')
+        # Fetched with the option but not returned, no need to load it
+        self.assertIsNone(change.revisions)
+        self.assertEqual(self.gerrit_con.call.call_count, 2)
+
+    def test_lazy_fields_coalesced(self):
+        """
+        Test that all missing fields are fetched with one request when one is read
+        """
+        self.req.content = self.build_response({
+            "id": self.FULL_ID,
+            "labels": {"Code-Review": {}},
+            "permitted_labels": {"Code-Review": ["-1", " 0", "+1"]},
+            "messages": [{"message": "Uploaded patch set 1."}],
+            "submittable": False,
+        })
+        self.assertEqual(self.change.messages, [{"message": "Uploaded patch set 1."}])
+        self.gerrit_con.call.assert_called_with(
+            r_endpoint={
+                'pre': '/a/changes/',
+                'data': self.FULL_ID,
+                'post': '/?o=CURRENT_REVISION&o=DETAILED_LABELS&o=LABELS'
+                        '&o=MESSAGES&o=SUBMITTABLE',
+            },
+        )
+        self.assertEqual(self.change.permitted_labels, {"Code-Review": ["-1", " 0", "+1"]})
+        self.assertFalse(self.change.submittable)
+        self.assertIsNone(self.change.revisions)
+        self.assertEqual(self.gerrit_con.call.call_count, 2)
+
+    def test_load_fields(self):
+        """
+        Test that chosen fields can be loaded up front
+        """
+        self.req.content = self.build_response({"id": self.FULL_ID, "labels": {}})
+        self.change.load_fields(['labels'])
+        self.gerrit_con.call.assert_called_with(
+            r_endpoint={
+                'pre': '/a/changes/',
+                'data': self.FULL_ID,
+                'post': '/?o=LABELS',
+            },
+        )
+        self.assertEqual(self.change.labels, {})
+        self.assertEqual(self.gerrit_con.call.call_count, 2)
+
+        with self.assertRaises(KeyError):
+            self.change.load_fields(['subject'])
+
+    def test_query_options_populated(self):
+        """
+        Test that changes populated with options don't load those fields again
+        """
+        change = Change(self.gerrit_con)
+        # pylint: disable=protected-access
+        change._populate({"id": self.FULL_ID}, ['DETAILED_LABELS', 'ALL_REVISIONS'])
+        self.assertIsNone(change.labels)
+        self.assertIsNone(change.removable_reviewers)
+        self.assertIsNone(change.revisions)
+        self.assertEqual(self.gerrit_con.call.call_count, 1)
+
     def test_get_change_project_object(self):
         """
         Test that a change can be fetched when using a project object
@@ -139,7 +263,36 @@ class ChangeTestCase(GerritUnitTest):
 
     def test_create_change_success(self):
         """
-        Test that a change is successfully created
+        Test that a change is created from the ChangeInfo gerrit returns
+        """
+        self.req.status_code = 201
+
+        with mock.patch.object(Change, 'get_change') as mock_get_change:
+            change = Change(self.gerrit_con).create_change(
+                self.PROJECT,
+                self.SUBJECT,
+                self.BRANCH,
+                {'status': 'DRAFT'},
+            )
+            mock_get_change.assert_not_called()
+        self.gerrit_con.call.assert_called_with(
+            request='post',
+            r_endpoint='/a/changes/',
+            r_payload={
+                'project': self.PROJECT,
+                'subject': self.SUBJECT,
+                'branch': self.BRANCH,
+                'status': 'DRAFT',
+            },
+        )
+        self.assertEqual(change.full_id, self.FULL_ID)
+        self.assertEqual(change.change_id, self.CHANGE_ID)
+        self.assertEqual(change.subject, self.SUBJECT)
+        self.assertEqual(change.owner, self.OWNER)
+
+    def test_create_change_refresh(self):
+        """
+        Test that a created change can be fetched again
         """
         self.req.status_code = 201
 
@@ -149,6 +302,7 @@ class ChangeTestCase(GerritUnitTest):
                 self.SUBJECT,
                 self.BRANCH,
                 {'status': 'DRAFT'},
+                refresh=True,
             )
             mock_get_change.assert_called_with(
                 self.PROJECT,
@@ -176,19 +330,18 @@ class ChangeTestCase(GerritUnitTest):
         """
         self.req.status_code = 201
 
-        with mock.patch.object(Change, 'get_change') as mock_get_change:
-            project = Project(self.gerrit_con_project).get_project(self.PROJECT)
-            Change(self.gerrit_con).create_change(
-                project,
-                self.SUBJECT,
-                self.BRANCH,
-                {'status': 'DRAFT'}
-            )
-            mock_get_change.assert_called_with(
-                self.PROJECT,
-                self.BRANCH,
-                self.CHANGE_ID,
-            )
+        project = Project(self.gerrit_con_project).get_project(self.PROJECT)
+        change = Change(self.gerrit_con).create_change(
+            project,
+            self.SUBJECT,
+            self.BRANCH,
+            {'status': 'DRAFT'}
+        )
+        self.assertEqual(
+            self.gerrit_con.call.call_args[1]['r_payload']['project'],
+            self.PROJECT,
+        )
+        self.assertEqual(change.project, self.PROJECT)
 
     def test_submit_change_success(self):
         """
@@ -224,6 +377,27 @@ class ChangeTestCase(GerritUnitTest):
         )
         self.assertEqual(self.change.status, 'MERGED')
 
+    def test_submit_change_populates(self):
+        """
+        Test that the change is updated from the ChangeInfo returned on submit
+        """
+        self.req.content = self.build_response(
+            {
+                "id": self.FULL_ID,
+                "project": self.PROJECT,
+                "branch": self.BRANCH,
+                "change_id": self.CHANGE_ID,
+                "subject": self.SUBJECT,
+                "status": "MERGED",
+                "updated": "2013-02-21 11:20:01.000000000",
+                "_number": self.NUMBER,
+            }
+        )
+        self.assertIs(self.change.submit_change(), self.change)
+        self.assertEqual(self.change.status, 'MERGED')
+        self.assertEqual(self.change.updated, '2013-02-21 11:20:01.000000000')
+        self.assertEqual(self.change.full_id, self.FULL_ID)
+
     def test_submit_change_fail(self):
         """
         Test that a submit raises an error if it is blocked
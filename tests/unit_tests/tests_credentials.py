@@ -0,0 +1,140 @@
+"""
+Unit tests for gerrit.credentials
+"""
+import os
+import shutil
+import tempfile
+import mock
+from gerrit.credentials import (
+    ChainProvider,
+    EnvProvider,
+    FileTokenProvider,
+    NetrcProvider,
+    clear_netrc_cache,
+    get_netrc_auth,
+)
+from gerrit.error import CredentialsNotFound
+from tests import GerritUnitTest
+
+
+class CredentialsTestCase(GerritUnitTest):
+    """
+    Basic class with a temporary directory for credential files
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.netrc = os.path.join(self.directory, 'netrc')
+        patcher = mock.patch.dict(os.environ, {'NETRC': self.netrc})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        clear_netrc_cache()
+        self.addCleanup(clear_netrc_cache)
+
+    def write(self, path, content, mtime=None):
+        """
+        Write a credential file
+        """
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+
+class NetrcTestCase(CredentialsTestCase):
+    """
+    Unit tests for the cached netrc lookup
+    """
+    def test_lookup(self):
+        """
+        Test that credentials are found by host
+        """
+        self.write(self.netrc, 'machine example.com login %s password %s\n' % (
+            self.USERNAME, self.PASSWORD))
+        self.assertEqual(get_netrc_auth(self.URL), (self.USERNAME, self.PASSWORD))
+        self.assertEqual(get_netrc_auth('https://example.com:8443/r/'),
+                         (self.USERNAME, self.PASSWORD))
+        self.assertIsNone(get_netrc_auth('http://other.example.com'))
+        self.assertEqual(NetrcProvider().get_credentials(self.URL),
+                         (self.USERNAME, self.PASSWORD))
+
+    def test_parsed_once(self):
+        """
+        Test that the file is only parsed again once it changed
+        """
+        self.write(self.netrc, 'machine example.com login old password old\n', 1000000000)
+        with mock.patch('gerrit.credentials.netrc.netrc', wraps=__import__('netrc').netrc) as parse:
+            for _ in range(5):
+                self.assertEqual(get_netrc_auth(self.URL), ('old', 'old'))
+            self.assertEqual(parse.call_count, 1)
+
+            self.write(self.netrc, 'machine example.com login new password new\n', 1000000001)
+            self.assertEqual(get_netrc_auth(self.URL), ('new', 'new'))
+            self.assertEqual(parse.call_count, 2)
+
+    def test_missing_or_invalid(self):
+        """
+        Test that no credentials are found in a missing file or incomplete entry
+        """
+        self.assertIsNone(get_netrc_auth(self.URL))
+        self.write(self.netrc, 'machine example.com login\n')
+        self.assertIsNone(get_netrc_auth(self.URL))
+        self.write(self.netrc, 'machine example.com login user\n', 1000000000)
+        self.assertIsNone(get_netrc_auth(self.URL))
+
+
+class ProvidersTestCase(CredentialsTestCase):
+    """
+    Unit tests for the environment, token file and chained providers
+    """
+    def test_env(self):
+        """
+        Test that credentials are read from the environment
+        """
+        provider = EnvProvider()
+        with mock.patch.dict(os.environ, {'GERRIT_USERNAME': self.USERNAME}):
+            self.assertIsNone(provider.get_credentials(self.URL))
+            os.environ['GERRIT_PASSWORD'] = self.PASSWORD
+            self.assertEqual(provider.get_credentials(self.URL), (self.USERNAME, self.PASSWORD))
+
+    def test_file_token(self):
+        """
+        Test that a rotated token is read again
+        """
+        path = os.path.join(self.directory, 'token')
+        provider = FileTokenProvider(path, username=self.USERNAME)
+        self.assertIsNone(provider.get_credentials(self.URL))
+
+        self.write(path, 'token1\n')
+        self.assertEqual(provider.get_credentials(self.URL), (self.USERNAME, 'token1'))
+        self.write(path, 'token2\n')
+        self.assertEqual(provider.get_credentials(self.URL), (self.USERNAME, 'token2'))
+
+    def test_file_user_and_token(self):
+        """
+        Test that the user can be read from the token file
+        """
+        path = os.path.join(self.directory, 'token')
+        self.write(path, '%s:%s\n' % (self.USERNAME, self.PASSWORD))
+        self.assertEqual(FileTokenProvider(path).get_credentials(self.URL),
+                         (self.USERNAME, self.PASSWORD))
+
+        self.write(path, 'token\n')
+        with self.assertRaises(CredentialsNotFound):
+            FileTokenProvider(path).get_credentials(self.URL)
+
+    def test_chain(self):
+        """
+        Test that the first provider with credentials is used
+        """
+        empty = mock.Mock()
+        empty.get_credentials.return_value = None
+        found = mock.Mock()
+        found.get_credentials.return_value = (self.USERNAME, self.PASSWORD)
+        unused = mock.Mock()
+
+        provider = ChainProvider(empty, found, unused)
+        self.assertEqual(provider.get_credentials(self.URL), (self.USERNAME, self.PASSWORD))
+        empty.get_credentials.assert_called_once_with(self.URL)
+        unused.get_credentials.assert_not_called()
+        self.assertIsNone(ChainProvider(empty).get_credentials(self.URL))
@@ -0,0 +1,285 @@
+"""
+Unit tests for gerrit.events
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import mock
+from gerrit.changes.change import Change
+from gerrit.error import UnhandledError
+from gerrit.events import (
+    ChangeEvent,
+    ChangeMergedEvent,
+    CommentAddedEvent,
+    Event,
+    EventStream,
+    PatchSetCreatedEvent,
+    RefUpdatedEvent,
+    RestEventLogSource,
+    SshEventSource,
+    parse_event,
+)
+from tests import GerritUnitTest
+
+
+class FakeEventSource(object):
+    """
+    An event source that replays lists of events, one list per connection
+    """
+    def __init__(self, *connections):
+        self.connections = list(connections)
+        self.since = []
+        self.produced = 0
+        self.closed = threading.Event()
+
+    def events(self, since=None):
+        """
+        Replay the events of the next connection
+        """
+        self.since.append(since)
+        if not self.connections:
+            self.closed.wait()
+            return
+        for event in self.connections.pop(0):
+            if isinstance(event, Exception):
+                raise event
+            self.produced += 1
+            yield event
+
+    def close(self):
+        """
+        Stop waiting for more connections
+        """
+        self.closed.set()
+
+
+def raw_event(event_type, created_on, number=1, **kwargs):
+    """
+    Build an event as sent by gerrit
+    """
+    raw = {
+        'type': event_type,
+        'eventCreatedOn': created_on,
+        'change': {
+            'project': GerritUnitTest.PROJECT,
+            'branch': GerritUnitTest.BRANCH,
+            'id': GerritUnitTest.CHANGE_ID,
+            'number': number,
+            'subject': GerritUnitTest.SUBJECT,
+            'owner': GerritUnitTest.OWNER,
+            'status': 'NEW',
+            'createdOn': 1359712772,
+            'lastUpdated': created_on,
+        },
+    }
+    raw.update(kwargs)
+    return raw
+
+
+class ParseEventTestCase(GerritUnitTest):
+    """
+    Unit tests for typed events
+    """
+    def test_change_event(self):
+        """
+        Test that change events map to a Change
+        """
+        event = parse_event(None, raw_event(
+            'patchset-created', 1361445396, uploader={'name': 'John Doe'},
+            patchSet={'number': 2},
+        ))
+        self.assertIsInstance(event, PatchSetCreatedEvent)
+        self.assertEqual(event.created_on, 1361445396)
+        self.assertEqual(event.account, {'name': 'John Doe'})
+        self.assertEqual(event.patch_set, {'number': 2})
+        self.assertIsInstance(event.change, Change)
+        self.assertIs(event.change, event.change)
+        self.assertEqual(event.change.full_id, self.FULL_ID)
+        self.assertEqual(event.change.number, 1)
+        self.assertEqual(event.change.owner, self.OWNER)
+        self.assertEqual(event.change.updated, '2013-02-21 11:16:36.000000000')
+        self.assertEqual(event.project.name, self.PROJECT)
+
+    def test_comment_added(self):
+        """
+        Test that reviews expose their votes
+        """
+        event = parse_event(None, raw_event(
+            'comment-added', 1, approvals=[{'type': 'Verified', 'value': '1'}],
+            comment='Build succeeded',
+        ))
+        self.assertIsInstance(event, CommentAddedEvent)
+        self.assertEqual(event.approvals, [{'type': 'Verified', 'value': '1'}])
+        self.assertEqual(event.comment, 'Build succeeded')
+
+    def test_ref_updated(self):
+        """
+        Test that ref updates map to a Project
+        """
+        event = parse_event(None, {
+            'type': 'ref-updated',
+            'refUpdate': {'project': self.PROJECT, 'refName': 'refs/heads/master'},
+        })
+        self.assertIsInstance(event, RefUpdatedEvent)
+        self.assertEqual(event.project.name, self.PROJECT)
+
+    def test_unknown_types(self):
+        """
+        Test that unknown events are still wrapped
+        """
+        self.assertIsInstance(parse_event(None, raw_event('wip-state-changed', 1)), ChangeEvent)
+        event = parse_event(None, {'type': 'dropped-output'})
+        self.assertIs(type(event), Event)
+        self.assertIsNone(event.project)
+
+
+class EventStreamTestCase(GerritUnitTest):
+    """
+    Unit tests for consuming events through a bounded queue
+    """
+    def test_events_in_order(self):
+        """
+        Test that events are queued in the order they are read
+        """
+        source = FakeEventSource([raw_event('patchset-created', 1), raw_event('change-merged', 2)])
+        with EventStream(source) as stream:
+            events = [stream.get(timeout=1), stream.get(timeout=1)]
+        self.assertIsInstance(events[0], PatchSetCreatedEvent)
+        self.assertIsInstance(events[1], ChangeMergedEvent)
+        self.assertEqual(stream.last_timestamp, 2)
+
+    def test_backpressure(self):
+        """
+        Test that reading pauses while the queue is full
+        """
+        source = FakeEventSource([raw_event('comment-added', number, number)
+                                  for number in range(1, 11)])
+        with EventStream(source, maxsize=2) as stream:
+            time.sleep(0.2)
+            self.assertEqual(stream.qsize(), 2)
+            self.assertLessEqual(source.produced, 3)
+            numbers = [stream.get(timeout=1).change.number for _ in range(10)]
+        self.assertEqual(numbers, list(range(1, 11)))
+
+    def test_last_timestamp_consumed(self):
+        """
+        Test that the timestamp to resume from only covers consumed events
+        """
+        source = FakeEventSource([raw_event('comment-added', number, number)
+                                  for number in range(1, 6)])
+        with EventStream(source, since=0, maxsize=2) as stream:
+            time.sleep(0.2)
+            self.assertEqual(stream.last_timestamp, 0)
+            self.assertEqual(stream.get(timeout=1).created_on, 1)
+            self.assertEqual(stream.last_timestamp, 1)
+            self.assertEqual(next(iter(stream)).created_on, 2)
+            self.assertEqual(stream.last_timestamp, 2)
+        self.assertEqual(stream.last_timestamp, 2)
+
+    def test_resume_after_disconnect(self):
+        """
+        Test that a dropped connection resumes from the last event without duplicates
+        """
+        source = FakeEventSource(
+            [raw_event('patchset-created', 1), raw_event('comment-added', 2),
+             ConnectionError('connection reset')],
+            [raw_event('comment-added', 2), raw_event('change-merged', 3)],
+        )
+        with EventStream(source, since=0, reconnect_delay=0.01) as stream:
+            types = [stream.get(timeout=1).type for _ in range(3)]
+            self.assertEqual(types, ['patchset-created', 'comment-added', 'change-merged'])
+            self.assertIsInstance(stream.last_error, ConnectionError)
+            self.assertEqual(stream.reconnects, 1)
+        self.assertEqual(source.since[:2], [0, 2])
+
+    def test_dispatch(self):
+        """
+        Test that handlers get the events of their type and subclasses
+        """
+        source = FakeEventSource([
+            raw_event('patchset-created', 1),
+            raw_event('change-merged', 2),
+            {'type': 'ref-updated', 'eventCreatedOn': 3, 'refUpdate': {}},
+        ])
+        merged = mock.Mock()
+        changes = mock.Mock()
+        stream = EventStream(source)
+        stream.on('change-merged', merged).on(ChangeEvent, changes)
+        stream.start()
+        threading.Timer(0.3, stream.stop).start()
+        stream.run()
+        self.assertEqual(merged.call_count, 1)
+        self.assertEqual(changes.call_count, 2)
+
+
+class SshEventSourceTestCase(GerritUnitTest):
+    """
+    Unit tests for reading stream-events over ssh
+    """
+    def test_command(self):
+        """
+        Test that stream-events is run on the gerrit ssh port
+        """
+        source = SshEventSource('gerrit.example.com', username=self.USERNAME)
+        self.assertEqual(source.command(), [
+            'ssh', '-p', '29418', '-o', 'BatchMode=yes', '-o', 'ServerAliveInterval=30',
+            '%s@gerrit.example.com' % self.USERNAME, 'gerrit', 'stream-events',
+        ])
+
+    def test_events(self):
+        """
+        Test that each line of output is an event
+        """
+        with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as script:
+            script.write('print(%r)\nprint()\nprint(%r)\n' % (
+                json.dumps(raw_event('patchset-created', 1)),
+                json.dumps(raw_event('change-merged', 2)),
+            ))
+        self.addCleanup(os.remove, script.name)
+
+        source = SshEventSource('localhost', ssh_command=(sys.executable, script.name))
+        events = list(source.events())
+        self.assertEqual([event['type'] for event in events],
+                         ['patchset-created', 'change-merged'])
+
+
+class RestEventLogSourceTestCase(GerritUnitTest):
+    """
+    Unit tests for polling the events-log plugin
+    """
+    def test_events(self):
+        """
+        Test that events are polled from the last timestamp
+        """
+        gerrit_con = mock.Mock()
+        gerrit_con.call.return_value = mock.Mock(
+            status_code=200,
+            content='{}\n{}\n'.format(
+                json.dumps(raw_event('patchset-created', 1361445396)),
+                json.dumps(raw_event('change-merged', 1361445400)),
+            ).encode('utf-8'),
+        )
+        source = RestEventLogSource(gerrit_con, poll_interval=0)
+        events = source.events(since=1361445000)
+        self.assertEqual(next(events)['type'], 'patchset-created')
+        self.assertEqual(next(events)['type'], 'change-merged')
+        next(events)
+        gerrit_con.call.assert_called_with(
+            r_endpoint='/a/plugins/events-log/events/?t1=2013-02-21+11%3A16%3A40',
+        )
+        self.assertEqual(gerrit_con.call.call_args_list[0], mock.call(
+            r_endpoint='/a/plugins/events-log/events/?t1=2013-02-21+11%3A10%3A00',
+        ))
+        source.close()
+
+    def test_error(self):
+        """
+        Test that it raises if the plugin can't be reached
+        """
+        gerrit_con = mock.Mock()
+        gerrit_con.call.return_value = mock.Mock(status_code=404, content=b'Not found')
+        with self.assertRaises(UnhandledError):
+            next(RestEventLogSource(gerrit_con).events())
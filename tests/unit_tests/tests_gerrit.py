@@ -1,14 +1,22 @@
 """
 Unit tests for gerrit.changes.change
 """
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 import mock
-from gerrit.error import CredentialsNotFound
+from gerrit.error import (
+    CredentialsNotFound,
+    UnhandledError,
+)
 from gerrit.gerrit import (
+    DEFAULT_TIMEOUT,
     Gerrit,
-    HTTPDigestAuth,
     HTTPBasicAuth,
+    SharedDigestAuth,
 )
+from gerrit.identity import IdentityMap
 from gerrit.projects.project import Project
 from gerrit.changes.revision import Revision
 from gerrit.changes.change import Change
@@ -22,8 +30,8 @@ class GerritTestCase(GerritUnitTest):
     def setUp(self):
         self.mock_http_basic_auth = mock.patch('gerrit.gerrit.HTTPBasicAuth').start()
         self.mock_http_basic_auth.side_effect = HTTPBasicAuth
-        self.mock_http_digest_auth = mock.patch('gerrit.gerrit.HTTPDigestAuth').start()
-        self.mock_http_digest_auth.side_effect = HTTPDigestAuth
+        self.mock_http_digest_auth = mock.patch('gerrit.gerrit.SharedDigestAuth').start()
+        self.mock_http_digest_auth.side_effect = SharedDigestAuth
         self.mock_get_netrc_auth = mock.patch('gerrit.gerrit.get_netrc_auth').start()
         self.mock_get_netrc_auth.return_value = (self.USERNAME, self.PASSWORD)
 
@@ -144,6 +152,45 @@ class GerritInitTestCase(GerritTestCase):
         # given credentials
         self.auth_ok(reference)
 
+    def test_netrc_read_once(self):
+        """
+        Test that netrc is only looked up once
+        """
+        Gerrit(url=self.URL)
+        self.mock_get_netrc_auth.assert_called_once_with(self.URL)
+
+    def test_credentials_provider(self):
+        """
+        Test that a credentials provider is used instead of netrc
+        """
+        provider = mock.Mock()
+        provider.get_credentials.return_value = (self.USERNAME, self.PASSWORD)
+        reference = Gerrit(url=self.URL, credentials=provider)
+        provider.get_credentials.assert_called_once_with(self.URL)
+        self.mock_get_netrc_auth.assert_not_called()
+        self.auth_ok(reference)
+
+        provider.get_credentials.return_value = None
+        with self.assertRaises(CredentialsNotFound):
+            Gerrit(url=self.URL, credentials=provider)
+
+    def test_refresh_credentials(self):
+        """
+        Test that refreshed credentials are used without a new connection
+        """
+        provider = mock.Mock()
+        provider.get_credentials.return_value = ('old_user', 'old_password')
+        reference = Gerrit(url=self.URL, credentials=provider, auth_method='digest')
+        session = reference._session  # pylint: disable=protected-access
+
+        provider.get_credentials.return_value = (self.USERNAME, self.PASSWORD)
+        reference.refresh_credentials()
+        self.auth_ok(reference)
+        # pylint: disable=protected-access
+        self.assertIsInstance(reference._auth, SharedDigestAuth)
+        self.assertEqual(reference._auth_id, self.USERNAME)
+        self.assertIs(reference._session, session)
+
     def test_credentials_not_found(self):
         """
         Test that is raises if netrc credentials can not be found
@@ -189,6 +236,125 @@ class GerritInitTestCase(GerritTestCase):
         self.mock_get_netrc_auth.assert_not_called()
 
 
+class GerritSessionTestCase(GerritTestCase):
+    """
+    Unit tests for the pooled session of a Gerrit connection
+    """
+    def test_pool_settings(self):
+        """
+        Test that the pool settings are passed on to the session adapters
+        """
+        reference = Gerrit(url=self.URL, pool_connections=2, pool_maxsize=20)
+        # pylint: disable=protected-access
+        adapter = reference._session.get_adapter('https://example.com')
+        self.assertIs(adapter, reference._session.get_adapter(self.URL))
+        self.assertEqual(adapter.poolmanager.connection_pool_kw['maxsize'], 20)
+        self.assertEqual(adapter.poolmanager.pools._maxsize, 2)
+
+    def test_session_is_reused(self):
+        """
+        Test that all calls go through the same session
+        """
+        with mock.patch('gerrit.gerrit.requests.Session.get') as mock_get:
+            reference = Gerrit(url=self.URL)
+            reference.call(r_endpoint='/a/projects/')
+            reference.call(r_endpoint='/a/changes/')
+            self.assertEqual(mock_get.call_count, 2)
+
+    def test_stream(self):
+        """
+        Test that a response can be streamed
+        """
+        with mock.patch('gerrit.gerrit.requests.Session.get') as mock_get:
+            reference = Gerrit(url=self.URL)
+            reference.call(r_endpoint='/a/projects/', stream=True)
+            self.assertTrue(mock_get.call_args[1]['stream'])
+
+    def test_single_flight(self):
+        """
+        Test that concurrent identical GETs are sent once
+        """
+        release = threading.Event()
+
+        def get(**_):
+            release.wait(5)
+            return mock.Mock(status_code=200, content=b'{}')
+
+        with mock.patch('gerrit.gerrit.requests.Session.get') as mock_get:
+            mock_get.side_effect = get
+            reference = Gerrit(url=self.URL, single_flight=True)
+            with ThreadPoolExecutor(max_workers=10) as executor:
+                futures = [executor.submit(reference.call, r_endpoint='/a/projects/foo/')
+                           for _ in range(10)]
+                while reference.single_flight_stats()['coalesced'] < 9:
+                    time.sleep(0.001)
+                release.set()
+            self.assertEqual(len({id(future.result()) for future in futures}), 1)
+            self.assertEqual(mock_get.call_count, 1)
+            self.assertEqual(reference.single_flight_stats(), {'sent': 1, 'coalesced': 9})
+
+            reference.call(r_endpoint='/a/projects/foo/', stream=True)
+            self.assertEqual(mock_get.call_count, 2)
+            self.assertEqual(reference.single_flight_stats(), {'sent': 1, 'coalesced': 9})
+
+    def test_single_flight_disabled(self):
+        """
+        Test that single flight is off unless asked for
+        """
+        with mock.patch('gerrit.gerrit.requests.Session.get') as mock_get:
+            reference = Gerrit(url=self.URL)
+            reference.call(r_endpoint='/a/projects/')
+            self.assertEqual(mock_get.call_count, 1)
+            self.assertIsNone(reference.single_flight_stats())
+
+    def test_call_hooks(self):
+        """
+        Test that call hooks get the endpoint without ids
+        """
+        pre = mock.Mock()
+        post = mock.Mock()
+        with mock.patch('gerrit.gerrit.requests.Session.post') as mock_post:
+            mock_post.return_value = mock.Mock(status_code=200, content=b'{}')
+            reference = Gerrit(url=self.URL)
+            reference.add_call_hook(pre=pre, post=post)
+            reference.call(
+                request='post',
+                r_endpoint={'pre': '/a/changes/', 'data': self.FULL_ID, 'post': '/submit/'},
+            )
+            pre.assert_called_once_with('post', '/a/changes/{id}/submit/')
+            post.assert_called_once_with('post', '/a/changes/{id}/submit/', 200, 2, mock.ANY)
+
+            mock_post.side_effect = ValueError
+            with self.assertRaises(ValueError):
+                reference.call(request='post', r_endpoint='/a/changes/')
+            post.assert_called_with('post', '/a/changes/', None, None, mock.ANY)
+
+            reference.remove_call_hook(pre=pre, post=post)
+            mock_post.side_effect = None
+            reference.call(request='post', r_endpoint='/a/changes/')
+            self.assertEqual(pre.call_count, 2)
+            self.assertEqual(post.call_count, 2)
+
+    def test_close(self):
+        """
+        Test that closing the connection closes the session
+        """
+        with mock.patch('gerrit.gerrit.requests.Session.close') as mock_close:
+            reference = Gerrit(url=self.URL)
+            reference.close()
+            mock_close.assert_called_once_with()
+
+    def test_context_manager(self):
+        """
+        Test that the session is closed when leaving the with block
+        """
+        with mock.patch('gerrit.gerrit.requests.Session.close') as mock_close:
+            with Gerrit(url=self.URL) as reference:
+                self.assertIsInstance(reference, Gerrit)
+                mock_close.assert_not_called()
+            mock_close.assert_called_once_with()
+
+
 class GerritRevisionTestCase(GerritTestCase):
     """
     Unit tests for getting a revision
@@ -247,7 +413,7 @@ class GerritChangeTestCase(GerritTestCase):
     """
     def setUp(self):
         super().setUp()
-        self.mock_post = mock.patch('gerrit.gerrit.requests.post').start()
+        self.mock_post = mock.patch('gerrit.gerrit.requests.Session.post').start()
         self.post = mock.Mock()
         self.post.status_code = 201
         self.post.content = self.build_response(
@@ -257,7 +423,7 @@ class GerritChangeTestCase(GerritTestCase):
         )
         self.mock_post.return_value = self.post
 
-        self.mock_get = mock.patch('gerrit.gerrit.requests.get').start()
+        self.mock_get = mock.patch('gerrit.gerrit.requests.Session.get').start()
         self.get = mock.Mock()
         self.get.status_code = 200
         self.get.content = self.build_response({})
@@ -274,6 +440,8 @@ class GerritChangeTestCase(GerritTestCase):
             auth=mock.ANY,
             headers=mock.ANY,
             json=mock.ANY,
+            stream=False,
+            timeout=DEFAULT_TIMEOUT,
             url='{}/a/changes/'.format(self.URL)
         )
 
@@ -297,6 +465,8 @@ class GerritChangeTestCase(GerritTestCase):
             auth=mock.ANY,
             headers=mock.ANY,
             json=mock.ANY,
+            stream=False,
+            timeout=DEFAULT_TIMEOUT,
             url='{}/a/changes/{}%7E{}%7E{}/'.format(
                 self.URL,
                 self.PROJECT,
@@ -306,6 +476,178 @@ class GerritChangeTestCase(GerritTestCase):
         )
 
 
+class GerritReviewersTestCase(GerritTestCase):
+    """
+    Unit tests for adding reviewers to many changes
+    """
+    def setUp(self):
+        super().setUp()
+        self.req = mock.Mock()
+        self.req.status_code = 200
+        self.req.content = self.build_response({"reviewers": [self.USER]})
+        self.call = mock.Mock()
+        self.call.return_value = self.req
+
+    def test_add_reviewers_bulk(self):
+        """
+        Test that reviewers are added to every change with per account results
+        """
+        reference = Gerrit(url=self.URL)
+        reference.call = self.call
+        change = Change(reference)
+        change.change_id = 'Iother'
+
+        result = reference.add_reviewers_bulk({
+            self.CHANGE_ID: [self.USER, 'other user'],
+            change: [self.USER],
+        })
+        self.assertEqual(result, {
+            self.CHANGE_ID: {self.USER: True, 'other user': True},
+            change: {self.USER: True},
+        })
+        self.call.assert_any_call(
+            request='post',
+            r_endpoint='/a/changes/Iother/reviewers',
+            r_payload={'reviewer': self.USER},
+        )
+        self.assertEqual(self.call.call_count, 3)
+
+    def test_add_reviewers_bulk_errors(self):
+        """
+        Test that a failing call is reported for the affected accounts only
+        """
+        def call(r_payload, **_):
+            if r_payload['reviewer'] == 'other user':
+                raise ConnectionError('connection reset')
+            return self.req
+
+        reference = Gerrit(url=self.URL)
+        reference.call = mock.Mock(side_effect=call)
+
+        result = reference.add_reviewers_bulk({self.CHANGE_ID: [self.USER, 'other user']})
+        self.assertTrue(result[self.CHANGE_ID][self.USER])
+        self.assertIsInstance(result[self.CHANGE_ID]['other user'], ConnectionError)
+
+    def test_add_reviewers_bulk_single_request(self):
+        """
+        Test that one review request is made per change
+        """
+        self.req.content = self.build_response({
+            "reviewers": {self.USER: {"input": self.USER, "reviewers": [{"_account_id": 1}]}}
+        })
+        reference = Gerrit(url=self.URL)
+        reference.call = self.call
+
+        result = reference.add_reviewers_bulk({self.CHANGE_ID: [self.USER]}, single_request=True)
+        self.assertEqual(result, {self.CHANGE_ID: {self.USER: True}})
+        self.call.assert_called_once_with(
+            request='post',
+            r_endpoint='/a/changes/{}/revisions/current/review'.format(self.CHANGE_ID),
+            r_payload={'reviewers': [{'reviewer': self.USER}]},
+        )
+
+
+class GerritReviewsTestCase(GerritTestCase):
+    """
+    Unit tests for setting reviews on many changes
+    """
+    def test_set_reviews(self):
+        """
+        Test that reviews are set with per review results
+        """
+        def call(r_endpoint, **_):
+            req = mock.Mock()
+            req.status_code = 409 if 'Ibroken' in r_endpoint else 200
+            req.content = self.build_response({})
+            return req
+
+        reference = Gerrit(url=self.URL)
+        reference.call = mock.Mock(side_effect=call)
+
+        reviews = [
+            (self.CHANGE_ID, self.REVISION_ID, {'Verified': 1}, 'Build ok'),
+            ('Ibroken', None, {'Verified': -1}),
+        ]
+        results = {result.item[0]: result for result in reference.set_reviews(reviews)}
+        self.assertTrue(results[self.CHANGE_ID].value)
+        self.assertIsNone(results[self.CHANGE_ID].error)
+        self.assertIsInstance(results['Ibroken'].error, UnhandledError)
+        reference.call.assert_any_call(
+            request='post',
+            r_endpoint='/a/changes/{}/revisions/{}/review'.format(
+                self.CHANGE_ID,
+                self.REVISION_ID,
+            ),
+            r_payload={'labels': {'Verified': 1}, 'message': 'Build ok'},
+        )
+        reference.call.assert_any_call(
+            request='post',
+            r_endpoint='/a/changes/Ibroken/revisions/current/review',
+            r_payload={'labels': {'Verified': -1}},
+        )
+
+
+class GerritIdentityMapTestCase(GerritTestCase):
+    """
+    Unit tests for the identity map of a connection
+    """
+    def setUp(self):
+        super().setUp()
+        self.req = mock.Mock()
+        self.req.status_code = 200
+        self.req.content = self.build_response({"name": self.PROJECT})
+        self.call = mock.Mock()
+        self.call.return_value = self.req
+
+    def test_same_instance(self):
+        """
+        Test that fetching a project twice returns the same instance
+        """
+        reference = Gerrit(url=self.URL, identity_map=IdentityMap())
+        reference.call = self.call
+        project = reference.get_project(self.PROJECT)
+        self.req.content = self.build_response(
+            {"name": self.PROJECT, "description": self.DESCRIPTION}
+        )
+        self.assertIs(reference.get_project(self.PROJECT), project)
+        self.assertEqual(project.description, self.DESCRIPTION)
+        self.assertEqual(self.call.call_count, 2)
+
+    def test_fresh_instance_not_fetched(self):
+        """
+        Test that a change fetched within the ttl isn't fetched again
+        """
+        self.req.content = self.build_response({"id": self.FULL_ID_QUOTED})
+        reference = Gerrit(url=self.URL, identity_map=IdentityMap(ttl=60))
+        reference.call = self.call
+        change = reference.get_change(self.PROJECT, self.CHANGE_ID)
+        self.assertIs(reference.get_change(self.PROJECT, self.CHANGE_ID), change)
+        self.assertEqual(self.call.call_count, 1)
+
+    def test_query_interned(self):
+        """
+        Test that changes from a query are the canonical instances
+        """
+        self.req.content = self.build_response({"id": self.FULL_ID_QUOTED})
+        reference = Gerrit(url=self.URL, identity_map=IdentityMap())
+        reference.call = self.call
+        change = reference.get_change(self.PROJECT, self.CHANGE_ID)
+
+        self.req.content = self.build_response([{"id": self.FULL_ID, "status": "MERGED"}])
+        self.assertIs(reference.query_changes('status:merged')[0], change)
+        self.assertIs(next(reference.iter_changes('status:merged')), change)
+        self.assertEqual(change.status, 'MERGED')
+
+    def test_without_identity_map(self):
+        """
+        Test that a new instance is returned without an identity map
+        """
+        reference = Gerrit(url=self.URL)
+        reference.call = self.call
+        project = reference.get_project(self.PROJECT)
+        self.assertIsNot(reference.get_project(self.PROJECT), project)
+
+
 class GerritError(unittest.TestCase):
     """
     Unit tests for errors
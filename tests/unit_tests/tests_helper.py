@@ -1,10 +1,309 @@
 """
-Unit tests for gerrit.helper.process_endpoint
+Unit tests for gerrit.helper
 """
-from gerrit.helper import process_endpoint
+import base64
+from json import dumps
+import mock
+from gerrit.helper import (
+    decode_json,
+    endpoint_template,
+    intern_str,
+    iter_base64,
+    iter_json,
+    iter_response,
+    process_endpoint,
+    shared_account,
+)
 from tests import GerritUnitTest
 
 
+class TestDecodeJson(GerritUnitTest):
+    """
+    Unit tests for decoding gerrit responses
+    """
+    CONTENT = {'id': 'gerritproject~master~I0144', 'subject': 'M\u00e4rz', 'number': 3965}
+
+    def decode_all(self, response):
+        """
+        Decode a response with and without the optional backend
+        """
+        results = [decode_json(response)]
+        with mock.patch('gerrit.helper.orjson', None):
+            results.append(decode_json(response))
+        return results
+
+    def test_bytes(self):
+        """
+        Test that bytes are decoded
+        """
+        for result in self.decode_all(self.build_response(self.CONTENT)):
+            self.assertEqual(result, self.CONTENT)
+
+    def test_memoryview(self):
+        """
+        Test that buffers are decoded
+        """
+        response = bytearray(self.build_response([self.CONTENT]))
+        for result in self.decode_all(memoryview(response)):
+            self.assertEqual(result, [self.CONTENT])
+
+    def test_str(self):
+        """
+        Test that str is decoded
+        """
+        response = self.build_response(self.CONTENT).decode('utf-8')
+        for result in self.decode_all(response):
+            self.assertEqual(result, self.CONTENT)
+        for result in self.decode_all('{"a": 1}'):
+            self.assertEqual(result, {'a': 1})
+
+    def test_whitespace(self):
+        """
+        Test that whitespace around the JSON is allowed
+        """
+        for result in self.decode_all(b")]}'\n[1, 2]\n"):
+            self.assertEqual(result, [1, 2])
+
+    def test_extra_data(self):
+        """
+        Test that trailing data raises
+        """
+        with mock.patch('gerrit.helper.orjson', None):
+            with self.assertRaises(ValueError):
+                decode_json(")]}'\n[1] [2]")
+        with self.assertRaises(ValueError):
+            decode_json(b")]}'\n[1] [2]")
+
+    def test_empty(self):
+        """
+        Test that a response without content raises
+        """
+        with mock.patch('gerrit.helper.orjson', None):
+            with self.assertRaises(ValueError):
+                decode_json(self.build_response())
+        with self.assertRaises(ValueError):
+            decode_json(self.build_response())
+
+
+class TestIterJson(GerritUnitTest):
+    """
+    Unit tests for incrementally parsing gerrit responses
+    """
+    CHANGES = [
+        {'id': 'gerritproject~master~I{:040d}'.format(number), 'subject': 'M\u00e4rz ' * number}
+        for number in range(20)
+    ] + [12345, 1.5, True, None, 'done']
+
+    @staticmethod
+    def chunked(content, size):
+        """
+        Split content into chunks of size bytes
+        """
+        return [content[index:index + size] for index in range(0, len(content), size)]
+
+    def test_array(self):
+        """
+        Test that the items of an array are yielded for any chunk size
+        """
+        content = self.build_response(self.CHANGES)
+        for size in (1, 2, 3, 7, 64, len(content)):
+            self.assertEqual(list(iter_json(self.chunked(content, size))), self.CHANGES)
+
+    def test_object(self):
+        """
+        Test that the members of an object are yielded as tuples
+        """
+        projects = {'platform/{}'.format(index): {'id': index} for index in range(10)}
+        content = self.build_response(projects)
+        for size in (1, 5, len(content)):
+            self.assertEqual(
+                list(iter_json(self.chunked(content, size))),
+                list(projects.items()),
+            )
+
+    def test_empty(self):
+        """
+        Test that empty containers yield nothing
+        """
+        self.assertEqual(list(iter_json([self.build_response([])])), [])
+        self.assertEqual(list(iter_json([b'{', b' }'])), [])
+
+    def test_lazy(self):
+        """
+        Test that an element is yielded before the rest is read
+        """
+        def chunks():
+            yield b")]}'\n[{\"id\": 1}, "
+            raise AssertionError('Read past the first element')
+
+        self.assertEqual(next(iter_json(chunks())), {'id': 1})
+
+    def test_split_numbers(self):
+        """
+        Test that numbers split at any offset are parsed whole
+        """
+        values = [1.5, -0.25, 1.5e3, 2E-1, -12.75e+10, 0, 100, True, 3.0, {'a': 6.5e-7}]
+        content = b'[1.5, -0.25, 1.5e3, 2E-1, -12.75e+10, 0, 100, true, 3.0, {"a": 6.5e-7}]'
+        for offset in range(1, len(content)):
+            chunks = [content[:offset], content[offset:]]
+            self.assertEqual(list(iter_json(chunks)), values)
+        self.assertEqual(list(iter_json([b'[1.', b'5]'])), [1.5])
+        self.assertEqual(list(iter_json([b'[1.5e', b'3]'])), [1500.0])
+        self.assertEqual(list(iter_json([b'[2E-', b'1]'])), [0.2])
+
+    def test_invalid(self):
+        """
+        Test that malformed responses raise
+        """
+        for content in (b'[1,', b'[1 2]', b'3', b'[1] x', b'', b'{"a" 1}', b'[1, 2'):
+            with self.assertRaises(ValueError):
+                list(iter_json([content]))
+
+    def test_iter_response(self):
+        """
+        Test that a streamed response is parsed and closed
+        """
+        response = mock.Mock()
+        response.iter_content.return_value = self.chunked(
+            (")]}'\n" + dumps(self.CHANGES)).encode('utf-8'),
+            10,
+        )
+        self.assertEqual(list(iter_response(response, chunk_size=10)), self.CHANGES)
+        response.iter_content.assert_called_once_with(10)
+        response.close.assert_called_once_with()
+
+
+class TestIterBase64(GerritUnitTest):
+    """
+    Unit tests for decoding base64 piece by piece
+    """
+    CONTENT = bytes(range(256)) * 3 + b'end'
+
+    def test_chunks(self):
+        """
+        Test that the content is decoded for any chunk size
+        """
+        encoded = base64.b64encode(self.CONTENT)
+        for size in (1, 2, 3, 4, 5, 7, 64, len(encoded)):
+            chunks = TestIterJson.chunked(encoded, size)
+            self.assertEqual(b''.join(iter_base64(chunks)), self.CONTENT)
+
+    def test_line_breaks(self):
+        """
+        Test that line breaks between the characters are skipped
+        """
+        encoded = base64.encodebytes(self.CONTENT).replace(b'\n', b'\r\n')
+        self.assertEqual(b''.join(iter_base64(TestIterJson.chunked(encoded, 7))), self.CONTENT)
+
+    def test_lazy(self):
+        """
+        Test that a piece is decoded before the rest is read
+        """
+        def chunks():
+            yield base64.b64encode(b'first piece')
+            raise AssertionError('Read past the first piece')
+
+        self.assertEqual(next(iter_base64(chunks())), b'first piece')
+
+    def test_invalid(self):
+        """
+        Test that malformed content raises
+        """
+        for chunks in ([b'YWJj', b'ZA='], [b'YW*j'], [b'YQ==YWJj']):
+            with self.assertRaises(ValueError):
+                list(iter_base64(chunks))
+
+
+class TestSharedValues(GerritUnitTest):
+    """
+    Unit tests for intern_str and shared_account
+    """
+
+    def test_intern_str(self):
+        """
+        Test that equal strings are interned and other values kept
+        """
+        self.assertIs(intern_str(''.join(['MER', 'GED'])), intern_str('MERGED'))
+        self.assertIsNone(intern_str(None))
+        self.assertEqual(intern_str(5), 5)
+
+    def test_shared_account(self):
+        """
+        Test that equal accounts share a dict and changed ones replace it
+        """
+        first = shared_account({'_account_id': 7, 'name': 'John Doe'})
+        self.assertIs(shared_account({'_account_id': 7, 'name': 'John Doe'}), first)
+
+        renamed = shared_account({'_account_id': 7, 'name': 'Jane Doe'})
+        self.assertEqual(renamed['name'], 'Jane Doe')
+        self.assertIs(shared_account({'_account_id': 7, 'name': 'Jane Doe'}), renamed)
+
+    def test_shared_account_without_id(self):
+        """
+        Test that accounts without an id and missing accounts are kept
+        """
+        account = {'name': 'John Doe'}
+        self.assertIs(shared_account(account), account)
+        self.assertIsNone(shared_account(None))
+
+
+class TestEndpointTemplate(GerritUnitTest):
+    """
+    Unit tests for removing ids from endpoints
+    """
+    def test_str(self):
+        """
+        Test that ids following a collection are replaced
+        """
+        self.assertEqual(
+            endpoint_template('/a/changes/{}/reviewers/{}'.format(self.CHANGE_ID, self.USER)),
+            '/a/changes/{id}/reviewers/{id}',
+        )
+        self.assertEqual(
+            endpoint_template('/a/changes/{}/revisions/current/review'.format(self.CHANGE_ID)),
+            '/a/changes/{id}/revisions/{id}/review',
+        )
+        self.assertEqual(endpoint_template('/a/changes/'), '/a/changes/')
+
+    def test_nested_project(self):
+        """
+        Test that a nested project name is a single id, quoted or not
+        """
+        self.assertEqual(endpoint_template('/a/projects/platform/foo/'), '/a/projects/{id}/')
+        self.assertEqual(endpoint_template('/a/projects/platform/foo'), '/a/projects/{id}')
+        self.assertEqual(
+            endpoint_template('/a/projects/platform/sub/foo/branches/stable'),
+            '/a/projects/{id}/branches/{id}',
+        )
+        self.assertEqual(
+            endpoint_template('/a/projects/platform%2Ffoo/HEAD'),
+            '/a/projects/{id}/HEAD',
+        )
+
+    def test_query(self):
+        """
+        Test that the query string is dropped
+        """
+        self.assertEqual(endpoint_template('/a/changes/?q=status%3Aopen&n=25'), '/a/changes/')
+
+    def test_dict(self):
+        """
+        Test that the data of a dict endpoint is replaced
+        """
+        self.assertEqual(
+            endpoint_template({'pre': '/a/changes/', 'data': self.FULL_ID}),
+            '/a/changes/{id}/',
+        )
+        self.assertEqual(
+            endpoint_template({'pre': '/a/changes/', 'data': self.FULL_ID, 'post': '/submit/'}),
+            '/a/changes/{id}/submit/',
+        )
+        self.assertEqual(
+            endpoint_template({'pre': '/a/changes/', 'data': self.FULL_ID, 'post': '/?o=LABELS'}),
+            '/a/changes/{id}/',
+        )
+
+
 class TestProcessEndpoint(GerritUnitTest):
     """
     Unit tests for endpoint processing
@@ -0,0 +1,117 @@
+"""
+Unit tests for gerrit.identity
+"""
+import gc
+import mock
+from gerrit.changes.change import Change
+from gerrit.identity import (
+    CHANGES,
+    PROJECTS,
+    IdentityMap,
+    identity_key,
+)
+from gerrit.projects.project import Project
+from tests import GerritUnitTest
+
+
+class IdentityMapTestCase(GerritUnitTest):
+    """
+    Unit tests for the identity map
+    """
+    def setUp(self):
+        self.gerrit_con = mock.Mock()
+
+    def project(self, **project_info):
+        """
+        Build a project from a ProjectInfo
+        """
+        project = Project(self.gerrit_con)
+        return project._populate(project_info)  # pylint: disable=protected-access
+
+    def change(self, **change_info):
+        """
+        Build a change from a ChangeInfo
+        """
+        change = Change(self.gerrit_con)
+        return change._populate(change_info)  # pylint: disable=protected-access
+
+    def test_identity_key(self):
+        """
+        Test that projects are keyed on name and changes on full id
+        """
+        self.assertEqual(
+            identity_key(self.project(name=self.PROJECT)),
+            (PROJECTS, self.PROJECT),
+        )
+        self.assertEqual(
+            identity_key(self.change(id=self.FULL_ID_QUOTED)),
+            (CHANGES, self.FULL_ID),
+        )
+        with self.assertRaises(TypeError):
+            identity_key(object())
+
+    def test_intern_returns_canonical(self):
+        """
+        Test that the first instance stays canonical and is updated in place
+        """
+        identity_map = IdentityMap()
+        first = identity_map.intern(self.change(id=self.FULL_ID, status='NEW', owner=self.OWNER))
+        second = identity_map.intern(self.change(id=self.FULL_ID, status='MERGED'))
+        self.assertIs(first, second)
+        self.assertEqual(first.status, 'MERGED')
+        self.assertIsNone(first.owner)
+        self.assertIs(identity_map.get(CHANGES, self.FULL_ID), first)
+        self.assertEqual(len(identity_map), 1)
+
+    def test_intern_without_key(self):
+        """
+        Test that instances without a key are not interned
+        """
+        identity_map = IdentityMap()
+        project = self.project()
+        self.assertIs(identity_map.intern(project), project)
+        self.assertEqual(len(identity_map), 0)
+
+    def test_weak_references(self):
+        """
+        Test that the map doesn't keep instances alive
+        """
+        identity_map = IdentityMap()
+        identity_map.intern(self.project(name=self.PROJECT))
+        gc.collect()
+        self.assertIsNone(identity_map.get(PROJECTS, self.PROJECT))
+        self.assertEqual(len(identity_map), 0)
+
+    def test_get_fresh(self):
+        """
+        Test that instances are only fresh within the ttl
+        """
+        project = self.project(name=self.PROJECT)
+        with mock.patch('gerrit.identity.time.monotonic', return_value=100.0) as monotonic:
+            identity_map = IdentityMap(ttl=10)
+            identity_map.intern(project)
+            monotonic.return_value = 105.0
+            self.assertIs(identity_map.get_fresh(PROJECTS, self.PROJECT), project)
+            monotonic.return_value = 111.0
+            self.assertIsNone(identity_map.get_fresh(PROJECTS, self.PROJECT))
+            self.assertIs(identity_map.get(PROJECTS, self.PROJECT), project)
+
+    def test_get_fresh_without_ttl(self):
+        """
+        Test that nothing is fresh without a ttl
+        """
+        project = self.project(name=self.PROJECT)
+        identity_map = IdentityMap()
+        identity_map.intern(project)
+        self.assertIsNone(identity_map.get_fresh(PROJECTS, self.PROJECT))
+
+    def test_discard(self):
+        """
+        Test that an instance can be forgotten
+        """
+        project = self.project(name=self.PROJECT)
+        identity_map = IdentityMap()
+        identity_map.intern(project)
+        identity_map.discard(PROJECTS, self.PROJECT)
+        self.assertIsNone(identity_map.get(PROJECTS, self.PROJECT))
+        self.assertIsNot(identity_map.intern(self.project(name=self.PROJECT)), project)
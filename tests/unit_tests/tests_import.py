@@ -0,0 +1,59 @@
+"""
+Unit tests for the lazy imports of the gerrit package
+"""
+import json
+import subprocess
+import sys
+from tests import GerritUnitTest
+
+
+def loaded_modules(statement):
+    """
+    The modules loaded by statement in a fresh interpreter
+    """
+    output = subprocess.run(
+        [sys.executable, '-c', '%s\nimport sys, json\nprint(json.dumps(sorted(sys.modules)))' %
+         statement],
+        stdout=subprocess.PIPE,
+        check=True,
+    ).stdout
+    return set(json.loads(output))
+
+
+class LazyImportTestCase(GerritUnitTest):
+    """
+    Unit tests guarding the import time of the package
+    """
+    def test_import_package(self):
+        """
+        Test that importing the package doesn't load the HTTP stack or the models
+        """
+        modules = loaded_modules('import gerrit')
+        for name in ('requests', 'gerrit.gerrit', 'gerrit.changes.change', 'asyncio'):
+            self.assertNotIn(name, modules)
+
+    def test_import_gerrit(self):
+        """
+        Test that the models, the cache and asyncio are loaded on first use
+        """
+        modules = loaded_modules('from gerrit import Gerrit')
+        self.assertIn('requests', modules)
+        for name in ('gerrit.changes.change', 'gerrit.projects.project', 'gerrit.cache',
+                     'gerrit.identity', 'asyncio', 'sqlite3'):
+            self.assertNotIn(name, modules)
+
+    def test_lazy_attributes(self):
+        """
+        Test that the lazy attributes resolve to the classes
+        """
+        # pylint: disable=import-outside-toplevel
+        import gerrit
+        import gerrit.aio
+        from gerrit.gerrit import Gerrit
+        from gerrit.aio.gerrit import AsyncGerrit
+
+        self.assertIs(gerrit.Gerrit, Gerrit)
+        self.assertIs(gerrit.aio.AsyncGerrit, AsyncGerrit)
+        self.assertIn('Gerrit', dir(gerrit))
+        with self.assertRaises(AttributeError):
+            gerrit.Missing  # pylint: disable=pointless-statement
@@ -0,0 +1,84 @@
+"""
+Unit tests for gerrit.metrics
+"""
+import mock
+from gerrit.gerrit import Gerrit
+from gerrit.metrics import CallMetrics
+from tests import GerritUnitTest
+
+
+class CallMetricsTestCase(GerritUnitTest):
+    """
+    Unit tests for collecting call metrics
+    """
+    def setUp(self):
+        self.metrics = CallMetrics(buckets=(0.1, 1.0))
+        self.metrics.observe('get', '/a/changes/{id}/', 200, 100, 0.05)
+        self.metrics.observe('get', '/a/changes/{id}/', 404, 10, 0.5)
+        self.metrics.observe('get', '/a/changes/{id}/', None, None, 3.0)
+        self.metrics.observe('post', '/a/changes/{id}/submit/', 200, 5, 0.2)
+
+    def test_as_dict(self):
+        """
+        Test that calls are counted per request type and endpoint
+        """
+        result = self.metrics.as_dict()
+        self.assertEqual(
+            sorted(result),
+            ['GET /a/changes/{id}/', 'POST /a/changes/{id}/submit/'],
+        )
+        stats = result['GET /a/changes/{id}/']
+        self.assertEqual(stats['count'], 3)
+        self.assertEqual(stats['errors'], 2)
+        self.assertEqual(stats['bytes'], 110)
+        self.assertAlmostEqual(stats['sum'], 3.55)
+        self.assertEqual(stats['buckets'], {0.1: 1, 1.0: 2, float('inf'): 3})
+        self.assertEqual(stats['statuses'], {200: 1, 404: 1, None: 1})
+
+    def test_prometheus(self):
+        """
+        Test that the metrics are exported in the Prometheus text format
+        """
+        text = self.metrics.prometheus()
+        labels = 'method="GET",endpoint="/a/changes/{id}/"'
+        self.assertIn('# TYPE gerrit_client_request_duration_seconds histogram\n', text)
+        self.assertIn(
+            'gerrit_client_request_duration_seconds_bucket{%s,le="0.1"} 1\n' % labels,
+            text,
+        )
+        self.assertIn(
+            'gerrit_client_request_duration_seconds_bucket{%s,le="+Inf"} 3\n' % labels,
+            text,
+        )
+        self.assertIn('gerrit_client_request_duration_seconds_count{%s} 3\n' % labels, text)
+        self.assertIn('gerrit_client_requests_total{%s,status="error"} 1\n' % labels, text)
+        self.assertIn('gerrit_client_requests_total{%s,status="404"} 1\n' % labels, text)
+        self.assertIn('gerrit_client_response_bytes_total{%s} 110\n' % labels, text)
+
+    def test_reset(self):
+        """
+        Test that the metrics can be reset
+        """
+        self.metrics.reset()
+        self.assertEqual(self.metrics.as_dict(), {})
+
+    def test_install(self):
+        """
+        Test that calls of a connection are recorded once installed
+        """
+        metrics = CallMetrics()
+        with mock.patch('gerrit.gerrit.requests.Session.get') as mock_get:
+            mock_get.return_value = mock.Mock(status_code=200, content=b'12345')
+            reference = Gerrit(url=self.URL, auth_id=self.USERNAME, auth_pw=self.PASSWORD)
+            metrics.install(reference)
+            reference.call(r_endpoint={'pre': '/a/changes/', 'data': self.FULL_ID})
+            reference.call(r_endpoint='/a/changes/{}/reviewers/'.format(self.CHANGE_ID))
+            metrics.uninstall(reference)
+            reference.call(r_endpoint='/a/projects/{}/'.format(self.PROJECT))
+
+        result = metrics.as_dict()
+        self.assertEqual(
+            sorted(result),
+            ['GET /a/changes/{id}/', 'GET /a/changes/{id}/reviewers/'],
+        )
+        self.assertEqual(result['GET /a/changes/{id}/']['bytes'], 5)
@@ -37,37 +37,52 @@ class ProjectTestCase(GerritUnitTest):
         Test that a project can be created
         """
         self.req.status_code = 201
+        self.req.content = self.project_content
         with mock.patch.object(Project, 'get_project') as mock_get_project:
             project = Project(self.gerrit_con)
-            project.create_project(
+            project = project.create_project(
                 self.PROJECT,
                 {'description': self.DESCRIPTION},
             )
-            self.gerrit_con.call.assert_called_with(
+            self.gerrit_con.call.assert_called_once_with(
                 request='put',
                 r_payload={'description': self.DESCRIPTION},
                 r_endpoint='/a/projects/{}'.format(self.PROJECT),
             )
-            mock_get_project.assert_called_with(self.PROJECT)
+            mock_get_project.assert_not_called()
+        self.assertEqual(project.name, self.PROJECT)
+        self.assertEqual(project.parent, self.PARENT)
+        self.assertEqual(project.description, self.DESCRIPTION)
+        self.assertEqual(project.state, self.STATE)
 
-    def test_create_without_options(self):
+    def test_create_refresh(self):
         """
-        Test that a project can be created without options
+        Test that a created project can be fetched again
         """
         self.req.status_code = 201
+        self.req.content = self.project_content
         with mock.patch.object(Project, 'get_project') as mock_get_project:
             project = Project(self.gerrit_con)
-            project.create_project(
-                self.PROJECT,
-                None,
-            )
-            self.gerrit_con.call.assert_called_with(
-                request='put',
-                r_payload={},
-                r_endpoint='/a/projects/{}'.format(self.PROJECT),
-            )
+            project.create_project(self.PROJECT, None, refresh=True)
             mock_get_project.assert_called_with(self.PROJECT)
 
+    def test_create_without_options(self):
+        """
+        Test that a project can be created without options
+        """
+        self.req.status_code = 201
+        self.req.content = self.project_content
+        project = Project(self.gerrit_con)
+        project.create_project(
+            self.PROJECT,
+            None,
+        )
+        self.gerrit_con.call.assert_called_with(
+            request='put',
+            r_payload={},
+            r_endpoint='/a/projects/{}'.format(self.PROJECT),
+        )
+
     def test_create_exists(self):
         """
         Test that it raises if you try to create a project that already exists
@@ -102,6 +117,26 @@ class ProjectTestCase(GerritUnitTest):
         self.assertEqual(project.branches, None)
         self.assertEqual(project.web_links, None)
 
+    def test_get_nested_fields(self):
+        """
+        Test that nested fields are populated
+        """
+        self.req.content = self.build_response(
+            {
+                'name': self.PROJECT,
+                'branches': {'master': '49976b089d4e4bb1ab53cd5f5b0fc2b5e6a2b9f1'},
+                'web_links': [{'name': 'gitweb', 'url': 'gitweb?p=gerritproject.git'}],
+            }
+        )
+
+        project = Project(self.gerrit_con).get_project(self.PROJECT)
+        self.assertFalse(hasattr(project, '__dict__'))
+        self.assertEqual(
+            project.branches,
+            {'master': '49976b089d4e4bb1ab53cd5f5b0fc2b5e6a2b9f1'},
+        )
+        self.assertEqual(project.web_links[0]['name'], 'gitweb')
+
     def test_get_raises_on_empty_name(self):
         """
         Test that it raises if an empty project name is specified
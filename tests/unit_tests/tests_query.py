@@ -0,0 +1,207 @@
+"""
+Unit tests for gerrit.changes.query
+"""
+import time
+import mock
+from gerrit.error import UnhandledError
+from gerrit.changes.change import Change
+from gerrit.changes.query import Query
+from gerrit.projects.project import Project
+from tests import GerritUnitTest
+
+
+class QueryTestCase(GerritUnitTest):
+    """
+    Unit tests for searching changes
+    """
+    def setUp(self):
+        self.req = mock.Mock()
+        self.req.status_code = 200
+        self.req.content = self.build_response([])
+        self.gerrit_con = mock.Mock()
+        self.gerrit_con.call.return_value = self.req
+
+    def change_info(self, number, **kwargs):
+        """
+        Build a ChangeInfo for a change in the default project
+        """
+        change_info = {
+            'id': '{}~{}~I{:040d}'.format(self.PROJECT, self.BRANCH, number),
+            'project': self.PROJECT,
+            'branch': self.BRANCH,
+            'change_id': 'I{:040d}'.format(number),
+            '_number': number,
+        }
+        change_info.update(kwargs)
+        return change_info
+
+    def test_query_changes(self):
+        """
+        Test that a query returns populated changes
+        """
+        self.req.content = self.build_response([self.change_info(1), self.change_info(2)])
+        changes = Query(self.gerrit_con).query_changes('status:open', ['LABELS'])
+        self.assertEqual([change.number for change in changes], [1, 2])
+        self.assertIsInstance(changes[0], Change)
+        self.assertEqual(changes[0].project, self.PROJECT)
+        self.gerrit_con.call.assert_called_once_with(
+            r_endpoint='/a/changes/?q=status%3Aopen&o=LABELS',
+        )
+
+    def test_query_changes_more(self):
+        """
+        Test that all pages of a query are fetched
+        """
+        first = mock.Mock(status_code=200, content=self.build_response(
+            [self.change_info(1), self.change_info(2, _more_changes=True)]
+        ))
+        second = mock.Mock(status_code=200, content=self.build_response(
+            [self.change_info(3)]
+        ))
+        self.gerrit_con.call.side_effect = [first, second]
+        changes = Query(self.gerrit_con).query_changes('status:open')
+        self.assertEqual([change.number for change in changes], [1, 2, 3])
+        self.gerrit_con.call.assert_called_with(
+            r_endpoint='/a/changes/?q=status%3Aopen&S=2',
+        )
+
+    def test_query_changes_bad_query(self):
+        """
+        Test that an invalid query raises
+        """
+        self.req.status_code = 400
+        self.req.content = b'bad query'
+        with self.assertRaises(ValueError):
+            Query(self.gerrit_con).query_changes('status:')
+
+    def test_query_changes_unhandled_error(self):
+        """
+        Test that an unhandled error raises
+        """
+        self.req.status_code = 503
+        with self.assertRaises(UnhandledError):
+            Query(self.gerrit_con).query_changes('status:open')
+
+    def pages(self, *sizes):
+        """
+        Set up the connection to return pages of the given sizes
+        """
+        responses = []
+        number = 0
+        for index, size in enumerate(sizes):
+            page = []
+            for _ in range(size):
+                number += 1
+                page.append(self.change_info(number))
+            if index < len(sizes) - 1:
+                page[-1]['_more_changes'] = True
+            responses.append(mock.Mock(status_code=200, content=self.build_response(page)))
+        self.gerrit_con.call.side_effect = responses
+
+    def test_iter_changes(self):
+        """
+        Test that all pages are iterated over
+        """
+        self.pages(2, 2, 1)
+        changes = Query(self.gerrit_con).iter_changes('status:open', page_size=2)
+        self.assertEqual([change.number for change in changes], [1, 2, 3, 4, 5])
+        self.assertEqual(
+            [call[1]['r_endpoint'] for call in self.gerrit_con.call.call_args_list],
+            [
+                '/a/changes/?q=status%3Aopen&n=2',
+                '/a/changes/?q=status%3Aopen&S=2&n=2',
+                '/a/changes/?q=status%3Aopen&S=4&n=2',
+            ],
+        )
+
+    def test_iter_changes_is_lazy(self):
+        """
+        Test that nothing is fetched before the iteration starts and that
+        the next page is not fetched without prefetch
+        """
+        self.pages(2, 2)
+        changes = Query(self.gerrit_con).iter_changes(
+            'status:open',
+            page_size=2,
+            prefetch=False,
+        )
+        self.gerrit_con.call.assert_not_called()
+        self.assertEqual(next(changes).number, 1)
+        self.assertEqual(self.gerrit_con.call.call_count, 1)
+        self.assertEqual([change.number for change in changes], [2, 3, 4])
+
+    def test_iter_changes_prefetch(self):
+        """
+        Test that the next page is fetched while the current is consumed
+        """
+        self.pages(2, 2)
+        changes = Query(self.gerrit_con).iter_changes('status:open', page_size=2)
+        self.assertEqual(next(changes).number, 1)
+        deadline = time.time() + 5
+        while self.gerrit_con.call.call_count < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.gerrit_con.call.call_count, 2)
+        self.assertEqual([change.number for change in changes], [2, 3, 4])
+
+    def test_iter_changes_empty(self):
+        """
+        Test that a query without results yields nothing
+        """
+        self.assertEqual(list(Query(self.gerrit_con).iter_changes('status:open')), [])
+
+    def test_get_changes(self):
+        """
+        Test that many changes are fetched with one OR-ed query
+        """
+        self.req.content = self.build_response([self.change_info(2), self.change_info(1)])
+        changes = Query(self.gerrit_con).get_changes([
+            1,
+            (Project(self.gerrit_con), 'I{:040d}'.format(2)),
+            'I{:040d}'.format(3),
+        ])
+        self.assertEqual([change.number for change in changes], [1])
+        self.assertEqual(self.gerrit_con.call.call_count, 1)
+
+    def test_get_changes_order(self):
+        """
+        Test that changes are returned in the requested order
+        """
+        self.req.content = self.build_response([self.change_info(2), self.change_info(1)])
+        changes = Query(self.gerrit_con).get_changes([
+            (self.PROJECT, 'I{:040d}'.format(1), self.BRANCH),
+            (self.PROJECT, 'I{:040d}'.format(2)),
+        ])
+        self.assertEqual([change.number for change in changes], [1, 2])
+        query = self.gerrit_con.call.call_args[1]['r_endpoint']
+        self.assertIn('project%3A%22{}%22'.format(self.PROJECT), query)
+        self.assertIn('+OR+', query)
+
+    def test_get_changes_chunked(self):
+        """
+        Test that the ids are split over requests that fit the URL limit
+        """
+        numbers = list(range(1, 201))
+        changes = Query(self.gerrit_con).get_changes(numbers, max_url_length=200)
+        self.assertEqual(changes, [])
+        self.assertGreater(self.gerrit_con.call.call_count, 1)
+        sent = []
+        for call in self.gerrit_con.call.call_args_list:
+            endpoint = call[1]['r_endpoint']
+            self.assertLessEqual(len(endpoint), 200)
+            sent.extend(endpoint.split('%3A')[1:])
+        self.assertEqual(len(sent), len(numbers))
+
+    def test_chunk_terms_fill(self):
+        """
+        Test that each query is as long as fits the URL limit
+        """
+        query = Query(self.gerrit_con)
+        terms = ['(project:"a b/c" change:I{:040d})'.format(index) for index in range(50)]
+        for limit in (150, 300, 1000):
+            chunks = list(query._chunk_terms(terms, ['LABELS'], limit))  # pylint: disable=protected-access
+            self.assertEqual(' OR '.join(chunks), ' OR '.join(terms))
+            for index, chunk in enumerate(chunks):
+                self.assertLessEqual(len(query._query_endpoint(chunk, ['LABELS'])), limit)  # pylint: disable=protected-access
+                if index + 1 < len(chunks):
+                    longer = chunk + ' OR ' + chunks[index + 1].split(' OR ')[0]
+                    self.assertGreater(len(query._query_endpoint(longer, ['LABELS'])), limit)  # pylint: disable=protected-access
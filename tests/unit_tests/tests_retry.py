@@ -0,0 +1,214 @@
+"""
+Unit tests for gerrit.retry
+"""
+import email.utils
+import threading
+import time
+import mock
+import requests
+import urllib3
+from gerrit.gerrit import Gerrit
+from gerrit.retry import (
+    Retry,
+    TokenBucket,
+    parse_retry_after,
+)
+from tests import GerritUnitTest
+
+
+class RetryTestCase(GerritUnitTest):
+    """
+    Unit tests for the retry policy
+    """
+    def test_parse_retry_after(self):
+        """
+        Test that both forms of Retry-After are parsed
+        """
+        self.assertEqual(parse_retry_after('120'), 120)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+        date = email.utils.formatdate(time.time() + 30, usegmt=True)
+        self.assertAlmostEqual(parse_retry_after(date), 30, delta=2)
+        date = email.utils.formatdate(time.time() - 30, usegmt=True)
+        self.assertEqual(parse_retry_after(date), 0)
+
+    def test_can_retry(self):
+        """
+        Test that only idempotent requests are retried, and writes only
+        when they weren't processed
+        """
+        retry = Retry(total=2)
+        self.assertTrue(retry.can_retry('get', 0))
+        self.assertFalse(retry.can_retry('delete', 1))
+        self.assertTrue(retry.can_retry('delete', 1, sent=False))
+        self.assertTrue(retry.can_retry('put', 0, sent=False))
+        self.assertFalse(retry.can_retry('get', 2))
+        self.assertFalse(retry.can_retry('get', 2, sent=False))
+        self.assertFalse(retry.can_retry('post', 0))
+        self.assertFalse(retry.can_retry('post', 0, sent=False))
+
+    def test_backoff(self):
+        """
+        Test that the backoff is jittered and capped
+        """
+        retry = Retry(backoff_factor=1, backoff_max=5)
+        for attempt in range(10):
+            wait = retry.backoff(attempt)
+            self.assertGreaterEqual(wait, 0)
+            self.assertLessEqual(wait, min(5, 2 ** attempt))
+
+    def test_wait_time(self):
+        """
+        Test that Retry-After is honored up to a limit
+        """
+        retry = Retry(backoff_max=1, retry_after_max=60)
+        self.assertEqual(retry.wait_time(0, mock.Mock(headers={'Retry-After': '7'})), 7)
+        self.assertEqual(retry.wait_time(0, mock.Mock(headers={'Retry-After': '600'})), 60)
+        self.assertLessEqual(retry.wait_time(0, mock.Mock(headers={})), 1)
+
+
+class TokenBucketTestCase(GerritUnitTest):
+    """
+    Unit tests for the rate limiter
+    """
+    def test_burst(self):
+        """
+        Test that a burst up to the capacity doesn't wait
+        """
+        bucket = TokenBucket(rate=10, capacity=5)
+        with mock.patch('gerrit.retry.time.sleep') as mock_sleep:
+            for _ in range(5):
+                self.assertEqual(bucket.acquire(), 0)
+            mock_sleep.assert_not_called()
+            self.assertAlmostEqual(bucket.acquire(), 0.1, delta=0.02)
+            self.assertAlmostEqual(bucket.acquire(), 0.2, delta=0.02)
+
+    def test_threads(self):
+        """
+        Test that the rate is kept when the bucket is shared by threads
+        """
+        bucket = TokenBucket(rate=200, capacity=1)
+        start = time.monotonic()
+        threads = [
+            threading.Thread(target=lambda: [bucket.acquire() for _ in range(5)])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreaterEqual(time.monotonic() - start, 19 / 200.0)
+
+
+class GerritRetryTestCase(GerritUnitTest):
+    """
+    Unit tests for retrying requests of a Gerrit connection
+    """
+    def setUp(self):
+        self.mock_sleep = mock.patch('gerrit.gerrit.time.sleep').start()
+        self.mock_get = mock.patch('gerrit.gerrit.requests.Session.get').start()
+        self.mock_post = mock.patch('gerrit.gerrit.requests.Session.post').start()
+        self.addCleanup(mock.patch.stopall)
+        self.ok = mock.Mock(status_code=200, headers={})
+        self.unavailable = mock.Mock(status_code=503, headers={'Retry-After': '3'})
+        self.reference = Gerrit(
+            url=self.URL,
+            auth_id=self.USERNAME,
+            auth_pw=self.PASSWORD,
+            timeout=(1, 2),
+            retry=Retry(total=2),
+        )
+
+    def test_retry_status(self):
+        """
+        Test that an unavailable server is retried after Retry-After
+        """
+        self.mock_get.side_effect = [self.unavailable, self.ok]
+        self.assertIs(self.reference.call(r_endpoint='/a/projects/'), self.ok)
+        self.assertEqual(self.mock_get.call_count, 2)
+        self.mock_sleep.assert_called_once_with(3)
+        self.unavailable.close.assert_called_once_with()
+        self.assertEqual(self.mock_get.call_args[1]['timeout'], (1, 2))
+
+    def test_retry_exhausted(self):
+        """
+        Test that the last response is returned once retries run out
+        """
+        self.mock_get.return_value = self.unavailable
+        self.assertIs(self.reference.call(r_endpoint='/a/projects/'), self.unavailable)
+        self.assertEqual(self.mock_get.call_count, 3)
+
+    def test_retry_connection_error(self):
+        """
+        Test that dropped connections are retried
+        """
+        self.mock_get.side_effect = [requests.ConnectionError, requests.Timeout, self.ok]
+        self.assertIs(self.reference.call(r_endpoint='/a/projects/'), self.ok)
+        self.assertEqual(self.mock_sleep.call_count, 2)
+
+        self.mock_get.side_effect = requests.ConnectionError
+        with self.assertRaises(requests.ConnectionError):
+            self.reference.call(r_endpoint='/a/projects/')
+
+    def test_post_not_retried(self):
+        """
+        Test that requests that aren't idempotent are not retried
+        """
+        self.mock_post.return_value = self.unavailable
+        self.assertIs(
+            self.reference.call(request='post', r_endpoint='/a/changes/'),
+            self.unavailable,
+        )
+        self.mock_post.side_effect = requests.ConnectionError
+        with self.assertRaises(requests.ConnectionError):
+            self.reference.call(request='post', r_endpoint='/a/changes/')
+        self.assertEqual(self.mock_post.call_count, 2)
+        self.mock_sleep.assert_not_called()
+
+    def test_put_retried_unsent(self):
+        """
+        Test that writes are only retried when gerrit didn't process them
+        """
+        too_many = mock.Mock(status_code=429, headers={'Retry-After': '1'})
+        with mock.patch('gerrit.gerrit.requests.Session.put') as mock_put:
+            mock_put.side_effect = [self.unavailable, too_many, self.ok]
+            self.assertIs(
+                self.reference.call(request='put', r_endpoint='/a/projects/foo'),
+                self.unavailable,
+            )
+            self.assertIs(
+                self.reference.call(request='put', r_endpoint='/a/projects/foo'),
+                self.ok,
+            )
+            self.assertEqual(mock_put.call_count, 3)
+
+            refused = requests.ConnectionError(urllib3.exceptions.MaxRetryError(
+                None,
+                '/a/projects/foo',
+                urllib3.exceptions.NewConnectionError(None, 'refused'),
+            ))
+            mock_put.side_effect = [refused, requests.ConnectTimeout, self.ok]
+            self.assertIs(
+                self.reference.call(request='put', r_endpoint='/a/projects/foo'),
+                self.ok,
+            )
+
+            mock_put.side_effect = requests.ReadTimeout
+            with self.assertRaises(requests.ReadTimeout):
+                self.reference.call(request='put', r_endpoint='/a/projects/foo')
+            self.assertEqual(mock_put.call_count, 7)
+
+    def test_rate_limiter(self):
+        """
+        Test that every attempt takes a token
+        """
+        rate_limiter = mock.Mock()
+        reference = Gerrit(
+            url=self.URL,
+            auth_id=self.USERNAME,
+            auth_pw=self.PASSWORD,
+            rate_limiter=rate_limiter,
+        )
+        self.mock_get.side_effect = [self.unavailable, self.ok]
+        reference.call(r_endpoint='/a/projects/')
+        self.assertEqual(rate_limiter.acquire.call_count, 2)
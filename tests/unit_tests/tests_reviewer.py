@@ -62,6 +62,85 @@ class ReviewerTestCase(GerritUnitTest):
         with self.assertRaises(UnhandledError):
             reviewer.add_reviewer(self.USER)
 
+    def test_add_many(self):
+        """
+        Test that many reviewers are added with per account results
+        """
+        def call(r_payload, **_):
+            req = mock.Mock()
+            if r_payload['reviewer'] == 'unknown':
+                req.content = self.build_response(
+                    'unknown does not identify a registered user or group'
+                )
+            elif r_payload['reviewer'] == 'existing':
+                req.content = self.build_response({"reviewers": []})
+            else:
+                req.content = self.build_response({"reviewers": [r_payload['reviewer']]})
+            return req
+
+        self.gerrit_con.call.side_effect = call
+
+        reviewer = Reviewer(self.gerrit_con, self.CHANGE_ID)
+        result = reviewer.add_reviewers([self.USER, 'unknown', 'existing'], max_workers=2)
+        self.assertEqual(list(result), [self.USER, 'unknown', 'existing'])
+        self.assertTrue(result[self.USER])
+        self.assertIsInstance(result['unknown'], LookupError)
+        self.assertIsInstance(result['existing'], AlreadyExists)
+        self.assertEqual(self.gerrit_con.call.call_count, 3)
+
+    def test_add_many_single_request(self):
+        """
+        Test that many reviewers can be added with one review request
+        """
+        self.req.status_code = 200
+        self.req.content = self.build_response({
+            "reviewers": {
+                self.USER: {"input": self.USER, "reviewers": [{"_account_id": 1}]},
+                "existing": {"input": "existing"},
+            }
+        })
+
+        reviewer = Reviewer(self.gerrit_con, self.CHANGE_ID)
+        result = reviewer.add_reviewers([self.USER, 'existing'], single_request=True)
+        self.assertTrue(result[self.USER])
+        self.assertIsInstance(result['existing'], AlreadyExists)
+        self.gerrit_con.call.assert_called_once_with(
+            request='post',
+            r_endpoint='/a/changes/{}/revisions/current/review'.format(self.CHANGE_ID),
+            r_payload={'reviewers': [{'reviewer': self.USER}, {'reviewer': 'existing'}]},
+        )
+
+    def test_add_many_single_request_rejected(self):
+        """
+        Test that every account fails if gerrit rejects the review
+        """
+        self.req.status_code = 400
+        self.req.content = self.build_response({
+            "reviewers": {
+                self.USER: {"input": self.USER, "reviewers": [{"_account_id": 1}]},
+                "unknown": {
+                    "input": "unknown",
+                    "error": "unknown does not identify a registered user or group",
+                },
+            }
+        })
+
+        reviewer = Reviewer(self.gerrit_con, self.CHANGE_ID)
+        result = reviewer.add_reviewers([self.USER, 'unknown'], single_request=True)
+        self.assertIsInstance(result[self.USER], UnhandledError)
+        self.assertIsInstance(result['unknown'], LookupError)
+
+    def test_add_many_single_request_unhandled(self):
+        """
+        Test that every account fails if gerrit returns an unknown content
+        """
+        self.req.status_code = 500
+        self.req.content = b'Internal server error'
+
+        reviewer = Reviewer(self.gerrit_con, self.CHANGE_ID)
+        result = reviewer.add_reviewers([self.USER], single_request=True)
+        self.assertIsInstance(result[self.USER], UnhandledError)
+
     def test_delete_unauthorized(self):
         """
         Test that it raises when deleting a reviewer is not permitted
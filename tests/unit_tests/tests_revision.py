@@ -1,7 +1,14 @@
 """
 Unit tests for gerrit.changes.revision
 """
+import base64
+import io
+import os
+import shutil
+import tempfile
+import tracemalloc
 import mock
+from gerrit.cache import ContentCache, MemoryCache
 from gerrit.error import UnhandledError
 from gerrit.changes.revision import Revision
 from tests import GerritUnitTest
@@ -80,3 +87,218 @@ class RevisionTestCase(GerritUnitTest):
             r_payload={},
             request='post'
         )
+
+
+class RevisionReadTestCase(GerritUnitTest):
+    """
+    Unit tests for reading revisions through the content cache
+    """
+    SHA = '0123456789abcdef0123456789abcdef01234567'
+
+    def setUp(self):
+        self.gerrit_con = mock.Mock()
+        self.gerrit_con.call.side_effect = self.call
+        self.cache = ContentCache(MemoryCache(), 'scope')
+        self.patch = b'From 0123 Mon Sep 17 00:00:00 2001\n'
+
+    def call(self, r_endpoint):
+        """
+        Answer like gerrit would
+        """
+        view = r_endpoint.split('/revisions/', 1)[1].split('/', 1)[1]
+        if view == 'commit':
+            content = self.build_response({'commit': self.SHA, 'subject': self.SUBJECT})
+        elif view == 'files/':
+            content = self.build_response({'README.md': {'lines_inserted': 1}})
+        elif view == 'files/docs%2Findex.rst/diff':
+            content = self.build_response({'change_type': 'MODIFIED'})
+        elif view == 'patch':
+            content = base64.b64encode(self.patch)
+        else:
+            return mock.Mock(status_code=404, content=b'Not found')
+        return mock.Mock(status_code=200, content=content)
+
+    def endpoints(self):
+        """
+        The endpoints that were called
+        """
+        return [call[1]['r_endpoint'] for call in self.gerrit_con.call.call_args_list]
+
+    def test_read_without_cache(self):
+        """
+        Test that every read is a request when there is no cache
+        """
+        revision = Revision(self.gerrit_con, self.CHANGE_ID, None)
+        self.assertEqual(revision.get_files(), {'README.md': {'lines_inserted': 1}})
+        self.assertEqual(revision.get_files(), {'README.md': {'lines_inserted': 1}})
+        self.assertEqual(self.endpoints(), [
+            '/a/changes/%s/revisions/current/files/' % self.CHANGE_ID,
+        ] * 2)
+
+    def test_resolve_once(self):
+        """
+        Test that the current revision is resolved to its SHA once
+        """
+        revision = Revision(self.gerrit_con, self.CHANGE_ID, None, cache=self.cache)
+        self.assertEqual(revision.get_commit()['subject'], self.SUBJECT)
+        self.assertEqual(revision.get_diff('docs/index.rst'), {'change_type': 'MODIFIED'})
+        self.assertEqual(revision.get_patch(), self.patch)
+        self.assertEqual(revision.resolve(), self.SHA)
+        self.assertEqual(self.endpoints(), [
+            '/a/changes/%s/revisions/current/commit' % self.CHANGE_ID,
+            '/a/changes/%s/revisions/%s/files/docs%%2Findex.rst/diff' % (self.CHANGE_ID, self.SHA),
+            '/a/changes/%s/revisions/%s/patch' % (self.CHANGE_ID, self.SHA),
+        ])
+
+    def test_cache_hit(self):
+        """
+        Test that content read once is served from the cache, as fresh
+        objects
+        """
+        revision = Revision(self.gerrit_con, self.CHANGE_ID, self.SHA, cache=self.cache)
+        files = revision.get_files()
+        files['README.md']['lines_inserted'] = 100
+        other = Revision(self.gerrit_con, self.CHANGE_ID, self.SHA, cache=self.cache)
+        self.assertEqual(other.get_files(), {'README.md': {'lines_inserted': 1}})
+        self.assertEqual(self.endpoints(), [
+            '/a/changes/%s/revisions/%s/files/' % (self.CHANGE_ID, self.SHA),
+        ])
+
+    def test_patch_set_number(self):
+        """
+        Test that the SHA of a patch set number is remembered
+        """
+        Revision(self.gerrit_con, self.CHANGE_ID, '2', cache=self.cache).get_files()
+        Revision(self.gerrit_con, self.CHANGE_ID, '2', cache=self.cache).get_files()
+        self.assertEqual(self.endpoints(), [
+            '/a/changes/%s/revisions/2/commit' % self.CHANGE_ID,
+            '/a/changes/%s/revisions/%s/files/' % (self.CHANGE_ID, self.SHA),
+        ])
+
+    def test_not_found(self):
+        """
+        Test that it raises if the file doesn't exist
+        """
+        revision = Revision(self.gerrit_con, self.CHANGE_ID, self.SHA, cache=self.cache)
+        with self.assertRaises(ValueError):
+            revision.get_diff('missing')
+
+    def test_error_not_cached(self):
+        """
+        Test that it raises on errors and doesn't cache them
+        """
+        self.gerrit_con.call.side_effect = None
+        self.gerrit_con.call.return_value = mock.Mock(status_code=500, content=b'Internal error')
+        revision = Revision(self.gerrit_con, self.CHANGE_ID, self.SHA, cache=self.cache)
+        with self.assertRaises(UnhandledError):
+            revision.get_files()
+        self.gerrit_con.call.side_effect = self.call
+        self.assertEqual(revision.get_files(), {'README.md': {'lines_inserted': 1}})
+
+
+class RevisionDownloadTestCase(GerritUnitTest):
+    """
+    Unit tests for streaming downloads of revision content
+    """
+    CONTENT = bytes(range(256)) * 1000
+
+    def setUp(self):
+        self.req = mock.Mock(status_code=200)
+        self.req.iter_content.side_effect = self.iter_content
+        self.gerrit_con = mock.Mock()
+        self.gerrit_con.call.return_value = self.req
+        self.revision = Revision(self.gerrit_con, self.CHANGE_ID, self.REVISION_ID)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def iter_content(self, chunk_size):
+        """
+        Stream the content base64 encoded
+        """
+        encoded = base64.b64encode(self.CONTENT)
+        for index in range(0, len(encoded), chunk_size):
+            yield encoded[index:index + chunk_size]
+
+    def test_download_patch_to_path(self):
+        """
+        Test that the patch is written to a path and the response closed
+        """
+        path = os.path.join(self.directory, 'change.patch')
+        self.assertEqual(self.revision.download_patch(path, chunk_size=1000), len(self.CONTENT))
+        with open(path, 'rb') as patch:
+            self.assertEqual(patch.read(), self.CONTENT)
+        self.gerrit_con.call.assert_called_once_with(
+            r_endpoint='/a/changes/%s/revisions/%s/patch' % (self.CHANGE_ID, self.REVISION_ID),
+            stream=True,
+        )
+        self.req.iter_content.assert_called_once_with(1000)
+        self.req.close.assert_called_once_with()
+
+    def test_download_file_to_file(self):
+        """
+        Test that file content is written to a file object
+        """
+        dest = io.BytesIO()
+        self.assertEqual(self.revision.download_file('img/logo.png', dest), len(self.CONTENT))
+        self.assertEqual(dest.getvalue(), self.CONTENT)
+        self.gerrit_con.call.assert_called_once_with(
+            r_endpoint='/a/changes/%s/revisions/%s/files/img%%2Flogo.png/content' % (
+                self.CHANGE_ID, self.REVISION_ID),
+            stream=True,
+        )
+
+    def test_download_to_buffer(self):
+        """
+        Test that content is written into a buffer, which must be large
+        enough to hold it
+        """
+        buffer = bytearray(len(self.CONTENT) + 10)
+        self.assertEqual(self.revision.download_patch(buffer), len(self.CONTENT))
+        self.assertEqual(buffer[:len(self.CONTENT)], self.CONTENT)
+
+        with self.assertRaises(ValueError):
+            self.revision.download_patch(memoryview(bytearray(100)))
+
+    def test_download_not_found(self):
+        """
+        Test that it raises if the file doesn't exist and writes nothing
+        """
+        self.req.status_code = 404
+        self.req.content = b'Not found'
+        path = os.path.join(self.directory, 'missing')
+        with self.assertRaises(ValueError):
+            self.revision.download_file('missing', path)
+        self.assertFalse(os.path.exists(path))
+        self.req.close.assert_called_once_with()
+
+        self.req.status_code = 500
+        with self.assertRaises(UnhandledError):
+            self.revision.download_file('missing', path)
+
+    def test_download_truncated(self):
+        """
+        Test that a partially written file is removed
+        """
+        self.req.iter_content.side_effect = lambda chunk_size: [b'YWJj', b'ZA=']
+        path = os.path.join(self.directory, 'change.patch')
+        with self.assertRaises(ValueError):
+            self.revision.download_patch(path)
+        self.assertFalse(os.path.exists(path))
+
+    def test_constant_memory(self):
+        """
+        Test that the content isn't held in memory while downloading
+        """
+        chunk = base64.b64encode(b'x' * 48 * 1024)
+        self.req.iter_content.side_effect = lambda chunk_size: (chunk for _ in range(200))
+        path = os.path.join(self.directory, 'large.patch')
+
+        tracemalloc.start()
+        try:
+            size = self.revision.download_patch(path)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(size, 200 * 48 * 1024)
+        self.assertLess(peak, 1024 * 1024)
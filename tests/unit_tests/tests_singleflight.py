@@ -0,0 +1,118 @@
+"""
+Unit tests for gerrit.singleflight and gerrit.aio.singleflight
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from gerrit.aio.singleflight import AsyncSingleFlight
+from gerrit.singleflight import SingleFlight
+from tests import GerritUnitTest
+
+
+class SingleFlightTestCase(GerritUnitTest):
+    """
+    Unit tests for coalescing calls made from threads
+    """
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.release = threading.Event()
+        self.calls = []
+
+    def slow(self, value):
+        """
+        A call that lasts until it is released
+        """
+        self.calls.append(value)
+        self.release.wait(5)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def run_concurrently(self, count, key, value):
+        """
+        Make the same call from many threads and release it once they all wait
+        """
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            futures = [executor.submit(self.single_flight.do, key, self.slow, value)
+                       for _ in range(count)]
+            while self.single_flight.stats()['coalesced'] < count - 1:
+                threading.Event().wait(0.001)
+            self.release.set()
+        return futures
+
+    def test_coalesced(self):
+        """
+        Test that concurrent callers share one call
+        """
+        futures = self.run_concurrently(20, 'key', 'value')
+        self.assertEqual([future.result() for future in futures], ['value'] * 20)
+        self.assertEqual(self.calls, ['value'])
+        self.assertEqual(self.single_flight.stats(), {'sent': 1, 'coalesced': 19})
+        self.assertEqual(self.single_flight.in_flight(), 0)
+
+    def test_error_shared(self):
+        """
+        Test that all callers get the error of the call
+        """
+        error = ValueError('failed')
+        futures = self.run_concurrently(5, 'key', error)
+        for future in futures:
+            self.assertIs(future.exception(), error)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_sequential_calls(self):
+        """
+        Test that calls are only shared while in flight
+        """
+        self.release.set()
+        self.assertEqual(self.single_flight.do('key', self.slow, 1), 1)
+        self.assertEqual(self.single_flight.do('key', self.slow, 2), 2)
+        self.assertEqual(self.single_flight.do('other', self.slow, 3), 3)
+        self.assertEqual(self.single_flight.stats(), {'sent': 3, 'coalesced': 0})
+
+
+class AsyncSingleFlightTestCase(GerritUnitTest):
+    """
+    Unit tests for coalescing calls made from tasks
+    """
+    def test_coalesced(self):
+        """
+        Test that concurrent tasks share one call
+        """
+        single_flight = AsyncSingleFlight()
+        calls = []
+
+        async def slow(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return value
+
+        async def run():
+            return await asyncio.gather(*[single_flight.do('key', slow, 'value')
+                                          for _ in range(20)])
+
+        self.assertEqual(asyncio.run(run()), ['value'] * 20)
+        self.assertEqual(calls, ['value'])
+        self.assertEqual(single_flight.stats(), {'sent': 1, 'coalesced': 19})
+        self.assertEqual(single_flight.in_flight(), 0)
+
+    def test_cancelled_caller(self):
+        """
+        Test that cancelling one caller doesn't cancel the shared call
+        """
+        single_flight = AsyncSingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.01)
+            raise ValueError('failed')
+
+        async def run():
+            first = asyncio.ensure_future(single_flight.do('key', slow))
+            second = asyncio.ensure_future(single_flight.do('key', slow))
+            await asyncio.sleep(0)
+            first.cancel()
+            with self.assertRaises(ValueError):
+                await second
+            self.assertTrue(first.cancelled())
+
+        asyncio.run(run())
@@ -0,0 +1,129 @@
+"""
+Unit tests for gerrit.sync
+"""
+import os
+import shutil
+import tempfile
+import mock
+from gerrit.changes.change import Change
+from gerrit.sync import (
+    ADDED,
+    CLOSED,
+    MODIFIED,
+    ChangeSync,
+)
+from tests import GerritUnitTest
+
+
+class ChangeSyncTestCase(GerritUnitTest):
+    """
+    Unit tests for incrementally syncing changes
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'sync.db')
+        self.gerrit_con = mock.Mock()
+        self.gerrit_con.iter_changes.return_value = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def change(self, number, updated, status='NEW'):
+        """
+        Build a change as returned by a query
+        """
+        change = Change(self.gerrit_con)
+        # pylint: disable=protected-access
+        return change._populate({
+            'id': '%s~%s~I%040d' % (self.PROJECT, self.BRANCH, number),
+            'status': status,
+            'updated': updated,
+            '_number': number,
+        })
+
+    def sync(self, changes, **kwargs):
+        """
+        Run a sync that fetches the given changes
+        """
+        self.gerrit_con.iter_changes.return_value = changes
+        with ChangeSync(self.gerrit_con, self.path, **kwargs) as change_sync:
+            return [(delta.kind, delta.change.number) for delta in change_sync.sync()]
+
+    def test_initial_sync(self):
+        """
+        Test that the first sync fetches the initial query and adds everything
+        """
+        deltas = self.sync([
+            self.change(1, '2013-02-21 11:16:36.775000000'),
+            self.change(2, '2013-02-21 11:10:00.000000000'),
+        ], scope='project:%s' % self.PROJECT)
+        self.assertEqual(deltas, [(ADDED, 1), (ADDED, 2)])
+        self.gerrit_con.iter_changes.assert_called_with(
+            'project:%s status:open' % self.PROJECT, 100, None,
+        )
+
+        with ChangeSync(self.gerrit_con, self.path, scope='project:%s' % self.PROJECT) as sync:
+            self.assertEqual(sync.checkpoint, '2013-02-21 11:16:36.775000000')
+
+    def test_incremental_sync(self):
+        """
+        Test that later syncs only query what was updated since the checkpoint
+        """
+        self.sync([
+            self.change(1, '2013-02-21 11:16:36.775000000'),
+            self.change(2, '2013-02-21 11:10:00.000000000'),
+        ])
+
+        deltas = self.sync([
+            self.change(3, '2013-02-21 12:00:00.000000000'),
+            self.change(2, '2013-02-21 11:30:00.000000000'),
+            self.change(1, '2013-02-21 11:20:00.000000000', 'MERGED'),
+        ], overlap=30)
+        self.assertEqual(deltas, [(ADDED, 3), (MODIFIED, 2), (CLOSED, 1)])
+        self.gerrit_con.iter_changes.assert_called_with(
+            'since:"2013-02-21 11:16:06"', 100, None,
+        )
+
+    def test_overlap_is_deduplicated(self):
+        """
+        Test that changes returned again by the overlap are not reported twice
+        """
+        self.sync([self.change(1, '2013-02-21 11:16:36.775000000')])
+        deltas = self.sync([self.change(1, '2013-02-21 11:16:36.775000000')])
+        self.assertEqual(deltas, [])
+
+        self.sync([self.change(1, '2013-02-21 11:17:00.000000000', 'ABANDONED')])
+        deltas = self.sync([self.change(1, '2013-02-21 11:17:00.000000000', 'ABANDONED')])
+        self.assertEqual(deltas, [])
+
+    def test_stopped_sync_is_repeated(self):
+        """
+        Test that the checkpoint is not saved if the deltas weren't all consumed
+        """
+        self.gerrit_con.iter_changes.return_value = [
+            self.change(1, '2013-02-21 11:16:36.775000000'),
+            self.change(2, '2013-02-21 11:10:00.000000000'),
+        ]
+        with ChangeSync(self.gerrit_con, self.path) as change_sync:
+            deltas = change_sync.sync()
+            next(deltas)
+            deltas.close()
+            self.assertIsNone(change_sync.checkpoint)
+
+        self.assertEqual(
+            self.sync(self.gerrit_con.iter_changes.return_value),
+            [(ADDED, 1), (ADDED, 2)],
+        )
+
+    def test_reset(self):
+        """
+        Test that a reset starts over with the initial query
+        """
+        self.sync([self.change(1, '2013-02-21 11:16:36.775000000')])
+        with ChangeSync(self.gerrit_con, self.path) as change_sync:
+            change_sync.reset()
+            self.assertIsNone(change_sync.checkpoint)
+
+        self.assertEqual(self.sync([self.change(1, '2013-02-21 11:16:36.775000000')]),
+                         [(ADDED, 1)])
+        self.gerrit_con.iter_changes.assert_called_with('status:open', 100, None)